@@ -16,6 +16,7 @@ from collections import OrderedDict
 
 from scrapy.selector import Selector
 
+from hub import load_hub
 from utilities import DIR_WIKIDOT, strip_quote, xstr, xhref, save_json, strip_tag
 
 
@@ -24,13 +25,12 @@ def parse_canon(
     language: str = '英文站',
     json_tag: str = '../data/tag.json'
 ) -> list[dict]:
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
+    pagedata = load_hub(html_file, None)
     if language == '英文站':
-        canon_wrapper = Selector(text=htmlhandle).css('div.canon-wrapper')
+        canon_wrapper = pagedata.css('div.canon-wrapper')
         list_block = canon_wrapper.xpath('*')
     else:
-        list_block = Selector(text=htmlhandle).css('div[class="content-panel centered standalone series"]')
+        list_block = pagedata.css('div[class="content-panel centered standalone series"]')
     
     with open(json_tag) as f:
         list_dict_tag = json.load(f)
@@ -15,6 +15,7 @@ from collections import OrderedDict
 
 from scrapy.selector import Selector
 
+from hub import load_hub
 from utilities import DIR_WIKIDOT, strip_quote, xstr, xhref, save_json, strip_tag
 
 
@@ -51,9 +52,7 @@ def parse_character(
     html_file = DIR_WIKIDOT + 'personnel-and-character-dossier.html',
     o5: bool = False,
 ) -> list[dict]:
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
-        page_content = Selector(text=htmlhandle).css('div#page-content')[0]
+    page_content = load_hub(html_file)
     list_character = []
     title = page_content.css('ul.yui-nav').xpath('*')
     content = page_content.css('div.yui-content').xpath('*')
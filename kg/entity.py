@@ -0,0 +1,129 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   entity.py
+@Time    :   2024/09/18 22:14:39
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+build all entity json files in data/ in one run, see build_entities
+'''
+
+import time
+
+from joblib import Parallel, delayed
+
+from tag import parse_tag_guide
+from facility import parse_facility, parse_facility_cn, parse_facility_complete
+from taskforce import parse_tf
+from goi import parse_goi_complete
+from canon import parse_canon, parse_canon_from_tag
+from charactor import parse_character, parse_character_from_tag
+from series import parse_series, parse_series_cn, parse_series_from_tag
+from attribute import parse_attribute_from_tag
+from utilities import DIR_WIKIDOT, save_json
+
+
+def build_tag() -> int:
+    # tag-guide.html must be edited by hand first, see tag.parse_tag_guide
+    list_tag = parse_tag_guide()
+    save_json(list_tag, '../data/tag.json')
+    return len(list_tag)
+
+
+def build_facility() -> int:
+    list_facility = parse_facility()
+    list_facility += parse_facility_cn(facility_index=len(list_facility))
+    list_facility += parse_facility_complete(facility_index=len(list_facility))
+    save_json(list_facility, '../data/facility.json')
+    return len(list_facility)
+
+
+def build_taskforce() -> int:
+    list_tf = parse_tf()
+    list_tf += parse_tf(DIR_WIKIDOT + 'task-forces-cn.html', '中文分部')
+    save_json(list_tf, '../data/taskforce.json')
+    return len(list_tf)
+
+
+def build_goi() -> int:
+    list_goi = parse_goi_complete()
+    save_json(list_goi, '../data/goi.json')
+    return len(list_goi)
+
+
+def build_canon() -> int:
+    list_canon = parse_canon()
+    list_canon += parse_canon(DIR_WIKIDOT + 'canon-hub-cn.html', '中文分部')
+    list_canon += parse_canon_from_tag(list_canon)
+    save_json(list_canon, '../data/canon.json')
+    return len(list_canon)
+
+
+def build_character() -> int:
+    list_character = parse_character()
+    list_character += parse_character(DIR_WIKIDOT + 'o5-command-dossier.html', o5=True)
+    list_character += parse_character_from_tag(list_character)
+    save_json(list_character, '../data/character.json')
+    return len(list_character)
+
+
+def build_series() -> int:
+    list_series = parse_series()
+    list_series += parse_series_cn()
+    list_series += parse_series_from_tag(list_series)
+    save_json(list_series, '../data/series.json')
+    return len(list_series)
+
+
+def build_attribute() -> int:
+    list_attribute = parse_attribute_from_tag()
+    save_json(list_attribute, '../data/attribute.json')
+    return len(list_attribute)
+
+
+# parsers in the same stage run concurrently
+# parsers in the second stage read data/tag.json, which is curated and only
+# written by build_tag in the first stage if build_entities(parse_tag=True)
+STAGE_BUILD = [
+    {
+        'facility': build_facility,
+        'taskforce': build_taskforce,
+    },
+    {
+        'goi': build_goi,
+        'canon': build_canon,
+        'character': build_character,
+        'series': build_series,
+        'attribute': build_attribute,
+    },
+]
+
+
+def run_build_timed(name: str, func) -> tuple[str, int, float]:
+    t_start = time.perf_counter()
+    n_entity = func()
+    return name, n_entity, time.perf_counter() - t_start
+
+
+def build_entities(
+    n_jobs: int = -1,
+    stage_build: list[dict] = STAGE_BUILD,
+    parse_tag: bool = False,
+) -> dict[str, dict]:
+    # the in-memory hub cache is per process, the disk cache is shared
+    if parse_tag:
+        stage_build = [dict(tag=build_tag, **stage_build[0])] + stage_build[1:]
+    report = {}
+    t_start = time.perf_counter()
+    for stage in stage_build:
+        pool = Parallel(n_jobs, return_as='generator_unordered')
+        for name, n_entity, t_cost in pool(delayed(run_build_timed)(k, v) for k, v in stage.items()):
+            print('%-10s %5d entities, %.2f sec'%(name, n_entity, t_cost))
+            report[name] = {'n_entity': n_entity, 'time': t_cost}
+    print('All entities built in %.2f sec'%(time.perf_counter()-t_start))
+    return report
+
+
+if __name__ == '__main__':
+    build_entities()
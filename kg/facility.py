@@ -15,6 +15,7 @@ from collections import OrderedDict
 
 from scrapy.selector import Selector
 
+from hub import load_hub
 from utilities import DIR_WIKIDOT, strip_address, xstr, xhref, save_json
 
 
@@ -54,9 +55,7 @@ def parse_facility(
     html_file = DIR_WIKIDOT + 'secure-facilities-locations.html',
     facility_index: int = 0,
 ) -> list[dict]:
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
-        page_content = Selector(text=htmlhandle).css('div#page-content')[0]
+    page_content = load_hub(html_file)
     list_facility = []
     for i in page_content.css('div.s-wrapper').css('div.socontent'):
         dict_facility = {}
@@ -133,9 +132,7 @@ def parse_facility_complete(
     head_facility_type = set(['站点', '区域', '设施'])
     head_rename = {'站点': 'site', '区域': 'area'}
 
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
-        page_content = Selector(text=htmlhandle).css('div#page-content')[0]
+    page_content = load_hub(html_file)
     list_row = []
     for table in page_content.css('table.wiki-content-table')[1:-1]:
         head = table.css('th').xpath('string(.)').extract()
@@ -215,9 +212,7 @@ def parse_facility_cn(
     html_file = DIR_WIKIDOT + 'secure-facilities-locations-cn.html',
     facility_index: int = 0,
 ) -> list[dict]:
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
-        page_content = Selector(text=htmlhandle).css('div#page-content')[0]
+    page_content = load_hub(html_file)
     
     list_facility = []
     dict_facility = {}
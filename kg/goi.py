@@ -8,12 +8,17 @@
 '''
 
 import re
+import os
 from string import printable
 import json
+import hashlib
 from urllib import parse
 
+from joblib import Parallel, delayed
 from scrapy.selector import Selector
 
+from hub import load_hub
+from page_cache import hash_file
 from utilities import DIR_WIKIDOT, strip_address, xstr, xhref, save_json
 
 
@@ -46,9 +51,7 @@ ADDRESS_LANGUAGE = [
 def get_address2text(
     html_file: str = DIR_WIKIDOT + 'goi-complete-list.html',
 ) -> dict:
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
-        page_content = Selector(text=htmlhandle).css('div#page-content')[0]
+    page_content = load_hub(html_file)
     address2text = {}
     for i in page_content.css('a'):
         link = i.xpath('@href').extract_first()
@@ -66,15 +69,12 @@ def parse_goi(
     html_file: str = DIR_WIKIDOT + 'groups-of-interest.html',
 ) -> list[dict]:
     # print(html_file)
-    language_address = html_file.split('scp-wiki-cn.wikidot.com/')[-1]
-    language_address = language_address.split('.html')[0]
+    language_address = strip_address(html_file)
     language = address2text.get(language_address, None)
     if isinstance(language, str):
         language = language.replace('相关组织', '')
 
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
-        page_content = Selector(text=htmlhandle).css('div#page-content')[0]
+    page_content = load_hub(html_file)
     tag_start = 'system_page-tags/tag/'
     list_goi = []
     list_panel = page_content.xpath('div[@class="content-panel standalone series"]')
@@ -164,17 +164,77 @@ def parse_goi_from_tag(
     return list_goi_from_tag
 
 
+def parse_goi_cached(
+    address2text: dict,
+    html_file: str,
+    dir_cache: str = '../data/goi_cache/',
+) -> list[dict]:
+    # result of one language page, keyed by hash of html file and
+    # the language name found in goi-complete-list
+    language_address = strip_address(html_file)
+    key = hash_file(html_file) + str(address2text.get(language_address, None))
+    key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    cache_json = os.path.join(dir_cache, language_address + '.json')
+    if os.path.exists(cache_json):
+        with open(cache_json) as f:
+            cache = json.load(f)
+        if cache['key'] == key:
+            return cache['goi']
+    list_goi = parse_goi(address2text, html_file)
+    os.makedirs(dir_cache, exist_ok=True)
+    save_json({'key': key, 'goi': list_goi}, cache_json)
+    return list_goi
+
+
+def merge_goi(list_goi: list[dict]) -> list[dict]:
+    # the same group may be listed in several language pages
+    # the first one is kept, in the order of ADDRESS_LANGUAGE,
+    # and its empty fields are filled by the later ones
+    list_merged = []
+    key2goi = {}
+    for i in list_goi:
+        list_key = [('tag', i['tag']), ('address', i['address'])]
+        list_key = [k for k in list_key if k[1] is not None]
+        goi = None
+        for k in list_key:
+            if k in key2goi:
+                goi = key2goi[k]
+                break
+        if goi is None:
+            goi = dict(i)
+            list_merged.append(goi)
+        else:
+            for k, v in i.items():
+                if goi.get(k, None) is None:
+                    goi[k] = v
+        for k in [('tag', goi['tag']), ('address', goi['address'])]:
+            if k[1] is not None:
+                key2goi.setdefault(k, goi)
+    return list_merged
+
+
 def parse_goi_complete(
-    html_file: str = DIR_WIKIDOT + 'goi-complete-list.html'
+    html_file: str = DIR_WIKIDOT + 'goi-complete-list.html',
+    dir_wikidot: str = DIR_WIKIDOT,
+    json_tag: str = '../data/tag.json',
+    dir_cache: str = '../data/goi_cache/',
+    n_jobs: int = -1,
 ) -> list[dict]:
-    pass
+    # language pages are parsed in parallel, only changed pages are parsed again
+    address2text = get_address2text(html_file)
+    pool = Parallel(n_jobs)
+    result = pool(
+        delayed(parse_goi_cached)(address2text, dir_wikidot + f'{i}.html', dir_cache)
+        for i in ADDRESS_LANGUAGE
+    )
+    list_goi = []
+    for i in result:
+        list_goi += i
+    list_goi = merge_goi(list_goi)
+    list_goi += parse_goi_from_tag(list_goi, json_tag)
+    return list_goi
 
 
 if __name__ == '__main__':
-    address2text = get_address2text()
-    html_file: str = DIR_WIKIDOT + 'goi-complete-list.html'
-    list_goi = []
-    for i in ADDRESS_LANGUAGE:
-        list_goi += parse_goi(address2text, DIR_WIKIDOT + f'{i}.html')
-    list_goi += parse_goi_from_tag(list_goi)
+    list_goi = parse_goi_complete()
     save_json(list_goi, '../data/goi.json')
@@ -7,31 +7,42 @@
 @Contact :   cxy13.ok@163.com
 '''
 
+import os
 from copy import deepcopy
 import json
 
 from langchain_community.graphs import Neo4jGraph
 
 from graph_utilities import print_schema, delete_all, get_node_property
-from graph_utilities import create_node, count_node, create_index
+from graph_utilities import create_node, count_node
 from graph_utilities import create_rel_multitail, create_rel_multihead, count_rel
+from graph_utilities import create_rel_batch, create_rel_batch_async
+from graph_client import GraphClient
+from graph_local import LocalGraph
+from graph_schema import bootstrap_schema, verify_rel_plan, merge_by_schema
+from scp_store import load_scp_store
 
 
 # start neo4j server: sudo neo4j start
 # if showing error: The credentials you provided were valid, but must be changed before you can use this instance.
 # change the default password to "password" by running following command in terminal:
 # sudo neo4j-admin dbms set-initial-password password
-graph = Neo4jGraph(
-    url="bolt://localhost:7687", 
-    username="neo4j", 
-    password="password",
-    )
+# without neo4j, build the graph in process: SCP_KG_GRAPH=local python graph_building_from_json.py
+if os.environ.get('SCP_KG_GRAPH', 'neo4j') == 'local':
+    graph = LocalGraph()
+else:
+    graph = Neo4jGraph(
+        url="bolt://localhost:7687", 
+        username="neo4j", 
+        password="password",
+        )
 
 
+# indexes and constraints are created up front by bootstrap_schema,
+# see SCHEMA in graph_schema.py
 def create_node_simple(
     label: str,
     json_path: str = None,
-    index: str = None,
     func = None,
 ) -> None:
     if json_path is None:
@@ -41,21 +52,21 @@ def create_node_simple(
     if func is not None:
         list_dict_new = [func(i) for i in list_dict]
         list_dict = list_dict_new
+    list_dict = merge_by_schema(label, list_dict)
     create_node(graph, label, list_dict)
-    create_index(graph, label, index)
     count_node(graph, label)
 
 
 def create_tag(json_path: str = None) -> None:
-    create_node_simple('Tag', json_path, 'tag')
+    create_node_simple('Tag', json_path)
 
 
 def create_facility(json_path: str = None) -> None:
-    create_node_simple('Facility', json_path, 'name')
+    create_node_simple('Facility', json_path)
 
 
 def create_taskforce(json_path: str = None) -> None:
-    create_node_simple('TaskForce', json_path, 'name')  
+    create_node_simple('TaskForce', json_path)  
 
 
 def create_tag_simple(list_tag: list[str]) -> None:
@@ -74,14 +85,12 @@ def create_tag_simple(list_tag: list[str]) -> None:
         return None
 
     create_node(graph, 'Tag', list_dict)
-    create_index(graph, 'Tag', 'tag')
     count_node(graph, 'Tag')
 
 
 def create_node_as_tail(
     label: str,
     json_path: str = None,
-    index: str = None,
     head_label: str = 'Tag',
     property: str = 'tag',
     relationship: str = 'IS_TAG_OF',
@@ -94,47 +103,54 @@ def create_node_as_tail(
     # TODO: create tag nodes that not existing
     if head_label == 'Tag' and property == 'tag' and relationship == 'IS_TAG_OF':
         create_tag_simple([i['tag'] for i in list_dict])
+    list_dict = merge_by_schema(label, list_dict)
     create_node(graph, label, list_dict)
-    create_index(graph, label, index)
     count_node(graph, label)
-    for i in list_dict:
-        value = i[property]
-        if value is not None:
-            create_rel_multitail(
-                graph, 
-                head_label, property, value, 
-                label, property, [value], 
-                relationship)
+    # one pair per value, MATCH links every node with the value
+    list_value = sorted(set([i[property] for i in list_dict if i[property] is not None]))
+    list_pair = [{'head': i, 'tail': i} for i in list_value]
+    create_rel_batch(
+        graph,
+        head_label, property,
+        label, property,
+        list_pair,
+        relationship)
     count_rel(graph, head_label, relationship, label) 
 
 
 def create_goi(json_path: str = None) -> None:
-    create_node_as_tail('GroupOfInterest', json_path, 'name')
+    create_node_as_tail('GroupOfInterest', json_path)
     
 
 def create_character(json_path: str = None) -> None:
-    create_node_as_tail('Character', json_path, 'name')
+    create_node_as_tail('Character', json_path)
 
 
 def create_attribute(json_path: str = None) -> None:
-    create_node_as_tail('Attribute', json_path, 'name')
+    create_node_as_tail('Attribute', json_path)
 
 
 def create_canon(json_path: str = None) -> None:
-    create_node_as_tail('Canon', json_path, 'name')   
+    create_node_as_tail('Canon', json_path)   
 
 
 def create_series(json_path: str = None) -> None:
-    create_node_as_tail('Series', json_path, 'name')
+    create_node_as_tail('Series', json_path)
 
 
 def create_scp(
     json_path: str = '../data/scp.json',
     json_facility: str = '../data/facility.json',
     json_taskforce: str = '../data/taskforce.json',
+    client: GraphClient = None,
 ) -> None:
-    with open(json_path) as f:
-        list_dict: list[dict] = json.load(f)
+    # json_path can also be the columnar store ../data/scp.col, see scp_store.py
+    # client: the six relationships of tags are written concurrently if given
+    if json_path.endswith('.col'):
+        list_dict: list[dict] = load_scp_store(json_path)
+    else:
+        with open(json_path) as f:
+            list_dict: list[dict] = json.load(f)
     label = 'ScpObject'
     index = 'item_number'
 
@@ -144,8 +160,8 @@ def create_scp(
         list_tag += i['tag']
     create_tag_simple(list_tag)
     
+    list_dict = merge_by_schema(label, list_dict)
     create_node(graph, label, list_dict)
-    create_index(graph, label, index)
     count_node(graph, label)
 
     node = 'Facility'
@@ -153,48 +169,35 @@ def create_scp(
     scp_contained = set()
     with open(json_facility) as f:
         list_facility = json.load(f)
+    list_pair = []
     for i in list_facility:
         scp_uncontained = set(i['object_contained']).difference(scp_contained)
-        if len(scp_uncontained) == 0:
-            continue
         scp_contained.update(i['object_contained'])
-        create_rel_multihead(
-            graph, 
-            label, index, scp_uncontained, 
-            node, 'facility_index', i['facility_index'], 
-            relation            
-        )
+        list_pair += [{'head': j, 'tail': i['facility_index']} for j in scp_uncontained]
+    create_rel_batch(
+        graph,
+        label, index,
+        node, 'facility_index',
+        list_pair,
+        relation
+    )
     count_rel(graph, label, relation, node)
 
     node = 'TaskForce'
     relation = 'IS_CONTAINED_BY_TASKFORCE'
-    scp_contained = set()
     with open(json_taskforce) as f:
         list_taskforce = json.load(f)
-    for i in list_taskforce:
-        create_rel_multihead(
-            graph, 
-            label, index, i['object_contained'], 
-            node, 'name', i['name'], 
-            relation            
-        )
+    list_pair = [{'head': j, 'tail': i['name']} for i in list_taskforce for j in i['object_contained']]
+    create_rel_batch(
+        graph,
+        label, index,
+        node, 'name',
+        list_pair,
+        relation
+    )
     count_rel(graph, label, relation, node)
 
-    def create_tail(
-        scp_dict: dict,
-        tail_label: str,
-        relationship: str,
-        tail_property: str = 'tag'
-    ) -> None:
-        tail_value = scp_dict[tail_property]
-        if len(tail_value) > 0:
-            create_rel_multitail(
-                graph, 
-                label, index, scp_dict[index], 
-                tail_label, tail_property, tail_value, 
-                relationship)
-
-    # build relations of each SCP object
+    # build relations of each SCP object, one batch per relationship
     node2relation = {
         'Tag': 'HAS_TAG',
         'Attribute': 'HAS_ATTRIBUTE',
@@ -203,11 +206,28 @@ def create_scp(
         'Series': 'BELONG_T0_SERIES',
         'Canon': 'BELONG_T0_CANON',
     }
+    # pairs of each relationship are filtered by tags of its nodes,
+    # so that only pairs that create relationships are sent
+    list_pair = [{'head': i[index], 'tail': j} for i in list_dict for j in i['tag']]
+    node2pair = {}
+    for node in node2relation:
+        set_tag = set(get_node_property(graph, node, 'tag'))
+        node2pair[node] = [i for i in list_pair if i['tail'] in set_tag]
+    if client is not None:
+        client.submit([
+            create_rel_batch_async(client, label, index, node, 'tag', node2pair[node], relation)
+            for node, relation in node2relation.items()
+        ])
     for node, relation in node2relation.items():
-        for i in list_dict:
-            create_tail(i, node, relation)
+        if client is None:
+            create_rel_batch(
+                graph,
+                label, index,
+                node, 'tag',
+                node2pair[node],
+                relation)
         count_rel(graph, label, relation, node)
-    
+
 
 def find_node(
     graph: Neo4jGraph,
@@ -215,6 +235,8 @@ def find_node(
     property: str = 'tag',
     value: str = 'blank博士',
 ) -> list[dict]:
+    if isinstance(graph, LocalGraph):
+        return graph.find_node(label, property, value)
     query = "MATCH (n:%s {%s: '%s'}) RETURN n"%(label, property, value)
     return graph.query(query)
 
@@ -222,8 +244,13 @@ def find_node(
 if __name__ == '__main__':
     pass
     import time
+    # to update a running graph without rebuilding it, see sync_graph in graph_sync.py
     delete_all(graph)
     t_start = time.time()
+    # nodes are loaded in the order of graph_schema.LOAD_ORDER
+    if not isinstance(graph, LocalGraph):
+        bootstrap_schema(graph)
+        verify_rel_plan(graph)
     create_tag()
     create_facility()
     create_taskforce()
@@ -232,6 +259,10 @@ if __name__ == '__main__':
     create_character()
     create_series()
     create_attribute()
-    create_scp()
+    if isinstance(graph, LocalGraph):
+        create_scp()
+    else:
+        with GraphClient() as client:
+            create_scp(client=client)
     print('Time Cost: %.2f sec'%(time.time()-t_start))
     # 362.09 sec 2024年8月28日00点54分
\ No newline at end of file
@@ -0,0 +1,245 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   graph_bulk.py
+@Time    :   2024/09/25 21:14:06
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+offline export of the whole graph for neo4j-admin database import
+nodes come from data/*.json, relationships from the edge tables of xref.py
+a fresh database is built in one shot, graph_building_from_json.py is kept
+for incremental updates of a running server
+'''
+
+import os
+import csv
+import time
+import subprocess
+
+from graph_schema import LOAD_ORDER, bootstrap_schema, merge_by_schema
+from scp_store import load_scp_store
+from xref import LABEL_ENTITY, load_entity, resolve_all, print_report
+
+
+DIR_IMPORT = '../data/import/'
+# label -> (json file in data/, property used as node index in graph)
+LABEL_NODE = dict(LABEL_ENTITY, ScpObject=('scp.json', 'item_number'))
+# same as dict_empty of create_tag_simple in graph_building_from_json
+TAG_EMPTY = {'tag': '', 'tag_english': '', 'description': '', 'address': '', 'type': []}
+# descriptions may contain ';', the default array delimiter of neo4j-admin
+ARRAY_DELIMITER = '\x1f'
+ARRAY_DELIMITER_ARG = 'U+001F'
+
+
+def add_missing_tag(label2entity: dict[str, list[dict]]) -> int:
+    # tag nodes created by create_tag_simple for tags not in tag.json
+    set_tag = set([i['tag'] for i in label2entity['Tag']])
+    list_tag = []
+    for label in ['GroupOfInterest', 'Canon', 'Character', 'Series', 'Attribute']:
+        list_tag += [i.get('tag', None) for i in label2entity[label]]
+    for i in label2entity['ScpObject']:
+        list_tag += i['tag']
+    n_missing = 0
+    for i in list_tag:
+        if i is None or i in set_tag:
+            continue
+        set_tag.add(i)
+        label2entity['Tag'].append(dict(TAG_EMPTY, tag=i))
+        n_missing += 1
+    return n_missing
+
+
+def load_graph_entity(
+    dir_data: str = '../data/',
+    scp_file: str = 'scp.json',
+) -> dict[str, list[dict]]:
+    # all nodes of the graph, label -> list of properties
+    label2entity = load_entity(dir_data, scp_file)
+    if scp_file.endswith('.col'):
+        # load_entity only reads the columns used by references
+        label2entity['ScpObject'] = load_scp_store(os.path.join(dir_data, scp_file))
+    n_missing = add_missing_tag(label2entity)
+    print(f'#Tag not in tag.json: {n_missing}')
+    # same nodes as graph_building_from_json, in loading order
+    return dict((i, merge_by_schema(i, label2entity[i])) for i in LOAD_ORDER)
+
+
+def get_type(list_value: list) -> str:
+    # neo4j-admin type of a column, string if types are mixed
+    # lists are typed by their elements, such as string[]
+    set_type = set()
+    is_list = False
+    for i in list_value:
+        if i is None:
+            continue
+        if isinstance(i, list):
+            is_list = True
+            set_type.update([get_type([j]) for j in i])
+        elif isinstance(i, bool):
+            set_type.add('boolean')
+        elif isinstance(i, int):
+            set_type.add('long')
+        elif isinstance(i, float):
+            set_type.add('double')
+        else:
+            set_type.add('string')
+    neo4j_type = set_type.pop() if len(set_type) == 1 else 'string'
+    return neo4j_type + '[]' if is_list else neo4j_type
+
+
+def format_value(value, neo4j_type: str) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ARRAY_DELIMITER.join([format_value(i, neo4j_type[:-2]) for i in value])
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def get_node_id(label: str, idx: int) -> str:
+    return f'{label}:{idx}'
+
+
+def save_csv(
+    header: list[str],
+    list_row: list[list],
+    csv_file: str,
+) -> tuple[str, str]:
+    # header and data are separate files, as --nodes=Label=header.csv,data.csv
+    header_file = csv_file.replace('.csv', '.header.csv')
+    with open(header_file, 'w', newline='') as f:
+        csv.writer(f).writerow(header)
+    with open(csv_file, 'w', newline='') as f:
+        csv.writer(f).writerows(list_row)
+    return header_file, csv_file
+
+
+def export_node(
+    label: str,
+    list_dict: list[dict],
+    dir_import: str = DIR_IMPORT,
+) -> tuple[str, str]:
+    list_key = []
+    for i in list_dict:
+        list_key += [k for k in i.keys() if k not in list_key]
+    key2type = dict((k, get_type([i.get(k, None) for i in list_dict])) for k in list_key)
+    header = ['node_id:ID'] + [f'{k}:{t}' for k, t in key2type.items()]
+    list_row = []
+    for idx, i in enumerate(list_dict):
+        row = [get_node_id(label, idx)]
+        row += [format_value(i.get(k, None), t) for k, t in key2type.items()]
+        list_row.append(row)
+    return save_csv(header, list_row, os.path.join(dir_import, f'{label}.csv'))
+
+
+def export_relationship(
+    relationship: str,
+    list_edge: list[tuple],
+    label2value2id: dict[tuple[str, str], dict],
+    dir_import: str = DIR_IMPORT,
+) -> tuple[tuple[str, str], int]:
+    # MATCH in the online path links every node with the value, so does this
+    list_row = []
+    row_seen = set()
+    for head_label, head_property, head_value, _, tail_label, tail_property, tail_value in list_edge:
+        list_head = label2value2id[(head_label, head_property)].get(head_value, [])
+        list_tail = label2value2id[(tail_label, tail_property)].get(tail_value, [])
+        for i in list_head:
+            for j in list_tail:
+                if (i, j) not in row_seen:
+                    row_seen.add((i, j))
+                    list_row.append([i, j])
+    header = [':START_ID', ':END_ID']
+    path = save_csv(header, list_row, os.path.join(dir_import, f'{relationship}.csv'))
+    return path, len(list_row)
+
+
+def get_import_command(
+    label2path: dict[str, tuple[str, str]],
+    relationship2path: dict[str, tuple[str, str]],
+    database: str = 'neo4j',
+) -> list[str]:
+    # the server must be stopped: sudo neo4j stop
+    command = [
+        'neo4j-admin', 'database', 'import', 'full',
+        '--overwrite-destination=true',
+        '--multiline-fields=true',
+        f'--array-delimiter={ARRAY_DELIMITER_ARG}',
+    ]
+    for k, v in label2path.items():
+        command.append('--nodes=%s=%s'%(k, ','.join([os.path.abspath(i) for i in v])))
+    for k, v in relationship2path.items():
+        command.append('--relationships=%s=%s'%(k, ','.join([os.path.abspath(i) for i in v])))
+    command.append(database)
+    return command
+
+
+def export_bulk(
+    dir_data: str = '../data/',
+    scp_file: str = 'scp.json',
+    dir_import: str = DIR_IMPORT,
+    database: str = 'neo4j',
+) -> list[str]:
+    t_start = time.time()
+    label2entity = load_graph_entity(dir_data, scp_file)
+    edge, report = resolve_all(label2entity)
+    print_report(report)
+
+    os.makedirs(dir_import, exist_ok=True)
+    label2path = {}
+    label2value2id: dict[tuple[str, str], dict] = {}
+    for label, list_dict in label2entity.items():
+        label2path[label] = export_node(label, list_dict, dir_import)
+        print(f'({label}): {len(list_dict)}')
+        for idx, i in enumerate(list_dict):
+            for k, v in i.items():
+                if v is None or isinstance(v, list):
+                    continue
+                label2value2id.setdefault((label, k), {}).setdefault(v, []).append(get_node_id(label, idx))
+        # properties without any value
+        for k in LABEL_NODE[label][1:] + ('tag',):
+            label2value2id.setdefault((label, k), {})
+
+    relationship2path = {}
+    for relationship, list_edge in edge.items():
+        relationship2path[relationship], n_row = export_relationship(
+            relationship, list_edge, label2value2id, dir_import)
+        print(f'[{relationship}]: {n_row}')
+
+    command = get_import_command(label2path, relationship2path, database)
+    with open(os.path.join(dir_import, 'import.sh'), 'w') as f:
+        f.write(' \\\n    '.join(command) + '\n')
+    print('Export Time Cost: %.2f sec'%(time.time()-t_start))
+    return command
+
+
+def create_index_bulk(graph) -> None:
+    # neo4j-admin import creates no index, run after the server is started
+    bootstrap_schema(graph)
+
+
+def build_bulk(
+    dir_data: str = '../data/',
+    scp_file: str = 'scp.json',
+    dir_import: str = DIR_IMPORT,
+    database: str = 'neo4j',
+    run: bool = False,
+) -> None:
+    # run: call neo4j-admin directly, otherwise run data/import/import.sh by hand
+    command = export_bulk(dir_data, scp_file, dir_import, database)
+    if not run:
+        print(' '.join(command))
+        return None
+    t_start = time.time()
+    subprocess.run(command, check=True)
+    print('Import Time Cost: %.2f sec'%(time.time()-t_start))
+
+
+if __name__ == '__main__':
+    build_bulk()
+    # after sudo neo4j start:
+    # from langchain_community.graphs import Neo4jGraph
+    # graph = Neo4jGraph(url="bolt://localhost:7687", username="neo4j", password="password")
+    # create_index_bulk(graph)
@@ -0,0 +1,158 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   graph_client.py
+@Time    :   2024/09/30 21:27:52
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+graph access over the official neo4j driver, instead of one synchronous
+langchain Neo4jGraph: a pool of connections, explicit read/write
+transactions with retries, and concurrent submission of independent batches
+the async api is for asyncio code, query/submit are for the synchronous
+builder and can be passed as graph to the functions in graph_utilities.py
+'''
+
+import time
+import random
+import asyncio
+from typing import Coroutine
+
+from neo4j import AsyncGraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+
+
+ERROR_RETRY = (ServiceUnavailable, SessionExpired, TransientError)
+
+
+class GraphClient(object):
+    def __init__(
+        self,
+        url: str = 'bolt://localhost:7687',
+        username: str = 'neo4j',
+        password: str = 'password',
+        database: str = 'neo4j',
+        max_pool_size: int = 16,
+        max_concurrency: int = 6,
+        max_retry: int = 3,
+    ) -> None:
+        # max_concurrency: transactions running at the same time, the rest wait
+        self.url = url
+        self.auth = (username, password)
+        self.database = database
+        self.max_pool_size = max_pool_size
+        self.max_concurrency = max_concurrency
+        self.max_retry = max_retry
+        # event loop of the synchronous api, the driver is bound to one loop
+        self.loop = asyncio.new_event_loop()
+        self.driver = None
+        self.semaphore = None
+
+
+    async def connect(self) -> None:
+        if self.driver is None:
+            self.driver = AsyncGraphDatabase.driver(
+                self.url, auth=self.auth, max_connection_pool_size=self.max_pool_size)
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+
+    async def run(
+        self,
+        query: str,
+        params: dict = {},
+        write: bool = True,
+    ) -> list[dict]:
+        # managed transactions retry transient errors (such as deadlocks)
+        # by themselves, the loop also retries lost connections
+        await self.connect()
+
+        async def work(tx) -> list[dict]:
+            result = await tx.run(query, params)
+            return await result.data()
+
+        async with self.semaphore:
+            for n_try in range(self.max_retry + 1):
+                try:
+                    async with self.driver.session(database=self.database) as session:
+                        if write:
+                            return await session.execute_write(work)
+                        return await session.execute_read(work)
+                except ERROR_RETRY:
+                    if n_try == self.max_retry:
+                        raise
+                    await asyncio.sleep(2 ** n_try + random.random())
+
+
+    async def read(self, query: str, **params) -> list[dict]:
+        return await self.run(query, params, write=False)
+
+
+    async def write(self, query: str, **params) -> list[dict]:
+        return await self.run(query, params, write=True)
+
+
+    async def write_batch(
+        self,
+        query: str,
+        list_row: list[dict],
+        batch_size: int = 5000,
+    ) -> list[list[dict]]:
+        # chunks of one batch are written in order, a transaction per chunk
+        # returns the result of each chunk
+        list_result = []
+        for i in range(0, len(list_row), batch_size):
+            list_result.append(await self.write(query, rows=list_row[i:i+batch_size]))
+        return list_result
+
+
+    async def gather(self, list_coroutine: list[Coroutine]) -> list:
+        # independent batches run concurrently, limited by max_concurrency
+        return await asyncio.gather(*list_coroutine)
+
+
+    async def aclose(self) -> None:
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+
+
+    async def __aenter__(self) -> 'GraphClient':
+        await self.connect()
+        return self
+
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+
+    def query(self, query: str, params: dict = {}, **kwargs) -> list[dict]:
+        # same as Neo4jGraph.query, in a write transaction
+        return self.loop.run_until_complete(self.run(query, dict(params, **kwargs)))
+
+
+    def submit(self, list_coroutine: list[Coroutine]) -> list:
+        t_start = time.time()
+        result = self.loop.run_until_complete(self.gather(list_coroutine))
+        print('%d batches in %.2f sec'%(len(list_coroutine), time.time()-t_start))
+        return result
+
+
+    def close(self) -> None:
+        self.loop.run_until_complete(self.aclose())
+        self.loop.close()
+
+
+    def __enter__(self) -> 'GraphClient':
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+if __name__ == '__main__':
+    with GraphClient() as client:
+        print(client.query('MATCH (n:ScpObject) RETURN count(n) AS count'))
+        query = 'MATCH (n:%s) RETURN count(n) AS count'
+        list_label = ['Tag', 'Character', 'GroupOfInterest', 'Canon', 'Series', 'Attribute']
+        print(client.submit([client.read(query%(i)) for i in list_label]))
@@ -0,0 +1,276 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   graph_local.py
+@Time    :   2024/10/02 19:53:25
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+in-process graph without neo4j, for tests and small deployments
+nodes are dicts in a list, relationships are adjacency lists of node ids
+functions in graph_utilities.py call the methods here if graph is a
+LocalGraph, so graph_building_from_json.py runs with SCP_KG_GRAPH=local
+the few-shot cypher examples of rag/cypher.py are in query_example
+'''
+
+import time
+
+from typing import Callable
+
+
+class LocalGraph(object):
+    def __init__(self) -> None:
+        self.delete_all()
+
+
+    def delete_all(self) -> None:
+        self.node: list[dict] = []
+        self.node_label: list[str] = []
+        # label -> node ids
+        self.label2id: dict[str, list[int]] = {}
+        # (label, property) -> value -> node ids
+        self.index: dict[tuple[str, str], dict] = {}
+        # relationship -> head id -> tail ids, and tail id -> head ids
+        self.rel_out: dict[str, dict[int, list[int]]] = {}
+        self.rel_in: dict[str, dict[int, list[int]]] = {}
+        self.rel_pair: dict[str, set[tuple[int, int]]] = {}
+
+
+    def create_index(self, label: str, property: str | tuple) -> None:
+        # composite indexes are not needed, lookups are on one property
+        if isinstance(property, tuple):
+            return None
+        if (label, property) in self.index:
+            return None
+        value2id = {}
+        for i in self.label2id.get(label, []):
+            value = self.node[i].get(property, None)
+            if value is not None and not isinstance(value, list):
+                value2id.setdefault(value, []).append(i)
+        self.index[(label, property)] = value2id
+
+
+    def find_id(self, label: str, property: str, value) -> list[int]:
+        # indexes are created on the first lookup of a property
+        self.create_index(label, property)
+        return self.index[(label, property)].get(value, [])
+
+
+    def add_node(self, label: str, property_dict: dict) -> int:
+        idx = len(self.node)
+        self.node.append(property_dict)
+        self.node_label.append(label)
+        self.label2id.setdefault(label, []).append(idx)
+        for (index_label, property), value2id in self.index.items():
+            value = property_dict.get(property, None)
+            if index_label == label and value is not None and not isinstance(value, list):
+                value2id.setdefault(value, []).append(idx)
+        return idx
+
+
+    def create_node(
+        self,
+        label: str,
+        list_property_dict: list[dict],
+        merge: bool = False,
+    ) -> None:
+        # same as the cypher of create_node: keys of the first dict,
+        # null properties are not stored
+        list_key = list(list_property_dict[0].keys())
+        for i in list_property_dict:
+            property_dict = dict((k, i.get(k, None)) for k in list_key if i.get(k, None) is not None)
+            if merge and len(property_dict) > 0:
+                k, v = next(iter(property_dict.items()))
+                if any([self.node[j] == property_dict for j in self.find_id(label, k, v)]):
+                    continue
+            self.add_node(label, property_dict)
+
+
+    def add_rel(self, head: int, tail: int, relationship: str, merge: bool = False) -> bool:
+        # False if merged into an existing relationship
+        pair = self.rel_pair.setdefault(relationship, set())
+        if merge and (head, tail) in pair:
+            return False
+        pair.add((head, tail))
+        self.rel_out.setdefault(relationship, {}).setdefault(head, []).append(tail)
+        self.rel_in.setdefault(relationship, {}).setdefault(tail, []).append(head)
+        return True
+
+
+    def create_rel_batch(
+        self,
+        head_label: str = 'ScpObject',
+        head_property: str = 'item_number',
+        tail_label: str = 'Tag',
+        tail_property: str = 'tag',
+        list_pair: list[dict] = [],
+        relationship: str = 'HAS_TAG',
+        merge: bool = False,
+    ) -> int:
+        # every pair of matched nodes is linked, as MATCH ... MATCH ... CREATE
+        # returns the number of relationships created
+        n_rel = 0
+        for i in list_pair:
+            for head in self.find_id(head_label, head_property, i['head']):
+                for tail in self.find_id(tail_label, tail_property, i['tail']):
+                    n_rel += self.add_rel(head, tail, relationship, merge)
+        return n_rel
+
+
+    def create_rel_multitail(
+        self,
+        head_label: str, head_property: str, head_value,
+        tail_label: str, tail_property: str, list_tail_value: list,
+        relationship: str,
+        merge: bool = False,
+    ) -> None:
+        list_pair = [{'head': head_value, 'tail': i} for i in list_tail_value]
+        self.create_rel_batch(head_label, head_property, tail_label, tail_property,
+                              list_pair, relationship, merge)
+
+
+    def create_rel_multihead(
+        self,
+        head_label: str, head_property: str, list_head_value: list,
+        tail_label: str, tail_property: str, tail_value,
+        relationship: str,
+        merge: bool = False,
+    ) -> None:
+        list_pair = [{'head': i, 'tail': tail_value} for i in list_head_value]
+        self.create_rel_batch(head_label, head_property, tail_label, tail_property,
+                              list_pair, relationship, merge)
+
+
+    def get_node_property(self, label: str = 'Tag', property: str = 'tag') -> list:
+        list_value = [self.node[i].get(property, None) for i in self.label2id.get(label, [])]
+        return [i for i in list_value if i is not None]
+
+
+    def count_node(self, label: str = None) -> int:
+        if label is None:
+            return len(self.node)
+        return len(self.label2id.get(label, []))
+
+
+    def count_rel(self, head: str = None, relationship: str = None, tail: str = None) -> int:
+        n_rel = 0
+        for i, list_tail in self.rel_out.get(relationship, {}).items():
+            if self.node_label[i] == head:
+                n_rel += sum([self.node_label[j] == tail for j in list_tail])
+        return n_rel
+
+
+    def find_node(self, label: str = 'Tag', property: str = 'tag', value: str = 'blank博士') -> list[dict]:
+        return [{'n': self.node[i]} for i in self.find_id(label, property, value)]
+
+
+    def get_neighbor(self, idx: int, relationship: str, outgoing: bool = True) -> list[int]:
+        rel = self.rel_out if outgoing else self.rel_in
+        return rel.get(relationship, {}).get(idx, [])
+
+
+    def match_path(
+        self,
+        label: str,
+        condition: dict | Callable | None = None,
+        list_step: list[tuple] = [],
+    ) -> list[tuple[int, ...]]:
+        # paths of node ids, as MATCH (a:label)-[:r]->(b:label)...
+        # condition: {property: value} looked up in index, or a function of properties
+        # list_step: (relationship, outgoing, label, condition)
+        def check(idx: int, condition) -> bool:
+            if condition is None or isinstance(condition, dict):
+                return True
+            return condition(self.node[idx])
+
+        if isinstance(condition, dict) and len(condition) > 0:
+            k, v = next(iter(condition.items()))
+            list_id = self.find_id(label, k, v)
+            list_id = [i for i in list_id if all([self.node[i].get(j) == w for j, w in condition.items()])]
+        else:
+            list_id = [i for i in self.label2id.get(label, []) if check(i, condition)]
+        list_path = [(i, ) for i in list_id]
+        for relationship, outgoing, label_next, condition_next in list_step:
+            list_path_next = []
+            for path in list_path:
+                for i in self.get_neighbor(path[-1], relationship, outgoing):
+                    if self.node_label[i] != label_next:
+                        continue
+                    if isinstance(condition_next, dict):
+                        if any([self.node[i].get(j) != w for j, w in condition_next.items()]):
+                            continue
+                    elif not check(i, condition_next):
+                        continue
+                    list_path_next.append(path + (i, ))
+            list_path = list_path_next
+        return list_path
+
+
+def load_local_graph(
+    dir_data: str = '../data/',
+    scp_file: str = 'scp.json',
+) -> LocalGraph:
+    # the same nodes and relationships as the bulk import in graph_bulk.py
+    from graph_bulk import load_graph_entity
+    from graph_schema import REL_SPEC, SCHEMA
+    from xref import resolve_all
+
+    t_start = time.time()
+    graph = LocalGraph()
+    label2entity = load_graph_entity(dir_data, scp_file)
+    edge, _ = resolve_all(label2entity)
+    for label, list_dict in label2entity.items():
+        for i in SCHEMA[label]['unique'] + SCHEMA[label]['index']:
+            graph.create_index(label, i)
+        for i in list_dict:
+            graph.add_node(label, dict((k, v) for k, v in i.items() if v is not None))
+    for relationship, head_label, head_property, tail_label, tail_property in REL_SPEC:
+        list_pair = [{'head': i[2], 'tail': i[6]} for i in edge.get(relationship, [])
+                     if i[0] == head_label and i[4] == tail_label]
+        graph.create_rel_batch(head_label, head_property, tail_label, tail_property,
+                               list_pair, relationship, merge=True)
+    print('(node): %d, [relationship]: %d, Load Time Cost: %.2f sec'%(
+        graph.count_node(), sum([len(i) for i in graph.rel_pair.values()]), time.time()-t_start))
+    return graph
+
+
+def query_example(graph: LocalGraph) -> dict[str, object]:
+    # the few-shot examples of cypher_prompt_example in rag/cypher.py
+    def item_number(list_path: list[tuple], position: int = 0) -> list[str]:
+        return [graph.node[i[position]]['item_number'] for i in list_path]
+
+    result = {}
+    result['scp-1446的特殊收容措施'] = [
+        graph.node[i[0]].get('special_containment_procedure', None)
+        for i in graph.match_path('ScpObject', {'item_number': 'scp-1446'})]
+    result['哪些项目有威尔逊野生动物的标签？'] = item_number(graph.match_path(
+        'Tag', {'tag': '威尔逊野生动物'}, [('HAS_TAG', False, 'ScpObject', None)]), 1)
+    # COUNT(object) counts matched rows, an object with both tags is counted twice
+    result['一共有多少个scp项目有“搞笑”或“人形生物”的标签？'] = sum([len(graph.match_path(
+        'Tag', {'tag': i}, [('HAS_TAG', False, 'ScpObject', None)])) for i in ['搞笑', '人形生物']])
+    result['MTF Beta-2 协助收容了几个基金会项目？'] = sum([
+        len(graph.node[i[0]].get('object_contained', []))
+        for i in graph.match_path('TaskForce', lambda x: 'Beta-2' in x.get('name', ''))])
+    result['所有和Harold Blank博士有关的scp项目'] = item_number(graph.match_path(
+        'Character', {'name': 'Harold Blank博士'},
+        [('RELATE_TO_CHARACTER', False, 'ScpObject', None)]), 1)
+    result['标签为dan博士的人物角色'] = [graph.node[i[1]] for i in graph.match_path(
+        'Tag', {'tag': 'dan博士'}, [('IS_TAG_OF', True, 'Character', None)])]
+    return result
+
+
+def benchmark_example(graph: LocalGraph, n_repeat: int = 100) -> float:
+    # milliseconds for all example questions
+    t_start = time.perf_counter()
+    for _ in range(n_repeat):
+        query_example(graph)
+    t_cost = (time.perf_counter() - t_start) / n_repeat * 1e3
+    print('%d examples: %.3f ms'%(len(query_example(graph)), t_cost))
+    return t_cost
+
+
+if __name__ == '__main__':
+    graph = load_local_graph()
+    for k, v in query_example(graph).items():
+        print(k, str(v)[:200])
+    benchmark_example(graph)
@@ -0,0 +1,151 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   graph_schema.py
+@Time    :   2024/09/28 20:06:43
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+constraints and indexes of every label, created before any node is loaded
+every property matched by a relationship batch is unique or indexed,
+checked by EXPLAIN of the batch queries in graph_utilities.create_rel_batch
+'''
+
+from langchain_community.graphs import Neo4jGraph
+
+from graph_utilities import create_index, create_constraint, get_rel_batch_query
+from xref import TAG_RELATION
+
+
+# label -> unique properties and indexed properties, in loading order:
+# tags are heads of IS_TAG_OF, SCP objects are heads of all the others
+# a tuple in index is a composite index
+SCHEMA = {
+    'Tag': {'unique': ['tag'], 'index': ['tag_english']},
+    'Facility': {'unique': ['facility_index'], 'index': ['name']},
+    'TaskForce': {'unique': [], 'index': ['name']},
+    'GroupOfInterest': {'unique': [], 'index': ['name', 'tag']},
+    'Canon': {'unique': [], 'index': ['name', 'tag']},
+    'Character': {'unique': [], 'index': ['name', 'tag']},
+    'Series': {'unique': [], 'index': ['name', 'tag']},
+    'Attribute': {'unique': [], 'index': ['name', 'tag']},
+    'ScpObject': {'unique': ['item_number'], 'index': []},
+}
+LOAD_ORDER = list(SCHEMA.keys())
+# relationship, head label, head property, tail label, tail property
+REL_SPEC = [
+    ('IS_CONTAINED_IN_FACILITY', 'ScpObject', 'item_number', 'Facility', 'facility_index'),
+    ('IS_CONTAINED_BY_TASKFORCE', 'ScpObject', 'item_number', 'TaskForce', 'name'),
+]
+REL_SPEC += [('IS_TAG_OF', 'Tag', 'tag', k, 'tag') for k in TAG_RELATION if k != 'Tag']
+REL_SPEC += [(v, 'ScpObject', 'item_number', k, 'tag') for k, v in TAG_RELATION.items()]
+OPERATOR_SCAN = ['AllNodesScan', 'NodeByLabelScan']
+
+
+def merge_duplicate(
+    list_dict: list[dict],
+    property: str,
+) -> tuple[list[dict], int]:
+    # nodes with the same value of a unique property, such as tags listed in
+    # several pages of tag.json, are merged: the first one is kept,
+    # its empty fields are filled and lists are joined
+    list_merged = []
+    value2dict = {}
+    n_duplicate = 0
+    for i in list_dict:
+        value = i.get(property, None)
+        if value is None or value not in value2dict:
+            d = dict(i)
+            list_merged.append(d)
+            if value is not None:
+                value2dict[value] = d
+            continue
+        n_duplicate += 1
+        d = value2dict[value]
+        for k, v in i.items():
+            if isinstance(d.get(k, None), list) and isinstance(v, list):
+                d[k] = d[k] + [j for j in v if j not in d[k]]
+            elif d.get(k, None) in [None, '']:
+                d[k] = v
+    return list_merged, n_duplicate
+
+
+def merge_by_schema(
+    label: str,
+    list_dict: list[dict],
+) -> list[dict]:
+    for i in SCHEMA[label]['unique']:
+        list_dict, n_duplicate = merge_duplicate(list_dict, i)
+        if n_duplicate > 0:
+            print(f'({label}): {n_duplicate} duplicates of {i} merged')
+    return list_dict
+
+
+def is_indexed(label: str, property: str) -> bool:
+    return property in SCHEMA[label]['unique'] or property in SCHEMA[label]['index']
+
+
+def bootstrap_schema(
+    graph: Neo4jGraph,
+    timeout: int = 300,
+) -> None:
+    # run before loading, indexes are populated while nodes are created
+    for label in LOAD_ORDER:
+        for i in SCHEMA[label]['unique']:
+            create_constraint(graph, label, i)
+        for i in SCHEMA[label]['index']:
+            create_index(graph, label, i)
+    for relationship, head_label, head_property, tail_label, tail_property in REL_SPEC:
+        for label, property in [(head_label, head_property), (tail_label, tail_property)]:
+            if not is_indexed(label, property):
+                raise ValueError(f'{label}.{property} of {relationship} is not indexed in SCHEMA')
+    graph.query('CALL db.awaitIndexes($timeout)', timeout=timeout)
+    print(graph.query('SHOW INDEXES YIELD name, labelsOrTypes, properties, type, state'))
+
+
+def get_plan_operator(plan: dict) -> list[str]:
+    # operator names of a plan tree, such as NodeUniqueIndexSeek
+    list_operator = []
+    stack = [plan]
+    while len(stack) > 0:
+        node = stack.pop()
+        list_operator.append(node['operatorType'].split('@')[0])
+        stack += node.get('children', [])
+    return list_operator
+
+
+def explain(
+    graph: Neo4jGraph,
+    query: str,
+    **params,
+) -> dict:
+    # plans are only in the result summary, which Neo4jGraph.query drops
+    with graph._driver.session(database=graph._database) as session:
+        summary = session.run('EXPLAIN ' + query, params).consume()
+    return summary.plan
+
+
+def verify_rel_plan(graph: Neo4jGraph) -> dict[str, list[str]]:
+    # relationship batches whose plan scans all nodes of a label
+    relationship2scan = {}
+    for relationship, head_label, head_property, tail_label, tail_property in REL_SPEC:
+        query = get_rel_batch_query(head_label, head_property, tail_label, tail_property, relationship)
+        list_operator = get_plan_operator(explain(graph, query, rows=[]))
+        list_scan = [i for i in list_operator if i in OPERATOR_SCAN]
+        key = f'{head_label}-{relationship}->{tail_label}'
+        print(f'[{key}]:', ', '.join(list_operator))
+        if len(list_scan) > 0:
+            relationship2scan[key] = list_scan
+    if len(relationship2scan) > 0:
+        print('label scan found in:', relationship2scan)
+    return relationship2scan
+
+
+if __name__ == '__main__':
+    graph = Neo4jGraph(
+        url="bolt://localhost:7687",
+        username="neo4j",
+        password="password",
+        )
+    bootstrap_schema(graph)
+    verify_rel_plan(graph)
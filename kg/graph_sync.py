@@ -0,0 +1,242 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   graph_sync.py
+@Time    :   2024/09/27 22:40:17
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+incremental update of a running graph from data/*.json, instead of
+delete_all and rebuilding everything in graph_building_from_json.py
+every node keeps a hash of its properties in content_hash, only new, changed
+and removed nodes and relationships are written, in batched transactions
+nodes have the same identity as in the full build: the unique property of
+SCHEMA if the label has one, otherwise the content hash, as create_node makes
+a node for every row
+nodes built without content_hash are all updated by the first sync
+'''
+
+import json
+import time
+import hashlib
+
+from langchain_community.graphs import Neo4jGraph
+
+from graph_bulk import load_graph_entity
+from graph_schema import REL_SPEC, SCHEMA
+from graph_utilities import create_rel_batch
+from xref import resolve_all
+
+
+HASH_PROPERTY = 'content_hash'
+
+
+def get_content_hash(property_dict: dict) -> str:
+    s = json.dumps(property_dict, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+
+def run_batch(
+    graph: Neo4jGraph,
+    query: str,
+    list_row: list[dict],
+    batch_size: int = 5000,
+) -> int:
+    # each chunk of batch_size rows is a transaction
+    for i in range(0, len(list_row), batch_size):
+        graph.query(query, rows=list_row[i:i+batch_size])
+    return len(list_row)
+
+
+def get_graph_hash(
+    graph: Neo4jGraph,
+    label: str,
+    unique: str,
+) -> dict:
+    # unique value -> hash of nodes with the unique property
+    query = f'MATCH (n:{label}) WHERE n.{unique} IS NOT NULL RETURN n.{unique} AS key, n.{HASH_PROPERTY} AS hash'
+    return dict((i['key'], i['hash']) for i in graph.query(query))
+
+
+def get_graph_hash_count(
+    graph: Neo4jGraph,
+    label: str,
+    unique: str | None,
+) -> dict[str, int]:
+    # hash -> number of nodes without the unique property, '' for no hash
+    query = f'MATCH (n:{label})'
+    if unique is not None:
+        query += f' WHERE n.{unique} IS NULL'
+    query += f' RETURN coalesce(n.{HASH_PROPERTY}, \'\') AS hash, count(n) AS count'
+    return dict((i['hash'], i['count']) for i in graph.query(query))
+
+
+def sync_node(
+    graph: Neo4jGraph,
+    label: str,
+    list_dict: list[dict],
+    batch_size: int = 5000,
+) -> tuple[dict, list[dict]]:
+    # nodes of a label with a unique property (merged by merge_by_schema) are
+    # matched by it and updated in place; rows without the unique value, and
+    # all rows of a label without one, are matched by content hash and counted,
+    # as the full build creates a node for each row
+    # returns statistics and properties of created nodes, whose
+    # relationships are created again in sync_rel
+    unique = SCHEMA[label]['unique'][0] if len(SCHEMA[label]['unique']) > 0 else None
+    stat = {'created': 0, 'updated': 0, 'deleted': 0, 'no_key': 0}
+    key2property = {}
+    hash2property = {}
+    hash2count = {}
+    for i in list_dict:
+        property_dict = dict(i)
+        property_dict[HASH_PROPERTY] = get_content_hash(i)
+        key = None if unique is None else i.get(unique, None)
+        if key is not None:
+            key2property[key] = property_dict
+            continue
+        if unique is not None:
+            stat['no_key'] += 1
+        hash2property[property_dict[HASH_PROPERTY]] = property_dict
+        hash2count[property_dict[HASH_PROPERTY]] = hash2count.get(property_dict[HASH_PROPERTY], 0) + 1
+    list_created = []
+    list_delete = []
+    if unique is not None:
+        key2hash = get_graph_hash(graph, label, unique)
+        list_upsert = []
+        for key, property_dict in key2property.items():
+            if key not in key2hash:
+                stat['created'] += 1
+                list_created.append(property_dict)
+            elif key2hash[key] != property_dict[HASH_PROPERTY]:
+                stat['updated'] += 1
+            else:
+                continue
+            list_upsert.append({'key': key, 'property': property_dict})
+        # SET n = map also removes properties not in data any more
+        query = '\n'.join([
+            'UNWIND $rows AS row',
+            'MERGE (n:%s {%s: row.key})'%(label, unique),
+            'SET n = row.property',
+        ])
+        run_batch(graph, query, list_upsert, batch_size)
+        list_delete = [{'key': i} for i in key2hash if i not in key2property]
+        query = '\n'.join([
+            'UNWIND $rows AS row',
+            'MATCH (n:%s {%s: row.key})'%(label, unique),
+            'DETACH DELETE n',
+        ])
+        run_batch(graph, query, list_delete, batch_size)
+
+    # nodes matched by content hash, a changed node is deleted and created
+    hash2count_graph = get_graph_hash_count(graph, label, unique)
+    list_create = []
+    for h, count in hash2count.items():
+        for _ in range(count - hash2count_graph.get(h, 0)):
+            list_create.append({'property': hash2property[h]})
+            list_created.append(hash2property[h])
+    list_delete_hash = []
+    for h, count in hash2count_graph.items():
+        if count > hash2count.get(h, 0):
+            list_delete_hash.append({'hash': h, 'count': count - hash2count.get(h, 0)})
+    query = '\n'.join([
+        'UNWIND $rows AS row',
+        'MATCH (n:%s)'%(label),
+        'WHERE coalesce(n.%s, \'\') = row.hash'%(HASH_PROPERTY)
+        + ('' if unique is None else ' AND n.%s IS NULL'%(unique)),
+        'WITH row, collect(n)[..row.count] AS list_n',
+        'UNWIND list_n AS n',
+        'DETACH DELETE n',
+    ])
+    run_batch(graph, query, list_delete_hash, batch_size)
+    query = '\n'.join([
+        'UNWIND $rows AS row',
+        'CREATE (n:%s)'%(label),
+        'SET n = row.property',
+    ])
+    run_batch(graph, query, list_create, batch_size)
+    stat['created'] += len(list_create)
+    stat['deleted'] = len(list_delete) + sum([i['count'] for i in list_delete_hash])
+    return stat, list_created
+
+
+def get_graph_rel(
+    graph: Neo4jGraph,
+    relationship: str,
+    head_label: str, head_property: str,
+    tail_label: str, tail_property: str,
+) -> set[tuple]:
+    query = 'MATCH (head:%s)-[:%s]->(tail:%s) RETURN head.%s AS head, tail.%s AS tail'%(
+        head_label, relationship, tail_label, head_property, tail_property)
+    return set([(i['head'], i['tail']) for i in graph.query(query)])
+
+
+def sync_rel(
+    graph: Neo4jGraph,
+    edge: dict[str, list[tuple]],
+    label2created: dict[str, list[dict]] = {},
+    batch_size: int = 5000,
+) -> dict[str, dict]:
+    # relationships of all label pairs in REL_SPEC are compared,
+    # even if none is left in data
+    # label2created: properties of nodes created by sync_node, pairs with
+    # one of them are merged again, as MATCH in the full build links every
+    # node with the value
+    relationship2stat = {}
+    for relationship, head_label, head_property, tail_label, tail_property in REL_SPEC:
+        pair_data = set()
+        for i in edge.get(relationship, []):
+            if i[0] == head_label and i[4] == tail_label:
+                pair_data.add((i[2], i[6]))
+        pair_graph = get_graph_rel(graph, relationship, head_label, head_property,
+                                   tail_label, tail_property)
+        head_created = set([i.get(head_property, None) for i in label2created.get(head_label, [])])
+        tail_created = set([i.get(tail_property, None) for i in label2created.get(tail_label, [])])
+        pair_relink = set([i for i in pair_data & pair_graph if i[0] in head_created or i[1] in tail_created])
+        list_create = [{'head': i[0], 'tail': i[1]}
+                       for i in sorted((pair_data - pair_graph) | pair_relink, key=str)]
+        list_delete = [{'head': i[0], 'tail': i[1]} for i in sorted(pair_graph - pair_data, key=str)]
+        create_rel_batch(graph, head_label, head_property, tail_label, tail_property,
+                         list_create, relationship, merge=True, batch_size=batch_size)
+        query = '\n'.join([
+            'UNWIND $rows AS row',
+            'MATCH (head:%s {%s: row.head})-[r:%s]->(tail:%s {%s: row.tail})'%(
+                head_label, head_property, relationship, tail_label, tail_property),
+            'DELETE r',
+        ])
+        run_batch(graph, query, list_delete, batch_size)
+        relationship2stat[f'{head_label}-{relationship}->{tail_label}'] = {
+            'created': len(list_create) - len(pair_relink), 'relinked': len(pair_relink),
+            'deleted': len(list_delete)}
+    return relationship2stat
+
+
+def sync_graph(
+    graph: Neo4jGraph,
+    dir_data: str = '../data/',
+    scp_file: str = 'scp.json',
+    batch_size: int = 5000,
+) -> dict:
+    # nodes first, relationships are compared after removed nodes are deleted
+    t_start = time.time()
+    label2entity = load_graph_entity(dir_data, scp_file)
+    edge, _ = resolve_all(label2entity)
+    report = {'node': {}, 'relationship': {}}
+    label2created = {}
+    for label, list_dict in label2entity.items():
+        report['node'][label], label2created[label] = sync_node(graph, label, list_dict, batch_size)
+        print(f'({label}):', report['node'][label])
+    report['relationship'] = sync_rel(graph, edge, label2created, batch_size)
+    for k, v in report['relationship'].items():
+        print(f'[{k}]:', v)
+    print('Sync Time Cost: %.2f sec'%(time.time()-t_start))
+    return report
+
+
+if __name__ == '__main__':
+    graph = Neo4jGraph(
+        url="bolt://localhost:7687",
+        username="neo4j",
+        password="password",
+        )
+    sync_graph(graph)
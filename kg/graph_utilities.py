@@ -8,20 +8,42 @@
 
 IMPORTANT: 不能在查询字符串中直接使用 $head、$relationship 和 $tail 作为变量名称
 传入的参数只能作为 value of property 使用
+graph can also be a LocalGraph of graph_local.py, which needs no neo4j server
 '''
 
 import json
+import time
 from typing import Generator
 
 from langchain_community.graphs import Neo4jGraph
 
+from graph_local import LocalGraph
+
 
 def create_index(
+    graph: Neo4jGraph,
+    label: str,
+    property: str | tuple,
+) -> None:
+    # property: tuple of properties for a composite index
+    if isinstance(graph, LocalGraph):
+        return graph.create_index(label, property)
+    if isinstance(property, str):
+        property = (property, )
+    property = ', '.join([f'n.{i}' for i in property])
+    query = f'CREATE INDEX IF NOT EXISTS FOR (n:{label}) ON ({property})'
+    graph.query(query)
+
+
+def create_constraint(
     graph: Neo4jGraph,
     label: str,
     property: str,
 ) -> None:
-    query = f'CREATE INDEX IF NOT EXISTS FOR (n:{label}) ON (n.{property})'
+    # a uniqueness constraint is also an index of the property
+    if isinstance(graph, LocalGraph):
+        return graph.create_index(label, property)
+    query = f'CREATE CONSTRAINT IF NOT EXISTS FOR (n:{label}) REQUIRE n.{property} IS UNIQUE'
     graph.query(query)
 
 
@@ -32,6 +54,8 @@ def create_node(
     merge: bool = False,
     property_not_null: str = None,
 ) -> None:
+    if isinstance(graph, LocalGraph):
+        return graph.create_node(label, list_property_dict, merge)
     str_property = []
     for key in list_property_dict[0].keys():
         str_property.append(f'{key}: data.{key}')
@@ -55,6 +79,8 @@ def print_schema(graph: Neo4jGraph) -> str:
 
 
 def delete_all(graph: Neo4jGraph) -> None:
+    if isinstance(graph, LocalGraph):
+        return graph.delete_all()
     graph.query('''MATCH (n)
     OPTIONAL MATCH (n)-[r]-()
     DETACH DELETE n, r''')
@@ -68,6 +94,8 @@ def get_node_property(
     label: str = 'Tag',
     property: str = 'tag',
 ) -> list[str]:
+    if isinstance(graph, LocalGraph):
+        return graph.get_node_property(label, property)
     list_dict = graph.query(f'MATCH (n:{label}) RETURN COLLECT(n.{property}) AS result')
     return list_dict[0]['result']
 
@@ -76,6 +104,11 @@ def count_node(
     graph: Neo4jGraph,
     label: str = None,
 ) -> None:
+    if isinstance(graph, LocalGraph):
+        n_node = graph.count_node(label)
+        label = '' if label is None else f':{label}'
+        print(f'(node{label}):', [{'count(node)': n_node}])
+        return None
     label = '' if label is None else f':{label}'
     query = f'''MATCH (node{label})
     RETURN count(node)'''
@@ -95,6 +128,9 @@ def create_rel_multitail(
 ) -> None:
     if len(list_tail_value) == 0:
         return None
+    if isinstance(graph, LocalGraph):
+        return graph.create_rel_multitail(head_label, head_property, head_value, tail_label,
+                                          tail_property, list_tail_value, relationship, merge)
     list_tail_value = [{'value': i} for i in list_tail_value]
     head_value = repr(head_value)
     q_head = 'MATCH (head:%s {%s: %s})'%(head_label, head_property, head_value)
@@ -119,6 +155,9 @@ def create_rel_multihead(
 ) -> None:
     if len(list_head_value) == 0:
         return None
+    if isinstance(graph, LocalGraph):
+        return graph.create_rel_multihead(head_label, head_property, list_head_value, tail_label,
+                                          tail_property, tail_value, relationship, merge)
     list_head_value = [{'value': i} for i in list_head_value]
     tail_value = repr(tail_value)
     q_unwind = 'UNWIND $list_head_value AS head_param'
@@ -130,12 +169,101 @@ def create_rel_multihead(
     graph.query(query, list_head_value=list_head_value)
 
 
+def get_rel_batch_query(
+    head_label: str,
+    head_property: str,
+    tail_label: str,
+    tail_property: str,
+    relationship: str,
+    merge: bool = False,
+) -> str:
+    # count: relationships created, or matched and created by MERGE
+    verb = 'MERGE' if merge else 'CREATE'
+    return '\n'.join([
+        'UNWIND $rows AS row',
+        'MATCH (head:%s {%s: row.head})'%(head_label, head_property),
+        'MATCH (tail:%s {%s: row.tail})'%(tail_label, tail_property),
+        '%s (head)-[:%s]->(tail)'%(verb, relationship),
+        'RETURN count(*) AS count',
+    ])
+
+
+def create_rel_batch(
+    graph: Neo4jGraph,
+    head_label: str = 'ScpObject',
+    head_property: str = 'item_number',
+    tail_label: str = 'Tag',
+    tail_property: str = 'tag',
+    list_pair: list[dict] = [],
+    relationship: str = 'HAS_TAG',
+    merge: bool = False,
+    batch_size: int = 5000,
+) -> int:
+    # list_pair: [{'head': value of head, 'tail': value of tail}]
+    # values are only passed as parameters, so the query is planned once
+    # and each chunk of batch_size pairs is a transaction
+    # returns the number of relationships created
+    if len(list_pair) == 0:
+        return 0
+    t_start = time.time()
+    if isinstance(graph, LocalGraph):
+        n_rel = graph.create_rel_batch(head_label, head_property, tail_label, tail_property,
+                                       list_pair, relationship, merge)
+        print_throughput(relationship, len(list_pair), n_rel, time.time() - t_start)
+        return n_rel
+    query = get_rel_batch_query(head_label, head_property, tail_label, tail_property,
+                                relationship, merge)
+    n_rel = 0
+    for i in range(0, len(list_pair), batch_size):
+        n_rel += graph.query(query, rows=list_pair[i:i+batch_size])[0]['count']
+    print_throughput(relationship, len(list_pair), n_rel, time.time() - t_start)
+    return n_rel
+
+
+async def create_rel_batch_async(
+    client,
+    head_label: str = 'ScpObject',
+    head_property: str = 'item_number',
+    tail_label: str = 'Tag',
+    tail_property: str = 'tag',
+    list_pair: list[dict] = [],
+    relationship: str = 'HAS_TAG',
+    merge: bool = False,
+    batch_size: int = 5000,
+) -> int:
+    # client: GraphClient in graph_client.py, batches of several
+    # relationships can be submitted together with client.submit
+    if len(list_pair) == 0:
+        return 0
+    query = get_rel_batch_query(head_label, head_property, tail_label, tail_property,
+                                relationship, merge)
+    t_start = time.time()
+    list_result = await client.write_batch(query, list_pair, batch_size)
+    n_rel = sum([i[0]['count'] for i in list_result])
+    print_throughput(relationship, len(list_pair), n_rel, time.time() - t_start)
+    return n_rel
+
+
+def print_throughput(
+    relationship: str,
+    n_pair: int,
+    n_rel: int,
+    t_cost: float,
+) -> None:
+    print(f'[{relationship}]: {n_rel} created from {n_pair} pairs in {t_cost:.2f} sec, '
+          f'{n_rel/max(t_cost, 1e-6):.0f} relationships/sec')
+
+
 def count_rel(
     graph: Neo4jGraph,
     head: str = None,
     relationship: str = None,
     tail: str = None,
 ) -> None:
+    if isinstance(graph, LocalGraph):
+        print(f'relationship=({head})-[{relationship}]->({tail}):',
+              [{'count(relationship)': graph.count_rel(head, relationship, tail)}])
+        return None
     query = f"""MATCH relationship=(head:{head})-[r:{relationship}]->(tail:{tail})
     RETURN count(relationship)"""
     print(f'relationship=({head})-[{relationship}]->({tail}):', 
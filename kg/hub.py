@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   hub.py
+@Time    :   2024/09/18 21:05:16
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+hub pages parsed once for all entity parsers
+div#page-content of a hub is cached in memory and on disk, keyed by mtime
+'''
+
+import os
+import json
+import hashlib
+
+from scrapy import Selector
+
+
+DIR_HUB_CACHE = '../data/hub_cache/'
+# (path, css, mtime, size) -> Selector
+HUB_MEMORY: dict[tuple, Selector] = {}
+
+
+def load_hub(
+    html_file: str,
+    css: str | None = 'div#page-content',
+    dir_cache: str = DIR_HUB_CACHE,
+) -> Selector:
+    # css: element cached for the hub, None for the whole page
+    # whole pages are only cached in memory, they are as large as the html file
+    stat = os.stat(html_file)
+    path = os.path.abspath(html_file)
+    key = (path, css, stat.st_mtime_ns, stat.st_size)
+    if key in HUB_MEMORY:
+        return HUB_MEMORY[key]
+    if css is None:
+        with open(html_file) as f:
+            selector = Selector(text=f.read())
+        HUB_MEMORY[key] = selector
+        return selector
+
+    cache_json = os.path.join(dir_cache, hashlib.sha1(repr((path, css)).encode('utf-8')).hexdigest() + '.json')
+    cache = None
+    if os.path.exists(cache_json):
+        with open(cache_json) as f:
+            cache = json.load(f)
+        if cache['mtime'] != stat.st_mtime_ns or cache['size'] != stat.st_size:
+            cache = None
+    if cache is None:
+        with open(html_file) as f:
+            html = Selector(text=f.read()).css(css)[0].extract()
+        cache = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'html': html}
+        os.makedirs(dir_cache, exist_ok=True)
+        cache_tmp = f'{cache_json}.{os.getpid()}.tmp'
+        with open(cache_tmp, 'w') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(cache_tmp, cache_json)
+    selector = Selector(text=cache['html']).css(css)[0]
+    HUB_MEMORY[key] = selector
+    return selector
@@ -0,0 +1,180 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   iframe.py
+@Time    :   2024/09/14 15:26:41
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+offline contents of iframes in wikidot pages
+iframe src is looked up in the local mirror or a pre-fetched cache directory,
+downloading is a separate batch step (prefetch_iframe), never done while parsing
+'''
+
+import re
+import os
+import hashlib
+from html import unescape
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
+from scrapy import Selector
+
+from utilities import DIR_WIKIDOT
+from page_tree import drop_element
+
+
+DIR_IFRAME = '../data/iframe/'
+PATTERN_IFRAME_SRC = re.compile(rb'<iframe\b[^>]*?\bsrc="([^"]+)"', re.I)
+
+
+def get_iframe_cache_path(
+    src: str,
+    dir_iframe: str = DIR_IFRAME,
+) -> str:
+    return os.path.join(dir_iframe, hashlib.sha1(src.encode('utf-8')).hexdigest() + '.html')
+
+
+def get_iframe_path(
+    src: str | None,
+    html_file: str,
+    dir_wikidot: str = DIR_WIKIDOT,
+    dir_iframe: str = DIR_IFRAME,
+) -> str | None:
+    if src is None or src.startswith('javascript:'):
+        return None
+    list_path = []
+    url = urlsplit(src)
+    if url.scheme in ['http', 'https']:
+        # mirrored host is a sibling directory of the wikidot mirror
+        path = url.path
+        if path == '' or path.endswith('/'):
+            path += 'index.html'
+        list_path.append(os.path.join(os.path.dirname(os.path.normpath(dir_wikidot)), url.netloc, path.lstrip('/')))
+        list_path.append(get_iframe_cache_path(src, dir_iframe))
+    elif url.scheme == '':
+        list_path.append(os.path.join(os.path.dirname(html_file), url.path))
+    for i in list_path:
+        i = os.path.normpath(i)
+        if os.path.isfile(i):
+            return i
+    return None
+
+
+def merge_iframe(
+    content: etree._Element,
+    html_file: str,
+    dir_wikidot: str = DIR_WIKIDOT,
+    dir_iframe: str = DIR_IFRAME,
+    n_char_min: int = 300,
+) -> int:
+    # replace iframes in div#page-content with their local contents
+    # only when there is too little text extracted
+    if len(content.xpath('string(.)')) >= n_char_min:
+        return 0
+    n_merged = 0
+    for iframe in content.xpath('*/iframe'):
+        path = get_iframe_path(iframe.get('src'), html_file, dir_wikidot, dir_iframe)
+        if path is None:
+            continue
+        with open(path, errors='ignore') as f:
+            doc = Selector(text=f.read())
+        n_merged += 1
+        # if div#doc exists, page content is always in div#doc
+        # only 3 scp objects in iframe-div#doc...
+        div_doc = doc.css('div#doc')
+        if len(div_doc) > 0:
+            for child in list(content):
+                content.remove(child)
+            content.text = None
+            content.append(div_doc[0].root)
+            break
+        body = doc.xpath('//body')
+        root = body[0].root if len(body) > 0 else doc.root
+        # contents become a div next to the parent of iframe, a div in <p> is
+        # split out by html parser anyway, same result in both parse modes
+        div = content.makeelement('div', {})
+        div.text = root.text
+        div.extend(list(root))
+        parent = iframe.getparent()
+        drop_element(iframe)
+        parent.addnext(div)
+    return n_merged
+
+
+def get_iframe_src(data: bytes) -> list[str]:
+    # src attributes of iframes, unescaped as iframe.get('src') in merge_iframe
+    return [unescape(i.decode('utf-8', errors='ignore')) for i in PATTERN_IFRAME_SRC.findall(data)]
+
+
+def scan_iframe_src(html_file: str) -> list[str]:
+    with open(html_file, 'rb') as f:
+        return get_iframe_src(f.read())
+
+
+def hash_iframe(
+    html_file: str,
+    data: bytes,
+    dir_wikidot: str = DIR_WIKIDOT,
+    dir_iframe: str = DIR_IFRAME,
+) -> str | None:
+    # hash of the local files of all iframes in data, the bytes of html_file
+    # None if there is no iframe, a missing file is hashed as its src only
+    list_src = get_iframe_src(data)
+    if len(list_src) == 0:
+        return None
+    h = hashlib.sha1()
+    for src in list_src:
+        h.update(src.encode('utf-8') + b'\0')
+        path = get_iframe_path(src, html_file, dir_wikidot, dir_iframe)
+        if path is not None:
+            with open(path, 'rb') as f:
+                h.update(hashlib.sha1(f.read()).digest())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def download_iframe(
+    src: str,
+    dir_iframe: str = DIR_IFRAME,
+    timeout: float = 10,
+) -> bool:
+    try:
+        content = urlopen(src, timeout=timeout).read()
+    except Exception:
+        return False
+    path = get_iframe_cache_path(src, dir_iframe)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(content)
+    os.replace(path + '.tmp', path)
+    return True
+
+
+def prefetch_iframe(
+    list_html: list[list[str]],
+    dir_wikidot: str = DIR_WIKIDOT,
+    dir_iframe: str = DIR_IFRAME,
+    download: bool = False,
+    n_thread: int = 16,
+    timeout: float = 10,
+) -> dict:
+    # batch step before save_page: find iframes that cannot be resolved locally
+    # and download them into dir_iframe concurrently if download is True
+    src_missing = set()
+    n_src = 0
+    for i in list_html:
+        for html_file in i:
+            for src in scan_iframe_src(html_file):
+                n_src += 1
+                if get_iframe_path(src, html_file, dir_wikidot, dir_iframe) is None:
+                    if urlsplit(src).scheme in ['http', 'https']:
+                        src_missing.add(src)
+    n_downloaded = 0
+    if download and len(src_missing) > 0:
+        os.makedirs(dir_iframe, exist_ok=True)
+        with ThreadPoolExecutor(n_thread) as pool:
+            n_downloaded = sum(pool.map(lambda x: download_iframe(x, dir_iframe, timeout), sorted(src_missing)))
+    print(f'#iframe: {n_src}, missing locally: {len(src_missing)}, downloaded: {n_downloaded}')
+    return {'n_src': n_src, 'n_missing': len(src_missing), 'n_downloaded': n_downloaded}
@@ -10,23 +10,38 @@ parse pages of wikidot
 '''
 import re
 import os
+from copy import deepcopy
 from pathlib import Path
-from urllib.request import urlopen
 import json
-import logging
+import hashlib
+import tempfile
+from typing import Generator, Iterable
 
 from joblib import Parallel, delayed
+from lxml import etree
 from scrapy import Selector
 from scrapy.selector import SelectorList
 import opencc
 converter = opencc.OpenCC('t2s')
-import cssutils
 # import timeout_decorator
 
-from utilities import DIR_WIKIDOT, strip_address, xstr, xhref
+from utilities import DIR_WIKIDOT, strip_address, xstr, xhref, save_json
+from page_tree import remove_css, unfold_colmod_tree, wrap_text_tree
+from page_tree import flatten_table_tree, get_link_tree, unfold_tree, tree_str, tree_html
+from page_tree import compile_prefix, group_block_tree
+from parallel import run_chunk
+from page_cache import PageCache
+from tag_index import scan_tag, find_html_by_tag
+from style_cache import StyleCache, split_style_class
+from iframe import merge_iframe, prefetch_iframe, hash_iframe
 
 
 XPATH_CONTENT = './/div[@id="page-content"]'
+# class prefix of blocks without keyword text -> key in ScpObject
+BLBF_PREFIX = [
+    ('blbf-special-containment-procedures', 'special_containment_procedure'),
+    ('blbf-description', 'description'),
+]
 LINK_EXCLUDE = set()
 LINK_EXCLUDE.add('classification-committee-memo.html')
 
@@ -89,10 +104,18 @@ BLOCK_CLOSE = [
     '<blockquote>',
     '<div style=',    
 ]
+BLOCK_START_COMPILED = [compile_prefix(i) for i in BLOCK_START]
+BLOCK_CLOSE_COMPILED = [compile_prefix(i) for i in BLOCK_CLOSE]
 
 QUOTE_START = ('“', '「', '[', '【', '{', '‘', '<', '《', '(', '（', '"')
 QUOTE_END = ('”', '」', ']', '】', '}', '’', '>', '》', ')', '）', '"')
 DICT_QUOTE = dict([(s, e) for s, e in zip(QUOTE_START, QUOTE_END)])
+# shared by all pages parsed in the same process
+STYLE_CACHE = StyleCache()
+# version of the page dict, increased when parsing gives a different output
+# 2: blbf added, 3: tag and class_stop sorted
+# cached pages of another version or mode are parsed again
+PAGE_VERSION = 3
         
 
 class Page(object):
@@ -100,12 +123,21 @@ class Page(object):
         self, 
         html_file: str = None,
         dict_json: dict = None,
+        single_parse: bool = False,
+        detect_border: bool = False,
     ) -> None:
         assert html_file is not None or dict_json is not None
+        # single_parse: parse html only once, all removals and replacements
+        # are done in the lxml tree of div#page-content
+        self.single_parse = single_parse
+        # detect_border: classes with border in <style> also stop unfolding
+        self.detect_border = detect_border
+        self.content_prepared = False
         if dict_json is not None:
             for k, v in dict_json.items():
                 setattr(self, k, v)
         else:
+            self.html_file = html_file
             self.address = strip_address(html_file)
             with open(html_file) as f:
                 self.pagedata = Selector(text=f.read())
@@ -118,33 +150,76 @@ class Page(object):
             self.tag.add(i.xpath('string(.)').extract_first())
 
 
+    def update_class_stop(self) -> None:
+        # class of div that has css property border
+        # used to determind blocks of text
+        # only .alt-block as in the original parser, unless detect_border
+        # see parse_style_border
+        style_valid = parse_style_border(self.pagedata, detect_border=self.detect_border)
+        self.class_stop = set([i[1:] for i in style_valid if i.startswith('.')])
+        # self.class_stop = set()
+        self.class_stop.add('blockquote')
+
+
+    def prepare_content(self) -> etree._Element | None:
+        # single_parse only: unfold colmod, wrap raw text and remove nodes 
+        # in the tree of div#page-content, shared by update_link and update_text_block
+        if self.content_prepared:
+            return self.content
+        self.content_prepared = True
+        # <style> must be parsed before being removed
+        self.update_class_stop()
+        self.content = None
+        all_content = self.pagedata.xpath(XPATH_CONTENT)
+        # 没有页面内容
+        if len(all_content) == 0:
+            return None
+        self.content = all_content[0].root
+        unfold_colmod_tree(self.content)
+        wrap_text_tree(self.content)
+        # iframe contents from local mirror or iframe cache, see iframe.py
+        merge_iframe(self.content, self.html_file)
+        # 移除不属于正文的节点
+        remove_css(self.content, CSS_REMOVE)
+        return self.content
+
+
     def update_link(self) -> None:
         self.link: list[str] = []
+        if self.single_parse:
+            content = self.prepare_content()
+            if content is not None:
+                self.link = get_link_tree(content, LINK_EXCLUDE)
+            return None
         all_content = self.pagedata.xpath(XPATH_CONTENT)
-        all_content_text = all_content.extract_first()
         # 没有页面内容
-        if all_content_text is None:
+        if len(all_content) == 0:
             return None
-        # 移除不属于正文的节点
-        for i in CSS_REMOVE:
-            for j in all_content.css(i).extract():
-                all_content_text = all_content_text.replace(j, '')
-        all_link = Selector(text=all_content_text).xpath(XPATH_CONTENT + '/descendant::*/a/@href').extract()[::-1]
-        all_link_text = Selector(text=all_content_text).xpath(XPATH_CONTENT + '/descendant::*/a').xpath('string(.)').extract()[::-1]
-        for l, t in zip(all_link, all_link_text):
-            if l[-5:]=='.html' and l not in LINK_EXCLUDE:
-                self.link.append({'link': l[:-5], 'text': t})
+        # 移除不属于正文的节点, in a copy so that pagedata is kept for update_text_block
+        content = deepcopy(all_content[0].root)
+        remove_css(content, CSS_REMOVE)
+        self.link = get_link_tree(content, LINK_EXCLUDE)
+
+
+    def update_blbf(self) -> None:
+        # div.blbf-special-containment-procedures and div.blbf-description
+        # blocks with no keyword text, the last one of each kind is kept
+        # must be called before the tree of div#page-content is modified
+        self.blbf: dict[str, str] = {}
+        for i in self.pagedata.xpath(XPATH_CONTENT + '/*/div')[::-1]:
+            div_class = i.root.get('class')
+            if not isinstance(div_class, str):
+                continue
+            for prefix, key in BLBF_PREFIX:
+                if key not in self.blbf and div_class.startswith(prefix):
+                    self.blbf[key] = i.xpath('string(.)').extract_first().replace('\n', '')
 
 
     def update_text_block(self) -> None:
         self.text_block: list[str] = []
-        # class of div that has css property border
-        # used to determind blocks of text
-        # TODO: slow for joblib parallelization
-        style_valid = parse_style_border(self.pagedata)
-        self.class_stop = set([i[1:] for i in style_valid if i.startswith('.')])
-        # self.class_stop = set()
-        self.class_stop.add('blockquote')
+        if self.single_parse:
+            return self.update_text_block_tree()
+        self.update_class_stop()
 
         # TODO: corner case: scp-6013
         all_content = self.pagedata.xpath(XPATH_CONTENT)
@@ -165,33 +240,19 @@ class Page(object):
                 all_content_text = all_content_text.replace(i, f'<p>{i}</p>')
         # print(all_content_text)
 
-        # 下载iframe标签所指向的html文件
-        # download contents in iframe link, then write them in all_content_text
-        # only download when there is too little text extracted
-        # downloading from internet will make the parsing procedure obviously slower
-        # if len(all_content.xpath('string(.)').extract_first()) < 300:
-        #     for i in self.pagedata.xpath(XPATH_CONTENT + '/*/iframe'):
-        #         src = i.xpath('@src').extract_first()
-        #         try:
-        #             content = urlopen(src).read().decode()
-        #             # if div#doc exists, page content is always in div#doc
-        #             # only 3 scp objects in iframe-div#doc...
-        #             if '<div id="doc"' in content:
-        #                 print('iframe doc found')
-        #                 all_content_text = Selector(text=content).css('div#doc').extract_first()
-        #                 break
-        #             all_content_text = all_content_text.replace(i.extract(), content)
-        #         except Exception:
-        #             pass
-        #     all_content = Selector(text=all_content_text)
+        # iframe标签所指向的html文件
+        # contents in iframe are looked up in local mirror or iframe cache
+        # only when there is too little text extracted, see iframe.py
+        # downloading from internet is done before parsing by iframe.prefetch_iframe
 
         # print(all_content)
         # 移除不属于应生成文本的节点
-        for i in CSS_REMOVE:
-            for j in all_content.css(i).extract():
-                all_content_text = all_content_text.replace(j, '')
-
-        all_content = Selector(text=all_content_text).xpath('*')
+        all_content = Selector(text=all_content_text)
+        if '<iframe' in all_content_text:
+            merge_iframe(all_content.xpath(XPATH_CONTENT)[0].root, self.html_file)
+        remove_css(all_content.root, CSS_REMOVE)
+        all_content_text = tree_html(all_content.root)
+        all_content = all_content.xpath('*')
         
         # 将表格中的每一行分别合并成一个字符串，以 '【】' 表示每行的开始和结束
         # 以 '|' 分隔每列, 以 '; ' 分隔每列中的换行
@@ -214,54 +275,86 @@ class Page(object):
         if len(list_unfolded) == 0:
             return None
 
-        # 按标签区分block
-        last_block_finished = True
-        list_block = []
-        for i in list_unfolded:
-            start = False
-            for j in BLOCK_START:
-                if i.startswith(j):
-                    start = True
-                    break
-            close = False
-            for j in BLOCK_CLOSE:
-                if i.startswith(j):
-                    close = True
-                    break
-            if close or start:
-                list_block.append(i)
-            else:
-                if last_block_finished:
-                    list_block.append(i)
-                else:
-                    list_block[-1] += '\n'+i
-            last_block_finished = close
-        
+        self.text_block = merge_block(group_block(list_unfolded))
+
+
+    def update_text_block_tree(self) -> None:
         self.text_block: list[str] = []
-        pattern = r'\s*\n+\s*'
-        pattern_colon = r'[:：]$'
-        for idx, i in enumerate(list_block):
-            i = xstr(Selector(text=i)).strip()
-            if i != '':
-                i = re.sub(pattern, '\n', i)
-                if len(self.text_block) == 0:
-                    self.text_block.append(i)
-                else:
-                    if re.match(pattern_colon, self.text_block[-1]) is None:
-                        self.text_block.append(i)
-                    else:
-                        self.text_block[-1] += '\n'+i
+        content = self.prepare_content()
+        # 没有页面内容
+        if content is None:
+            return None
+        flatten_table_tree(content)
+        # 展开所有div元素，直到div元素的css-style具有border特性
+        list_unfolded = unfold_tree(content, self.class_stop)
+        # 没有页面内容
+        if len(list_unfolded) == 0:
+            return None
+        # blocks are classified by tag and attributes of elements
+        # text is read from the elements, no fragment is serialized or parsed again
+        list_block = group_block_tree(list_unfolded, BLOCK_START_COMPILED, BLOCK_CLOSE_COMPILED)
+        self.text_block = merge_text(['\n'.join([tree_str(j) for j in i]) for i in list_block])
 
 
     def get_dict(self) -> dict:
         d = vars(self)
         d.pop('pagedata', None)
+        for k in ['single_parse', 'detect_border', 'content_prepared', 'content', 'html_file']:
+            d.pop(k, None)
         # d.pop('text_block', None)
-        d['tag'] = list(d['tag'])
-        d['class_stop'] = list(d['class_stop'])
+        d['tag'] = sorted(d['tag'])
+        d['class_stop'] = sorted(d['class_stop'])
         return d
 
 
+def group_block(list_unfolded: list[str]) -> list[str]:
+    # 按标签区分block
+    last_block_finished = True
+    list_block = []
+    for i in list_unfolded:
+        start = False
+        for j in BLOCK_START:
+            if i.startswith(j):
+                start = True
+                break
+        close = False
+        for j in BLOCK_CLOSE:
+            if i.startswith(j):
+                close = True
+                break
+        if close or start:
+            list_block.append(i)
+        else:
+            if last_block_finished:
+                list_block.append(i)
+            else:
+                list_block[-1] += '\n'+i
+        last_block_finished = close
+    return list_block
+
+
+def merge_text(list_text: list[str]) -> list[str]:
+    text_block = []
+    pattern = re.compile(r'\s*\n+\s*')
+    pattern_colon = re.compile(r'[:：]$')
+    for i in list_text:
+        i = i.strip()
+        if i != '':
+            i = pattern.sub('\n', i)
+            if len(text_block) == 0:
+                text_block.append(i)
+            else:
+                if pattern_colon.match(text_block[-1]) is None:
+                    text_block.append(i)
+                else:
+                    text_block[-1] += '\n'+i
+    return text_block
+
+
+def merge_block(list_block: list[str]) -> list[str]:
+    return merge_text([xstr(Selector(text=i)) for i in list_block])
+
+
 def tc2sc(s: str) -> str:
     return converter.convert(s)
 
@@ -274,9 +367,8 @@ def scan_html_single(
     i = path
     if not i.endswith('.html'):
         return None
-    if len(tag) > 0:
-        page = Page(dir_wikidot+i)
-        if not tag.issubset(page.tag):
+    if tag is not None and len(tag) > 0:
+        if not tag.issubset(scan_tag(dir_wikidot+i)):
             return None
     list_html_object = [dir_wikidot + i]
     dir_scp = Path(dir_wikidot + i[:-5])
@@ -293,11 +385,17 @@ def scan_html(
     tag: list[str] = ['scp'],
     dir_wikidot: str = '../SCP-CN/scp-wiki-cn.wikidot.com/',
     n_limit: int = None,
+    tag_index_json: str = '../data/tag_index.json',
 ) -> list[list[str]]:
     print('Scanning HTML')
     if tag is not None:
         tag = set(tag)
-    args = [(dir_wikidot, i, tag) for i in os.listdir(dir_wikidot)]
+    if tag is None or len(tag) == 0:
+        list_file = os.listdir(dir_wikidot)
+    else:
+        # lookup in address->tags index, html files are not parsed here
+        list_file = find_html_by_tag(tag, dir_wikidot, tag_index_json)
+    args = [(dir_wikidot, i, None) for i in list_file]
     pool = Parallel(-1)
     list_html = []
     for j in pool(delayed(scan_html_single)(*i) for i in args):
@@ -309,37 +407,278 @@ def scan_html(
     return list_html
 
 
-def get_page_dict(list_html: list[str]) -> list[dict]:
+def get_page_dict(
+    list_html: list[str],
+    single_parse: bool = False,
+    detect_border: bool = False,
+) -> list[dict]:
     list_dict = []
     for i in list_html:
-        page = Page(i)
+        page = Page(i, single_parse=single_parse, detect_border=detect_border)
+        page.update_blbf()
         page.update_link()
         page.update_text_block()
         list_dict.append(page.get_dict())
     return list_dict
 
 
+def get_html_size(list_html: list[str]) -> int:
+    # estimation of parsing cost of a page group
+    return sum([os.path.getsize(i) for i in list_html])
+
+
+def get_page_mode(
+    single_parse: bool = False,
+    detect_border: bool = False,
+) -> str:
+    # mode column of the page cache
+    mode = '%d:%s'%(PAGE_VERSION, 'single_parse' if single_parse else 'legacy')
+    if detect_border:
+        mode += ':detect_border'
+    return mode
+
+
+def hash_page_file(html_file: str) -> str:
+    # content hash of html file, and of the local files of its iframes if any
+    # a newly prefetched or changed iframe is parsed again, see iframe.py
+    with open(html_file, 'rb') as f:
+        data = f.read()
+    h = hashlib.sha1(data).hexdigest()
+    h_iframe = hash_iframe(html_file, data)
+    return h if h_iframe is None else f'{h}:{h_iframe}'
+
+
+def get_page_dict_cached(
+    list_html: list[str],
+    path2hash: dict[str, str],
+    single_parse: bool = False,
+    detect_border: bool = False,
+) -> list[tuple[str, str, dict | None]]:
+    # page dict is None if the html file is not modified since it was cached
+    list_row = []
+    for i in list_html:
+        h = hash_page_file(i)
+        if path2hash.get(i, None) == h:
+            list_row.append((i, h, None))
+        else:
+            list_row.append((i, h, get_page_dict([i], single_parse, detect_border)[0]))
+    return list_row
+
+
+def iter_page_cached(
+    list_html: list[list[str]],
+    change: dict[str, list[str]],
+    cache_db: str = '../data/page.cache.sqlite',
+    single_parse: bool = False,
+    n_jobs: int = -1,
+    n_chunk: int = None,
+    prune: bool = False,
+    detect_border: bool = False,
+    batch_size: int = 500,
+) -> Generator[tuple[int, list[dict]], None, None]:
+    # yield (index of page group, page dicts) as soon as a chunk is finished
+    # addresses of added, modified and removed pages are put in change
+    # prune: list_html is a full scan, html files that are cached but not in
+    # list_html are treated as removed and deleted from the cache, not for
+    # runs with n_limit or a tag filter
+    # html files cached by another mode are parsed again as modified
+    mode = get_page_mode(single_parse, detect_border)
+    cache = PageCache(cache_db)
+    path2key = cache.get_hash()
+    path2hash = dict((k, h) for k, (h, m) in path2key.items() if m == mode)
+    list_arg = [(j, {k: path2hash[k] for k in j if k in path2hash}, single_parse, detect_border) for j in list_html]
+    list_weight = [get_html_size(j) for j in list_html]
+    for k in ['added', 'modified', 'removed']:
+        change[k] = []
+    n_unchanged = 0
+    list_row_parsed = []
+    for idx, list_row in run_page_chunk(get_page_dict_cached, list_arg, list_weight, n_jobs, n_chunk):
+        list_path_unchanged = [p for p, h, d in list_row if d is None]
+        for path, h, d in list_row:
+            if d is not None:
+                list_row_parsed.append((path, h, d))
+                key = 'modified' if path in path2key else 'added'
+                change[key].append(strip_address(path))
+        if len(list_row_parsed) >= batch_size:
+            cache.update(list_row_parsed, mode)
+            list_row_parsed = []
+        n_unchanged += len(list_path_unchanged)
+        path2page = cache.get_page(list_path_unchanged)
+        yield idx, [path2page[p] if d is None else d for p, h, d in list_row]
+    cache.update(list_row_parsed, mode)
+    if prune:
+        set_path = set([j for i in list_html for j in i])
+        list_path_removed = [i for i in path2key.keys() if i not in set_path]
+        change['removed'] = [strip_address(i) for i in list_path_removed]
+        cache.remove(list_path_removed)
+    cache.close()
+    print('#Page added: %d, modified: %d, removed: %d, unchanged: %d'%(
+        len(change['added']), len(change['modified']), 
+        len(change['removed']), n_unchanged))
+
+
+def parse_page_cached(
+    list_html: list[list[str]],
+    cache_db: str = '../data/page.cache.sqlite',
+    single_parse: bool = False,
+    n_jobs: int = -1,
+    n_chunk: int = None,
+    prune: bool = False,
+    detect_border: bool = False,
+) -> tuple[list[list[dict]], dict]:
+    change = {}
+    result = [None] * len(list_html)
+    for idx, i in iter_page_cached(
+        list_html, change, cache_db, single_parse, n_jobs, n_chunk, prune, detect_border):
+        result[idx] = i
+    return result, change
+
+
+def save_page_change(
+    change: dict | None,
+    change_json: str = '../data/page.change.json',
+) -> None:
+    # report of pages changed since the last cached run, scp.save_all_scp
+    # compares hashes of pages instead, see scp.hash_page_group
+    # without cache nothing is known, the file is removed
+    if change_json is None:
+        return None
+    if change is not None:
+        save_json(change, change_json)
+    elif os.path.exists(change_json):
+        os.remove(change_json)
+
+
 def save_page(
     list_html: list[list[str]],
     page_json: str = '../data/page.scp.json',
+    single_parse: bool = False,
+    cache_db: str = None,
+    change_json: str = '../data/page.change.json',
+    n_jobs: int = -1,
+    n_chunk: int = None,
+    prune: bool = False,
+    detect_border: bool = False,
 ) -> list[dict]:
     print('Parsing all Pages')
-    pool = Parallel(-1)
-    result = [i for i in pool(delayed(get_page_dict)(j) for j in list_html)]
+    STYLE_CACHE.reset_stat()
+    # removed first, pages are cached before the run is finished
+    save_page_change(None, change_json)
+    if cache_db is None:
+        list_arg = [(j, single_parse, detect_border) for j in list_html]
+        list_weight = [get_html_size(j) for j in list_html]
+        result = [None] * len(list_html)
+        for idx, i in run_page_chunk(get_page_dict, list_arg, list_weight, n_jobs, n_chunk):
+            result[idx] = i
+    else:
+        result, change = parse_page_cached(
+            list_html, cache_db, single_parse, n_jobs, n_chunk, prune, detect_border)
+        save_page_change(change, change_json)
     with open(page_json, 'w') as f:
         s = json.dumps(result, ensure_ascii=False, indent=2)
         # TODO: only convert text_block
         s = converter.convert(s)
         f.write(s)
         # json.dump(result, f, ensure_ascii=False, indent=2)
+    STYLE_CACHE.print_stat()
     print('All Page objects Parsed and Saved')   
     return result 
 
 
+def open_ndjson(
+    page_ndjson: str,
+    mode: str = 'r',
+):
+    # *.ndjson.zst is compressed by zstandard, one page group per line
+    if page_ndjson.endswith('.zst'):
+        import zstandard
+        return zstandard.open(page_ndjson, mode+'t', encoding='utf-8')
+    return open(page_ndjson, mode, encoding='utf-8')
+
+
+def tc2sc_page_dict(d: dict) -> dict:
+    # convert text_block only, instead of the whole json string
+    d['text_block'] = [tc2sc(i) for i in d['text_block']]
+    return d
+
+
+def write_page_ndjson(
+    list_page_dict: Iterable[tuple[int, list[dict]]],
+    page_ndjson: str = '../data/page.scp.ndjson',
+) -> int:
+    # (index, page group) in any order, such as order of completion
+    # lines are spooled to a temporary file next to page_ndjson, then written
+    # in order of index, so the output is the same in every run
+    idx2line = {}
+    dir_spool = os.path.dirname(os.path.abspath(page_ndjson))
+    with tempfile.TemporaryFile(dir=dir_spool) as f_spool:
+        for idx, i in list_page_dict:
+            i = [tc2sc_page_dict(j) for j in i]
+            line = (json.dumps(i, ensure_ascii=False) + '\n').encode('utf-8')
+            idx2line[idx] = (f_spool.tell(), len(line))
+            f_spool.write(line)
+        with open_ndjson(page_ndjson, 'w') as f:
+            for idx in sorted(idx2line):
+                offset, size = idx2line[idx]
+                f_spool.seek(offset)
+                f.write(f_spool.read(size).decode('utf-8'))
+    return len(idx2line)
+
+
+def save_page_ndjson(
+    list_html: list[list[str]],
+    page_ndjson: str = '../data/page.scp.ndjson',
+    single_parse: bool = False,
+    cache_db: str = None,
+    change_json: str = '../data/page.change.json',
+    n_jobs: int = -1,
+    n_chunk: int = None,
+    prune: bool = False,
+    detect_border: bool = False,
+) -> int:
+    # page groups are not kept in memory, they are spooled as soon as they
+    # are parsed or read from cache, and written in order of list_html
+    print('Parsing all Pages')
+    STYLE_CACHE.reset_stat()
+    # removed first, pages are cached before the run is finished
+    save_page_change(None, change_json)
+    if cache_db is None:
+        list_arg = [(j, single_parse, detect_border) for j in list_html]
+        list_weight = [get_html_size(j) for j in list_html]
+        n_group = write_page_ndjson(
+            run_page_chunk(get_page_dict, list_arg, list_weight, n_jobs, n_chunk), page_ndjson)
+    else:
+        change = {}
+        n_group = write_page_ndjson(
+            iter_page_cached(list_html, change, cache_db, single_parse, n_jobs, n_chunk, prune, detect_border),
+            page_ndjson)
+        save_page_change(change, change_json)
+    STYLE_CACHE.print_stat()
+    print('All Page objects Parsed and Saved')
+    return n_group
+
+
+def iter_page_from_ndjson(
+    page_ndjson: str = '../data/page.scp.ndjson',
+    tag: str = None,
+) -> Generator[list[Page], None, None]:
+    tag_quoted = None if tag is None else json.dumps(tag, ensure_ascii=False)
+    with open_ndjson(page_ndjson) as f:
+        for line in f:
+            # skip lines without tag before decoding the json
+            if tag_quoted is not None and tag_quoted not in line:
+                continue
+            i = json.loads(line)
+            if tag is None or tag in i[0]['tag']:
+                yield [Page(dict_json=j) for j in i]
+
+
 def get_page_from_json(
     page_json: str = '../data/page.scp.json',
     tag: str = None,
 ) -> list[list[Page]]:
+    if '.ndjson' in page_json:
+        return list(iter_page_from_ndjson(page_json, tag))
     with open(page_json) as f:
         list_page_all = json.load(f)
     list_page = []
@@ -352,70 +691,45 @@ def get_page_from_json(
     return list_page
 
 
-def split_style_class(selector_text: str) -> list[str]:
-    operation = set('~+>')
-    list_name = []
-    name = ''
-    for idx_k, k in enumerate(selector_text):
-        if k == ' ':
-            k_left = selector_text[idx_k-1]
-            k_right = selector_text[idx_k+1]
-            if k_right in operation:
-                pass
-            else:
-                if k_left in operation:
-                    pass
-                # seperation of two class
-                else:
-                    list_name.append(name.strip())
-                    name = ''
-        elif k == ',':
-            continue
-        name += k
-    list_name.append(name.strip())
-    return list_name
-
-
 def parse_style_border(
     pagedata: Selector,
-    # dir_wikidot: str = DIR_WIKIDOT,
     style_valid: set = set(['.alt-block']),
+    detect_border: bool = False,
 ) -> set[str]:
-    cssutils.log.setLevel(logging.FATAL)
-    list_rule = []
+    # style_valid is copied, the default set is shared by all calls
+    style_valid = set(style_valid)
+    # the original parser never found classes in <style>: the css text was
+    # shadowed by the names of style_valid, which cssutils parsed as no rule
+    # detect_border=True reads <style> blocks with the style cache, it changes
+    # class_stop and text blocks of many pages, so it is off by default and
+    # is part of the mode of the page cache, see get_page_mode
+    if not detect_border:
+        return style_valid
     for i in xstr(pagedata.css('style'), False):
-        if 'border: ' not in i or '{' not in i:
-            continue
-        name = i.split('{')[0]
-        for i in style_valid:
-            for j in ' ,':
-                if i+j in name:
-                    continue
-        for j in cssutils.parseString(i):
-            if j.typeString == 'STYLE_RULE':
-                list_rule.append(j)
-            # print(j.typeString)
-            # TODO: import other css in IMPORT_RULE
-            # elif j.typeString == 'IMPORT_RULE':
-            #     try:
-            #         list_rule += load_css_href(j.href, dir_wikidot)
-            #     except:
-            #         pass
-    set_null = set(['0', 'none'])
-    for i in list_rule:
-        # print(j)
-        list_name = split_style_class(i.selectorText)
-        for name in list_name:
-            if name in style_valid:
-                continue
-        for property in i.style.getProperties():
-            if property.name == 'border':
-                if property.value not in set_null:
-                    for name in list_name:
-                        style_valid.add(name)
+        style_valid.update(STYLE_CACHE.get_border_class(i))
     return style_valid
 
 
+def get_page_dict_stat(func, *args) -> tuple[object, dict]:
+    # statistics of style cache in the joblib worker are returned with result
+    stat_start = STYLE_CACHE.get_stat()
+    result = func(*args)
+    return result, STYLE_CACHE.pop_stat(stat_start)
+
+
+def run_page_chunk(
+    func,
+    list_arg: list[tuple],
+    list_weight: list[float],
+    n_jobs: int = -1,
+    n_chunk: int = None,
+) -> Generator[tuple[int, object], None, None]:
+    list_arg = [(func,) + i for i in list_arg]
+    for idx, (i, stat) in run_chunk(get_page_dict_stat, list_arg, list_weight, n_jobs, n_chunk):
+        STYLE_CACHE.add_stat(stat)
+        yield idx, i
+
+
 def unfold(
     selector_list: SelectorList[Selector],
     class_stop: set[str],
@@ -471,7 +785,11 @@ if __name__ == '__main__':
 
 
     list_html = scan_html(n_limit=None)
-    result = save_page(list_html)
+    # download=True to fetch missing iframes into ../data/iframe/ before parsing
+    prefetch_iframe(list_html)
+    # all SCP pages are scanned, cached pages not found any more are removed
+    # detect_border=True to stop unfolding at classes with border in <style>
+    n_group = save_page_ndjson(list_html, cache_db='../data/page.cache.sqlite', prune=True)
 
     # page = Page(html_file)
     # page.update_text_block()
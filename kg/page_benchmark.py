@@ -0,0 +1,289 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   page_benchmark.py
+@Time    :   2024/09/02 22:41:08
+@Author  :   Chen XiYuan 
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+compare outputs and time cost of the original parser and the single-parse parser
+'''
+
+import os
+import sys
+import random
+import time
+import tempfile
+import subprocess
+from copy import deepcopy
+
+from scrapy import Selector
+
+from page import Page, scan_html, unfold, XPATH_CONTENT, CSS_REMOVE
+from page_tree import unfold_tree, tree_html, tree_str, remove_css, compile_css
+from utilities import save_json, load_json
+
+
+def sample_html(
+    list_html: list[list[str]],
+    n_sample: int = 200,
+    seed: int = 0,
+) -> list[str]:
+    # fixed sample of html files, sub-pages included
+    list_html_flat = sorted([j for i in list_html for j in i])
+    if n_sample is None or n_sample >= len(list_html_flat):
+        return list_html_flat
+    return sorted(random.Random(seed).sample(list_html_flat, n_sample))
+
+
+def parse_page_timed(
+    html_file: str,
+    single_parse: bool = False,
+) -> tuple[dict, float]:
+    t_start = time.perf_counter()
+    page = Page(html_file, single_parse=single_parse)
+    page.update_link()
+    page.update_text_block()
+    t_cost = time.perf_counter() - t_start
+    return page.get_dict(), t_cost
+
+
+def benchmark_page(
+    list_html: list[list[str]],
+    n_sample: int = 200,
+    seed: int = 0,
+) -> dict:
+    list_sample = sample_html(list_html, n_sample, seed)
+    result = {
+        'n_page': len(list_sample),
+        'time_original': 0.,
+        'time_single_parse': 0.,
+        'diff_link': [],
+        'diff_text_block': [],
+    }
+    for i in list_sample:
+        d_original, t_original = parse_page_timed(i, False)
+        d_single, t_single = parse_page_timed(i, True)
+        result['time_original'] += t_original
+        result['time_single_parse'] += t_single
+        if d_original['link'] != d_single['link']:
+            result['diff_link'].append(d_original['address'])
+        if d_original['text_block'] != d_single['text_block']:
+            result['diff_text_block'].append(d_original['address'])
+
+    n_page = max(result['n_page'], 1)
+    print('#Page: %d'%result['n_page'])
+    print('Original:     %.2f ms/page'%(result['time_original']/n_page*1000))
+    print('Single-parse: %.2f ms/page'%(result['time_single_parse']/n_page*1000))
+    print('Different link: %d/%d'%(len(result['diff_link']), result['n_page']))
+    print('Different text_block: %d/%d'%(len(result['diff_text_block']), result['n_page']))
+    return result
+
+
+def get_depth(element) -> int:
+    depth_max = 0
+    stack = [(element, 0)]
+    while len(stack) > 0:
+        node, depth = stack.pop()
+        depth_max = max(depth_max, depth)
+        stack += [(i, depth+1) for i in node if isinstance(i.tag, str)]
+    return depth_max
+
+
+def benchmark_unfold(
+    list_html: list[list[str]],
+    n_sample: int = 2000,
+    n_deepest: int = 50,
+    n_repeat: int = 5,
+    seed: int = 0,
+) -> dict:
+    # recursive SelectorList unfold vs iterative lxml unfold_tree
+    # on the most deeply nested pages of a fixed sample
+    list_content = []
+    for i in sample_html(list_html, n_sample, seed):
+        with open(i) as f:
+            content = Selector(text=f.read()).xpath(XPATH_CONTENT)
+        if len(content) > 0:
+            list_content.append((get_depth(content[0].root), i, content))
+    list_content = sorted(list_content, key=lambda x: -x[0])[:n_deepest]
+
+    result = {
+        'n_page': len(list_content),
+        'depth_max': list_content[0][0] if len(list_content) > 0 else 0,
+        'time_selector': 0.,
+        'time_tree': 0.,
+        'diff': [],
+    }
+    class_stop = set(['blockquote', 'alt-block'])
+    for depth, html_file, content in list_content:
+        t_start = time.perf_counter()
+        for _ in range(n_repeat):
+            list_selector = unfold(content.xpath('*'), class_stop).extract()
+        result['time_selector'] += time.perf_counter() - t_start
+        t_start = time.perf_counter()
+        for _ in range(n_repeat):
+            list_element = unfold_tree(content[0].root, class_stop)
+        result['time_tree'] += time.perf_counter() - t_start
+        if list_selector != [tree_html(i) for i in list_element]:
+            result['diff'].append(html_file)
+
+    n_run = max(result['n_page'] * n_repeat, 1)
+    print('#Page: %d, max depth: %d'%(result['n_page'], result['depth_max']))
+    print('unfold:      %.3f ms/page'%(result['time_selector']/n_run*1000))
+    print('unfold_tree: %.3f ms/page'%(result['time_tree']/n_run*1000))
+    print('Different result: %d/%d'%(len(result['diff']), result['n_page']))
+    return result
+
+
+def remove_css_replace(content) -> str:
+    # the original removal: str.replace of html of every matched node
+    all_content_text = content.extract_first()
+    for i in CSS_REMOVE:
+        for j in content.css(i).extract():
+            all_content_text = all_content_text.replace(j, '')
+    return all_content_text
+
+
+def benchmark_remove(
+    list_html: list[list[str]],
+    n_sample: int = 2000,
+    n_heaviest: int = 50,
+    seed: int = 0,
+) -> dict:
+    # str.replace removal vs tree removal, on pages of a fixed sample
+    # with most footnotes, hidden divs and other nodes in CSS_REMOVE
+    list_content = []
+    for i in sample_html(list_html, n_sample, seed):
+        with open(i) as f:
+            content = Selector(text=f.read()).xpath(XPATH_CONTENT)
+        if len(content) > 0:
+            n_match = sum([len(compile_css(j)(content[0].root)) for j in CSS_REMOVE])
+            list_content.append((n_match, i, content))
+    list_content = sorted(list_content, key=lambda x: -x[0])[:n_heaviest]
+
+    result = {
+        'n_page': len(list_content),
+        'n_match_max': list_content[0][0] if len(list_content) > 0 else 0,
+        'time_replace': 0.,
+        'time_tree': 0.,
+        'diff': [],
+    }
+    for n_match, html_file, content in list_content:
+        t_start = time.perf_counter()
+        text_replace = remove_css_replace(content)
+        result['time_replace'] += time.perf_counter() - t_start
+        t_start = time.perf_counter()
+        element = deepcopy(content[0].root)
+        remove_css(element, CSS_REMOVE)
+        result['time_tree'] += time.perf_counter() - t_start
+        # str.replace may also remove identical html elsewhere in the page
+        if Selector(text=text_replace).xpath('string(.)').extract_first() != tree_str(element):
+            result['diff'].append(html_file)
+
+    n_page = max(result['n_page'], 1)
+    print('#Page: %d, max #node removed: %d'%(result['n_page'], result['n_match_max']))
+    print('str.replace: %.3f ms/page'%(result['time_replace']/n_page*1000))
+    print('tree:        %.3f ms/page'%(result['time_tree']/n_page*1000))
+    print('Different text: %d/%d'%(len(result['diff']), result['n_page']))
+    return result
+
+
+# run in kg/ of a worktree of the baseline commit: html files in argv[1],
+# golden saved as argv[2]
+SCRIPT_BASELINE = '''
+import sys, json
+from page import Page
+with open(sys.argv[1]) as f:
+    list_html = json.load(f)
+golden = {}
+for i in list_html:
+    page = Page(i)
+    page.update_link()
+    page.update_text_block()
+    golden[i] = {'link': page.link, 'text_block': page.text_block}
+with open(sys.argv[2], 'w') as f:
+    json.dump(golden, f, ensure_ascii=False)
+'''
+
+
+def git(*args) -> str:
+    return subprocess.run(['git'] + list(args), capture_output=True, text=True, check=True).stdout.strip()
+
+
+def get_baseline_commit(request_first: str = '[user-001]') -> str:
+    # parent of the first commit of the single-parse series, the parser
+    # before any change of this series
+    for i in git('log', '--reverse', '--format=%H %s', '--fixed-strings', '--grep', request_first).splitlines():
+        commit, subject = i.split(' ', 1)
+        if subject.startswith(request_first):
+            return git('rev-parse', commit + '^')
+    raise ValueError(f'no commit starts with {request_first}')
+
+
+def parse_page_baseline(
+    list_html: list[str],
+    commit: str,
+) -> dict:
+    # link and text_block of the parser in the baseline commit, see
+    # get_baseline_commit, not the legacy mode of this tree
+    with tempfile.TemporaryDirectory() as dir_tmp:
+        dir_worktree = os.path.join(dir_tmp, 'baseline')
+        git('worktree', 'add', '--detach', dir_worktree, commit)
+        try:
+            path_html = os.path.join(dir_tmp, 'html.json')
+            path_golden = os.path.join(dir_tmp, 'golden.json')
+            save_json([os.path.abspath(i) for i in list_html], path_html)
+            subprocess.run([sys.executable, '-c', SCRIPT_BASELINE, path_html, path_golden],
+                           cwd=os.path.join(dir_worktree, 'kg'), check=True)
+            golden = load_json(path_golden)
+        finally:
+            git('worktree', 'remove', '--force', dir_worktree)
+    return dict((i, golden[os.path.abspath(i)]) for i in list_html)
+
+
+def save_golden(
+    list_html: list[list[str]],
+    commit: str,
+    golden_json: str = '../data/page.golden.json',
+    n_sample: int = 300,
+    seed: int = 0,
+) -> dict:
+    # text_block and link of the original parser, as reference of regression
+    # checked by tests/test_page_golden.py
+    golden = parse_page_baseline(sample_html(list_html, n_sample, seed), commit)
+    save_json(golden, golden_json)
+    print(f'#Page saved as golden: {len(golden)}')
+    return golden
+
+
+def check_golden(
+    golden_json: str = '../data/page.golden.json',
+    single_parse: bool = True,
+) -> list[str]:
+    golden = load_json(golden_json)
+    list_diff = []
+    for html_file, d_golden in golden.items():
+        d, t_cost = parse_page_timed(html_file, single_parse)
+        for k in ['link', 'text_block']:
+            if d[k] != d_golden[k]:
+                list_diff.append(html_file)
+                print(f'{html_file}: different {k}')
+                for i, j in zip(d_golden[k], d[k]):
+                    if i != j:
+                        print(f'  golden: {i!r}\n  parsed: {j!r}')
+                        break
+                break
+    print(f'#Page different from golden: {len(list_diff)}/{len(golden)}')
+    return list_diff
+
+
+if __name__ == '__main__':
+    list_html = scan_html(n_limit=None)
+    result = benchmark_page(list_html)
+    for i in result['diff_text_block']:
+        print(i)
+    result = benchmark_unfold(list_html)
+    result = benchmark_remove(list_html)
+    if not os.path.exists('../data/page.golden.json'):
+        save_golden(list_html, get_baseline_commit())
+    list_diff = check_golden()
@@ -0,0 +1,88 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   page_cache.py
+@Time    :   2024/09/04 21:07:52
+@Author  :   Chen XiYuan 
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+persistent cache of parsed pages, keyed by html path, content hash (of
+html and its iframe files, see page.hash_page_file) and parser mode
+(version of the page dict, single_parse and detect_border)
+only new or modified html files, or files cached by another mode, are
+parsed again when rebuilding
+'''
+
+import hashlib
+import json
+import sqlite3
+
+
+def hash_file(html_file: str) -> str:
+    with open(html_file, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class PageCache(object):
+    def __init__(
+        self,
+        cache_db: str = '../data/page.cache.sqlite',
+    ) -> None:
+        self.connection = sqlite3.connect(cache_db)
+        # caches made before the mode column are dropped
+        list_column = [i[1] for i in self.connection.execute('PRAGMA table_info(page)')]
+        if len(list_column) > 0 and 'mode' not in list_column:
+            self.connection.execute('DROP TABLE page')
+        self.connection.execute('''CREATE TABLE IF NOT EXISTS page (
+            path TEXT PRIMARY KEY,
+            hash TEXT NOT NULL,
+            mode TEXT NOT NULL,
+            page TEXT NOT NULL
+        )''')
+        self.connection.commit()
+
+
+    def get_hash(self) -> dict[str, tuple[str, str]]:
+        # path -> (hash, mode)
+        cursor = self.connection.execute('SELECT path, hash, mode FROM page')
+        return dict((path, (h, mode)) for path, h, mode in cursor.fetchall())
+
+
+    def get_page(
+        self,
+        list_path: list[str],
+        batch_size: int = 500,
+    ) -> dict[str, dict]:
+        path2page = {}
+        list_path = list(list_path)
+        for i in range(0, len(list_path), batch_size):
+            batch = list_path[i:i+batch_size]
+            query = 'SELECT path, page FROM page WHERE path IN (%s)'%(', '.join('?'*len(batch)))
+            for path, page in self.connection.execute(query, batch):
+                path2page[path] = json.loads(page)
+        return path2page
+
+
+    def update(
+        self,
+        list_row: list[tuple[str, str, dict]],
+        mode: str,
+    ) -> None:
+        # row: (path, hash, page dict)
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO page (path, hash, mode, page) VALUES (?, ?, ?, ?)',
+            [(p, h, mode, json.dumps(d, ensure_ascii=False)) for p, h, d in list_row]
+        )
+        self.connection.commit()
+
+
+    def remove(self, list_path: list[str]) -> None:
+        self.connection.executemany(
+            'DELETE FROM page WHERE path = ?',
+            [(i,) for i in list_path]
+        )
+        self.connection.commit()
+
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,215 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   page_tree.py
+@Time    :   2024/09/02 20:15:37
+@Author  :   Chen XiYuan 
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+in-place operations on the lxml tree of div#page-content
+the tree is parsed only once, instead of extract/replace/re-parse rounds
+'''
+
+import re
+from functools import lru_cache
+
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+
+# serialized prefix of a node, e.g. '<hr>', '<p><strong>', '<div class=', '<table'
+PATTERN_PREFIX = re.compile(r'^<(\w+)(?:(>)|\s+([\w-]+)=|)(?:<(\w+)>)?$')
+
+
+@lru_cache(maxsize=None)
+def compile_css(css: str) -> CSSSelector:
+    return CSSSelector(css, translator='html')
+
+
+def tree_str(element: etree._Element) -> str:
+    # same as xpath('string(.)'), comments excluded
+    return str(element.xpath('string(.)'))
+
+
+def drop_element(element: etree._Element) -> None:
+    # remove element but keep the text behind it (tail)
+    # same as replacing the html of element with ''
+    parent = element.getparent()
+    if parent is None:
+        return None
+    tail = element.tail
+    if tail:
+        previous = element.getprevious()
+        if previous is None:
+            parent.text = (parent.text or '') + tail
+        else:
+            previous.tail = (previous.tail or '') + tail
+    parent.remove(element)
+
+
+def remove_css(
+    element: etree._Element,
+    list_css: list[str],
+) -> int:
+    n_removed = 0
+    for css in list_css:
+        for i in compile_css(css)(element):
+            drop_element(i)
+            n_removed += 1
+    return n_removed
+
+
+def unfold_colmod_tree(element: etree._Element) -> None:
+    # replace div.colmod-block with its div.colmod-content
+    for block in compile_css('div.colmod-block')(element):
+        content = compile_css('div.colmod-content')(block)
+        parent = block.getparent()
+        if len(content) == 0 or parent is None:
+            continue
+        content = content[0]
+        content.tail = block.tail
+        parent.replace(block, content)
+
+
+def wrap_text_tree(element: etree._Element) -> None:
+    # wrap raw text (direct child of element) in <p>
+    # same rule as the original str.replace: only text found exactly once
+    # in the html of element is wrapped, text with escaped characters is not
+    html = tree_html(element)
+    list_node = [(None, element.text)] + [(i, i.tail) for i in element]
+    for child, text in list_node:
+        if text is None:
+            continue
+        text = text.strip()
+        if text == '' or html.count(text) != 1:
+            continue
+        html = html.replace(text, f'<p>{text}</p>')
+        p = element.makeelement('p', {})
+        p.text = text
+        if child is None:
+            element.text = None
+            element.insert(0, p)
+        else:
+            child.tail = None
+            child.addnext(p)
+
+
+def flatten_table_tree(element: etree._Element) -> None:
+    # 将表格中的每一行分别合并成一个字符串，以 '【】' 表示每行的开始和结束
+    # 以 '|' 分隔每列, 以 '; ' 分隔每列中的换行
+    # rows of nested tables are merged into the outermost row
+    stack = [element]
+    while len(stack) > 0:
+        node = stack.pop()
+        for child in node:
+            if child.tag != 'tr':
+                stack.append(child)
+                continue
+            s_list = []
+            for cell in child.iter('th', 'td'):
+                s_list.append(tree_str(cell).replace('\n', '; '))
+            tail = child.tail
+            child.clear()
+            child.tail = tail
+            td = child.makeelement('td', {})
+            td.text = f'【{"|".join(s_list)}】'
+            child.append(td)
+
+
+def get_link_tree(
+    element: etree._Element,
+    link_exclude: set[str] = set(),
+) -> list[dict]:
+    # same order as the original parser, from the bottom to the top of the page
+    list_link = []
+    for i in element.xpath('descendant::*/a')[::-1]:
+        link = i.get('href')
+        if link is None:
+            continue
+        if link[-5:] == '.html' and link not in link_exclude:
+            list_link.append({'link': link[:-5], 'text': tree_str(i)})
+    return list_link
+
+
+def unfold_tree(
+    element: etree._Element,
+    class_stop: set[str],
+    style_stop: set[str] = set(['border']),
+) -> list[etree._Element]:
+    # iterative version of page.unfold, attributes are read from lxml directly
+    # children of element are unfolded until a non-div element
+    # or a div with class in class_stop or style in style_stop
+    list_unfolded = []
+    stack = list(element)[::-1]
+    while len(stack) > 0:
+        node = stack.pop()
+        # comments and processing instructions
+        if not isinstance(node.tag, str):
+            continue
+        if node.tag != 'div' or node.get('class') in class_stop:
+            list_unfolded.append(node)
+            continue
+        style = node.get('style')
+        if style is not None and any([i in style for i in style_stop]):
+            list_unfolded.append(node)
+            continue
+        stack.extend(list(node)[::-1])
+    return list_unfolded
+
+
+def tree_html(element: etree._Element) -> str:
+    # same as Selector.extract()
+    return etree.tostring(element, method='html', encoding='unicode', with_tail=False)
+
+
+def compile_prefix(prefix: str) -> tuple[str, str | None, str | None]:
+    # (tag, attribute, child) of an element whose html starts with prefix
+    # attribute: '' for no attribute, None for any attributes
+    # child: tag of first child without attribute and leading text
+    tag, closed, attribute, child = PATTERN_PREFIX.match(prefix).groups()
+    if closed is not None:
+        attribute = ''
+    return tag, attribute, child
+
+
+def match_prefix(
+    element: etree._Element,
+    prefix: tuple[str, str | None, str | None],
+) -> bool:
+    # same as tree_html(element).startswith(prefix), without serialization
+    tag, attribute, child = prefix
+    if element.tag != tag:
+        return False
+    if attribute is not None:
+        keys = element.keys()
+        if attribute == '' and len(keys) > 0:
+            return False
+        if attribute != '' and (len(keys) == 0 or keys[0] != attribute):
+            return False
+    if child is not None:
+        if element.text or len(element) == 0:
+            return False
+        if element[0].tag != child or len(element[0].keys()) > 0:
+            return False
+    return True
+
+
+def group_block_tree(
+    list_element: list[etree._Element],
+    block_start: list[tuple],
+    block_close: list[tuple],
+) -> list[list[etree._Element]]:
+    # 按标签区分block
+    # block_start: this node starts a block, but not neccessarily close the block
+    # block_close: this node is a complete block
+    last_block_finished = True
+    list_block = []
+    for i in list_element:
+        start = any([match_prefix(i, j) for j in block_start])
+        close = any([match_prefix(i, j) for j in block_close])
+        if close or start or last_block_finished:
+            list_block.append([i])
+        else:
+            list_block[-1].append(i)
+        last_block_finished = close
+    return list_block
@@ -0,0 +1,78 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   parallel.py
+@Time    :   2024/09/08 16:33:20
+@Author  :   Chen XiYuan 
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+size-balanced chunks of joblib tasks
+page groups are very unequal, one task per group stalls on stragglers
+'''
+
+import heapq
+import time
+from typing import Callable, Generator
+
+from joblib import Parallel, delayed, effective_n_jobs
+
+
+def split_chunk(
+    list_weight: list[float],
+    n_chunk: int,
+) -> list[list[int]]:
+    # longest-processing-time-first: heaviest item goes to the lightest chunk
+    n_chunk = max(1, min(n_chunk, len(list_weight)))
+    heap = [(0, i) for i in range(n_chunk)]
+    list_chunk = [[] for _ in range(n_chunk)]
+    for idx in sorted(range(len(list_weight)), key=lambda i: -list_weight[i]):
+        weight, idx_chunk = heapq.heappop(heap)
+        list_chunk[idx_chunk].append(idx)
+        heapq.heappush(heap, (weight + list_weight[idx], idx_chunk))
+    return [sorted(i) for i in list_chunk if len(i) > 0]
+
+
+def run_chunk_single(
+    idx_chunk: int,
+    func: Callable,
+    list_arg: list[tuple],
+) -> tuple[int, list, float]:
+    t_start = time.perf_counter()
+    result = [func(*i) for i in list_arg]
+    return idx_chunk, result, time.perf_counter() - t_start
+
+
+def run_chunk(
+    func: Callable,
+    list_arg: list[tuple],
+    list_weight: list[float],
+    n_jobs: int = -1,
+    n_chunk: int = None,
+    unit: str = 'MB',
+    unit_scale: float = 1e-6,
+) -> Generator[tuple[int, object], None, None]:
+    # yield (index of arg, result) as soon as a chunk is finished
+    # n_chunk defaults to 4 chunks per worker
+    if len(list_arg) == 0:
+        return None
+    if n_chunk is None:
+        n_chunk = 4 * effective_n_jobs(n_jobs)
+    list_chunk = split_chunk(list_weight, n_chunk)
+    pool = Parallel(n_jobs, return_as='generator_unordered')
+    t_start = time.perf_counter()
+    weight_done = 0.
+    for n_done, (idx_chunk, result, t_cost) in enumerate(pool(
+        delayed(run_chunk_single)(idx, func, [list_arg[i] for i in chunk])
+        for idx, chunk in enumerate(list_chunk)
+    ), 1):
+        chunk = list_chunk[idx_chunk]
+        weight = sum([list_weight[i] for i in chunk]) * unit_scale
+        weight_done += weight
+        print('Chunk %d/%d: %d tasks, %.2f %s, %.2f sec, %.2f %s/sec'%(
+            n_done, len(list_chunk), len(chunk), weight, unit,
+            t_cost, weight/max(t_cost, 1e-9), unit))
+        for i, r in zip(chunk, result):
+            yield i, r
+    t_cost = time.perf_counter() - t_start
+    print('All %d chunks: %.2f sec, %.2f %s/sec'%(
+        len(list_chunk), t_cost, weight_done/max(t_cost, 1e-9), unit))
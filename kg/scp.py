@@ -7,12 +7,17 @@
 @Contact :   cxy13.ok@163.com
 '''
 
+import os
 import re
 import json
-
-from joblib import Parallel, delayed
+import time
+import hashlib
+from bisect import bisect_right
 
 from page import Page, XPATH_CONTENT
+from parallel import run_chunk
+from scp_store import save_scp_store
+from utilities import load_json
 
 
 # TODO: filtering scp and description without common keywords
@@ -31,6 +36,10 @@ KWD_DESCRIPT = [
     '概要',
     '描述（已归档）',
 ]
+# keywords of default update_mainpage
+KWD_ALL = ['特殊收容措施', '描述'] + KWD_SCP + KWD_DESCRIPT
+KWD_ALL = sorted(set(KWD_ALL), key=len, reverse=True)
+PATTERN_KWD = re.compile('|'.join([re.escape(i) for i in KWD_ALL]))
 KEY_SORTED = [
     'item_number',
     'special_containment_procedure',
@@ -46,15 +55,71 @@ class ScpObject():
         list_page: list[Page],
     ) -> None:
         self.list_page = list_page
+        # cascade of strategies, a later one only fills what is still missing
+        # strategy -> time cost, key -> strategy that found it
+        self.time_strategy: dict[str, float] = {}
+        self.strategy: dict[str, str | None] = {
+            'special_containment_procedure': None,
+            'description': None,
+        }
+        for name, func in [
+            ('text_block', self.update_mainpage_all),
+            ('rawtext', self.update_mainpage_rawtext_all),
+            ('blbf', self.update_mainpage_blbf),
+        ]:
+            if name != 'text_block' and self.scp is not None and self.description is not None:
+                break
+            t_start = time.perf_counter()
+            func()
+            self.time_strategy[name] = time.perf_counter() - t_start
+            for k, v in [('special_containment_procedure', self.scp), ('description', self.description)]:
+                if self.strategy[k] is None and v is not None:
+                    self.strategy[k] = name
+        self.tag = self.list_page[self.idx_mainpage].tag
+        # self.update_object_class()
+        self.item_number = self.list_page[0].address
+        self.address = [i.address for i in self.list_page]
+
+
+    def update_mainpage_all(self) -> None:
+        self.index_keyword()
         self.update_mainpage()
         for i in KWD_SCP:
             for j in KWD_DESCRIPT:
                 if self.scp is None or self.description is None:
                     self.update_mainpage(i, j, self.scp, self.description)
-        self.tag = self.list_page[self.idx_mainpage].tag
-        # self.update_object_class()
-        self.item_number = self.list_page[0].address
-        self.address = [i.address for i in self.list_page]
+
+
+    def update_mainpage_rawtext_all(self) -> None:
+        for i in ['特殊收容措施'] + KWD_SCP:
+            for j in ['描述'] + KWD_DESCRIPT:
+                if self.scp is None or self.description is None:
+                    self.update_mainpage_rawtext(i, j, self.scp, self.description)
+
+
+    def index_keyword(self) -> None:
+        # keyword -> indices of blocks starting with keyword in each page
+        # all text blocks are scanned once, instead of once per keyword pair
+        self.kwd_index: dict[str, list[list[int]]] = dict((k, []) for k in KWD_ALL)
+        for i in self.list_page:
+            for k in KWD_ALL:
+                self.kwd_index[k].append([])
+            for idx_j, j in enumerate(i.text_block):
+                # most blocks start with none of the keywords
+                if PATTERN_KWD.match(j) is None:
+                    continue
+                for k in KWD_ALL:
+                    if j.startswith(k):
+                        self.kwd_index[k][-1].append(idx_j)
+
+
+    def get_block_index(self, kwd: str) -> list[list[int]]:
+        if kwd not in self.kwd_index:
+            self.kwd_index[kwd] = [
+                [idx_j for idx_j, j in enumerate(i.text_block) if j.startswith(kwd)]
+                for i in self.list_page
+            ]
+        return self.kwd_index[kwd]
 
 
     # def update_object_class(self) -> None:
@@ -78,19 +143,29 @@ class ScpObject():
         self.description = description
 
         main_page = None
+        index_scp = self.get_block_index(kwd_scp)
+        index_description = self.get_block_index(kwd_description)
         # assume latest scp&description are always in the last page
-        for idx, i in enumerate(self.list_page[::-1]):
+        for idx in range(len(self.list_page)-1, -1, -1):
+            i = self.list_page[idx]
             # assume latest(true) scp&description are always at the lower part of the page
             # corner-case: scp-cn-2849
-            for idx_j, j in enumerate(i.text_block):
+            # only blocks starting with keywords change anything
+            list_idx_j = []
+            if self.scp is None:
+                list_idx_j += index_scp[idx]
+            if self.description is None:
+                list_idx_j += index_description[idx]
+            for idx_j in sorted(set(list_idx_j)):
+                j = i.text_block[idx_j]
                 # collecting scp until description met
                 if self.scp is None and j.startswith(kwd_scp):
-                    self.scp = j
-                    for k in i.text_block[idx_j+1:]:
-                        if not k.startswith(kwd_description):
-                            self.scp += k
-                        else:
-                            break
+                    idx_next = bisect_right(index_description[idx], idx_j)
+                    if idx_next < len(index_description[idx]):
+                        idx_next = index_description[idx][idx_next]
+                    else:
+                        idx_next = len(i.text_block)
+                    self.scp = j + ''.join(i.text_block[idx_j+1:idx_next])
                 if self.description is None and j.startswith(kwd_description):
                     self.description = j
                     # in case that the whole block is just kwd_description
@@ -101,7 +176,7 @@ class ScpObject():
                             pass
                 if self.scp is not None and self.description is not None:
                     main_page = i
-                    self.idx_mainpage = len(self.list_page) - idx - 1
+                    self.idx_mainpage = idx
                     break
             if main_page is not None:
                 break
@@ -126,22 +201,7 @@ class ScpObject():
                         break
 
 
-        # in case kwd_scp or kwd_description are in seperated blocks
-        if isinstance(self.scp, str) and len(self.scp) < 20:
-            self.scp = None
-        if isinstance(self.description, str) and len(self.description) < 20:
-            self.description = None
-        # print(self.scp)
-        # print(self.description)
-
-        # remove 特殊收容措施 or 描述 at the beginning of the string
-        if self.scp is not None:
-            for pattern in ['^'+kwd_scp, r'^[\:：]?\s?']:
-                self.scp = re.sub(pattern, '', self.scp)
-        if self.description is not None:
-            for pattern in ['^'+kwd_description, r'^[\:：]?\s?']:
-                self.description = re.sub(pattern, '', self.description)
-
+        self.strip_keyword(kwd_scp, kwd_description)
 
 
         # find containment site in scp, then description
@@ -163,6 +223,28 @@ class ScpObject():
         #         if len(i) > len(self.containment_site):
         #             self.containment_site = i
 
+    def strip_keyword(
+        self,
+        kwd_scp: str,
+        kwd_description: str,
+    ) -> None:
+        # in case kwd_scp or kwd_description are in seperated blocks
+        if isinstance(self.scp, str) and len(self.scp) < 20:
+            self.scp = None
+        if isinstance(self.description, str) and len(self.description) < 20:
+            self.description = None
+        # print(self.scp)
+        # print(self.description)
+
+        # remove 特殊收容措施 or 描述 at the beginning of the string
+        if self.scp is not None:
+            for pattern in ['^'+kwd_scp, r'^[\:：]?\s?']:
+                self.scp = re.sub(pattern, '', self.scp)
+        if self.description is not None:
+            for pattern in ['^'+kwd_description, r'^[\:：]?\s?']:
+                self.description = re.sub(pattern, '', self.description)
+
+
     def update_mainpage_rawtext(
         self,
         kwd_scp: str = '特殊收容措施',
@@ -181,12 +263,12 @@ class ScpObject():
             # text_block = [i for i in main_page.text.split('\n') if i!='']
             # text_block = main_page.text.split('\n')
             text_block = []
-            for i in self.main_page.text_block:
+            for i in self.list_page[self.idx_mainpage].text_block:
                 text_block += i.split('\n')
             for idx_j, j in enumerate(text_block):
                 if self.scp is None and j.startswith(kwd_scp):
                     self.scp = j
-                    for k in text_block[idx_j:]:
+                    for k in text_block[idx_j+1:]:
                         if not k.startswith(kwd_description):
                             self.scp += k
                         else:
@@ -201,34 +283,42 @@ class ScpObject():
                             pass
                 if self.scp is not None and self.description is not None:
                     break
+        # only new text is cleaned, scp and description passed in are kept
+        self.scp = self.scp if scp is None else None
+        self.description = self.description if description is None else None
+        self.strip_keyword(kwd_scp, kwd_description)
+        if scp is not None:
+            self.scp = scp
+        if description is not None:
+            self.description = description
 
 
-    def update_mainpage_blbf(
-        self,
-        list_html: list[str],
-    ) -> None:
+    def update_mainpage_blbf(self) -> None:
         # block of special-containment-procedures and description with no keyword text
         # such as div.blbf-special-containment-procedures blbf-classic
         # and div.blbf-description blbf-classic
-        list_page = [Page(i) for i in list_html]
-        for idx, p in enumerate(list_page):
-            for i in p.pagedata.xpath(XPATH_CONTENT + '/*/div')[::-1]:
-                div_class: str = i.xpath('@class').extract_first()
-                if self.scp is None and isinstance(div_class, str):
-                    if div_class.startswith('blbf-special-containment-procedures'):
-                        self.scp = i.xpath('string(.)').extract_first().replace('\n', '')
-                if self.description is None and isinstance(div_class, str):
-                    if div_class.startswith('blbf-description'):
-                        self.description = i.xpath('string(.)').extract_first().replace('\n', '')
-                if self.scp is not None and self.description is not None:
-                    self.idx_mainpage = len(list_page) - idx - 1
-                    break
-    
+        # blocks are collected by Page.update_blbf, html is not parsed again
+        for idx in range(len(self.list_page)-1, -1, -1):
+            blbf: dict = getattr(self.list_page[idx], 'blbf', {})
+            if self.scp is None:
+                self.scp = blbf.get('special_containment_procedure', None)
+            if self.description is None:
+                self.description = blbf.get('description', None)
+            if self.scp is not None and self.description is not None:
+                self.idx_mainpage = idx
+                break
+
+
+    def get_strategy(self) -> dict:
+        return {'strategy': dict(self.strategy), 'time': dict(self.time_strategy)}
+
 
     def get_dict(self) -> dict:
         d = vars(self)
         # d['list_page'] = [i.get_dict() for i in self.list_page]
         d.pop('list_page')
+        for k in ['kwd_index', 'strategy', 'time_strategy']:
+            d.pop(k, None)
         # easier for llm to understand and cypher generation
         d['special_containment_procedure'] = d['scp']
         d.pop('scp')
@@ -241,15 +331,101 @@ def get_scp_dict(list_page: list[Page]) -> dict:
     return ScpObject(list_page).get_dict()
 
 
+def get_scp_dict_strategy(list_page: list[Page]) -> tuple[dict, dict]:
+    scp_object = ScpObject(list_page)
+    strategy = scp_object.get_strategy()
+    return scp_object.get_dict(), strategy
+
+
+def hash_page_group(list_page: list[Page]) -> str:
+    # content of the pages an SCP object is parsed from, pages read from json
+    s = json.dumps([vars(i) for i in list_page], ensure_ascii=False, sort_keys=True, default=sorted)
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+
+def report_strategy(item2strategy: dict[str, dict]) -> dict:
+    # coverage and time cost of each extraction strategy
+    report = {}
+    for name in ['text_block', 'rawtext', 'blbf']:
+        report[name] = {
+            'n_run': 0,
+            'time': 0.,
+            'special_containment_procedure': 0,
+            'description': 0,
+        }
+    n_missing = {'special_containment_procedure': 0, 'description': 0}
+    for v in item2strategy.values():
+        for name, t in v['time'].items():
+            report[name]['n_run'] += 1
+            report[name]['time'] += t
+        for k, name in v['strategy'].items():
+            if name is None:
+                n_missing[k] += 1
+            else:
+                report[name][k] += 1
+    for name, v in report.items():
+        print('%-10s run on %d objects, %.2f sec, found %d SCP, %d description'%(
+            name, v['n_run'], v['time'], v['special_containment_procedure'], v['description']))
+    print('Not found: %d SCP, %d description, %d objects'%(
+        n_missing['special_containment_procedure'], n_missing['description'], len(item2strategy)))
+    report['missing'] = n_missing
+    return report
+
+
 def save_all_scp(
     list_page_all: list[list[Page]],
     scp_json: str = '../data/scp.json',
+    incremental: bool = False,
+    n_jobs: int = -1,
+    n_chunk: int = None,
+    strategy_json: str = '../data/scp.strategy.json',
+    store_file: str = '../data/scp.col',
+    hash_json: str = '../data/scp.hash.json',
 ) -> list[dict]:
     print('Parsing all SCP objects')
-    pool = Parallel(-1)
-    result = [i for i in pool(delayed(get_scp_dict)(j) for j in list_page_all)]
+    # incremental: only recompute SCP objects whose pages are not the same as
+    # the pages hashed in hash_json when scp_json was saved
+    item2scp = {}
+    item2strategy = {}
+    item2hash = {}
+    if incremental and hash_json is not None and os.path.exists(scp_json) and os.path.exists(hash_json):
+        item2scp = dict((i['item_number'], i) for i in load_json(scp_json))
+        if os.path.exists(strategy_json):
+            item2strategy = load_json(strategy_json)
+        item2hash = load_json(hash_json)
+    list_hash = [hash_page_group(i) for i in list_page_all]
+    list_idx_changed = []
+    for idx, i in enumerate(list_page_all):
+        address = i[0].address
+        if address not in item2scp or item2hash.get(address, None) != list_hash[idx] \
+            or address not in item2strategy:
+            list_idx_changed.append(idx)
+    if len(item2scp) > 0:
+        print(f'#SCP-object changed: {len(list_idx_changed)}/{len(list_page_all)}')
+
+    # cost of an SCP object is estimated by length of its text
+    list_arg = [(list_page_all[j],) for j in list_idx_changed]
+    list_weight = [sum([len(k) for j in list_page_all[i] for k in j.text_block]) for i in list_idx_changed]
+    idx2scp = {}
+    for idx, (i, strategy) in run_chunk(get_scp_dict_strategy, list_arg, list_weight, n_jobs, n_chunk, 'M chars'):
+        idx2scp[list_idx_changed[idx]] = i
+        item2strategy[i['item_number']] = strategy
+    result = []
+    for idx, i in enumerate(list_page_all):
+        result.append(idx2scp[idx] if idx in idx2scp else item2scp[i[0].address])
     with open(scp_json, 'w') as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
+    # columnar copy of scp.json for loaders that need a few columns only
+    if store_file is not None:
+        save_scp_store(result, store_file)
+    item2strategy = dict((i['item_number'], item2strategy[i['item_number']]) for i in result)
+    with open(strategy_json, 'w') as f:
+        json.dump(item2strategy, f, ensure_ascii=False, indent=2)
+    if hash_json is not None:
+        item2hash = dict((i[0].address, h) for i, h in zip(list_page_all, list_hash))
+        with open(hash_json, 'w') as f:
+            json.dump(item2hash, f, indent=2)
+    report_strategy(item2strategy)
     print('All SCP objects Parsed')
     return result
 
@@ -305,7 +481,7 @@ if __name__ == '__main__':
     # text_block = main_page.text_block
 
     from page import get_page_from_json
-    list_page_all = get_page_from_json()
-    result = save_all_scp(list_page_all)
+    list_page_all = get_page_from_json('../data/page.scp.ndjson')
+    result = save_all_scp(list_page_all, incremental=True)
     list_no_scp, list_no_description = check(result)
 
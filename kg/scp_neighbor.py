@@ -0,0 +1,170 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   scp_neighbor.py
+@Time    :   2024/10/04 20:31:09
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+precomputed SCP objects related to characters, groups of interest, canons,
+series and attributes, the 2-hop path ScpObject-[:HAS_TAG]->Tag-[:IS_TAG_OF]->X
+an entity is related to an SCP object if the tag of the entity is one of its tags,
+the same as the single-hop RELATE_TO_CHARACTER etc. created by create_scp
+the table is refreshed by changed SCP objects only, and rebuilt when any
+entity json is modified
+'''
+
+import os
+import time
+
+from scp_store import load_scp_store
+from utilities import load_json, save_json
+from xref import LABEL_ENTITY, TAG_RELATION
+
+
+NEIGHBOR_JSON = '../data/scp_neighbor.json'
+LABEL_NEIGHBOR = [i for i in TAG_RELATION if i != 'Tag']
+WORD_RELATED = ['有关', '相关', '关联', '涉及']
+
+
+def load_scp_tag(scp_file: str) -> dict[str, list[str]]:
+    if scp_file.endswith('.col'):
+        list_scp = load_scp_store(scp_file, ['item_number', 'tag'])
+    else:
+        list_scp = load_json(scp_file)
+    return dict((i['item_number'], list(i['tag'])) for i in list_scp)
+
+
+def get_source_mtime(dir_data: str) -> dict[str, float]:
+    return dict((i, os.path.getmtime(os.path.join(dir_data, LABEL_ENTITY[i][0]))) for i in LABEL_NEIGHBOR)
+
+
+def build_neighbor(
+    dir_data: str = '../data/',
+    scp_tag: dict[str, list[str]] = {},
+) -> dict:
+    # label -> name of entity -> tags, entities with the same name are merged
+    entity_tag: dict[str, dict[str, list[str]]] = {}
+    for label in LABEL_NEIGHBOR:
+        entity_tag[label] = {}
+        for i in load_json(os.path.join(dir_data, LABEL_ENTITY[label][0])):
+            if i.get('tag', None) is None or i.get('name', None) is None:
+                continue
+            list_tag = entity_tag[label].setdefault(i['name'], [])
+            if i['tag'] not in list_tag:
+                list_tag.append(i['tag'])
+    neighbor = {
+        'mtime': get_source_mtime(dir_data),
+        'entity_tag': entity_tag,
+        'scp_tag': {},
+        'neighbor': dict((i, {}) for i in LABEL_NEIGHBOR),
+    }
+    update_neighbor(neighbor, scp_tag)
+    return neighbor
+
+
+def get_tag2entity(neighbor: dict) -> dict[str, list[tuple[str, str]]]:
+    tag2entity = {}
+    for label, name2tag in neighbor['entity_tag'].items():
+        for name, list_tag in name2tag.items():
+            for i in list_tag:
+                tag2entity.setdefault(i, []).append((label, name))
+    return tag2entity
+
+
+def update_neighbor(
+    neighbor: dict,
+    scp_tag: dict[str, list[str]],
+) -> dict[str, int]:
+    # scp_tag: tags of all SCP objects, only objects with changed tags are
+    # updated, objects not in scp_tag any more are removed
+    tag2entity = get_tag2entity(neighbor)
+    scp_tag_old = neighbor['scp_tag']
+    stat = {'changed': 0, 'added': 0, 'removed': 0}
+    list_item = [i for i in scp_tag if scp_tag_old.get(i, None) != scp_tag[i]]
+    list_item += [i for i in scp_tag_old if i not in scp_tag]
+    # (label, name) -> items
+    entity2item: dict[tuple[str, str], set[str]] = {}
+
+    def get_item(entity: tuple[str, str]) -> set[str]:
+        if entity not in entity2item:
+            entity2item[entity] = set(neighbor['neighbor'][entity[0]].get(entity[1], []))
+        return entity2item[entity]
+
+    for item in list_item:
+        tag_old = set(scp_tag_old.get(item, []))
+        tag_new = set(scp_tag.get(item, []))
+        entity_old = set([j for i in tag_old for j in tag2entity.get(i, [])])
+        entity_new = set([j for i in tag_new for j in tag2entity.get(i, [])])
+        for i in entity_new - entity_old:
+            get_item(i).add(item)
+            stat['added'] += 1
+        for i in entity_old - entity_new:
+            get_item(i).discard(item)
+            stat['removed'] += 1
+        if item in scp_tag:
+            scp_tag_old[item] = list(scp_tag[item])
+        else:
+            scp_tag_old.pop(item)
+        stat['changed'] += 1
+    for (label, name), set_item in entity2item.items():
+        if len(set_item) > 0:
+            neighbor['neighbor'][label][name] = sorted(set_item)
+        else:
+            neighbor['neighbor'][label].pop(name, None)
+    return stat
+
+
+class ScpNeighbor(object):
+    def __init__(
+        self,
+        scp_file: str = '../data/scp.json',
+        dir_data: str = '../data/',
+        neighbor_json: str = NEIGHBOR_JSON,
+    ) -> None:
+        # scp_file: scp.json or the columnar store scp.col
+        t_start = time.time()
+        scp_tag = load_scp_tag(scp_file)
+        self.neighbor = None
+        if neighbor_json is not None and os.path.exists(neighbor_json):
+            self.neighbor = load_json(neighbor_json)
+            if self.neighbor['mtime'] != get_source_mtime(dir_data):
+                self.neighbor = None
+        if self.neighbor is None:
+            self.neighbor = build_neighbor(dir_data, scp_tag)
+            stat = {'changed': len(scp_tag)}
+        else:
+            stat = update_neighbor(self.neighbor, scp_tag)
+        if neighbor_json is not None and stat['changed'] > 0:
+            save_json(self.neighbor, neighbor_json)
+        print('#SCP changed: %d, Time Cost: %.2f sec'%(stat['changed'], time.time()-t_start))
+        # longest names first when looking for entities in a question
+        self.list_entity = sorted([(name, label) for label in LABEL_NEIGHBOR
+                                   for name in self.neighbor['entity_tag'][label]],
+                                  key=lambda x: len(x[0]), reverse=True)
+
+
+    def get_related_scp(self, name: str, label: str | None = None) -> list[str]:
+        # label: one of LABEL_NEIGHBOR, all of them if None
+        list_label = LABEL_NEIGHBOR if label is None else [label]
+        set_item = set()
+        for i in list_label:
+            set_item.update(self.neighbor['neighbor'][i].get(name, []))
+        return sorted(set_item)
+
+
+    def answer(self, question: str) -> str | None:
+        # questions such as 所有和Harold Blank博士有关的scp项目, None to fall back to cypher
+        if not any([i in question for i in WORD_RELATED]) or 'scp' not in question.lower():
+            return None
+        for name, label in self.list_entity:
+            if len(name) > 1 and name in question:
+                list_item = self.get_related_scp(name, label)
+                return ', '.join(list_item) if len(list_item) > 0 else None
+        return None
+
+
+if __name__ == '__main__':
+    neighbor = ScpNeighbor()
+    print(neighbor.answer('所有和Harold Blank博士有关的scp项目'))
+    print(neighbor.get_related_scp('Dan', 'Character'))
@@ -0,0 +1,280 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   scp_store.py
+@Time    :   2024/09/16 20:41:37
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+columnar store of SCP objects, a memory-mapped file instead of scp.json
+only the columns asked for are decoded, tag filters are done with
+posting lists before any text is touched
+no dependency other than the standard library, so that oneke and rag
+can import this file directly
+
+layout: MAGIC | uint64 length of header | header json | buffers
+column kinds:
+    str:  offset(int64, n+1), data(utf-8), valid(uint8, n)
+    int:  value(int64, n), valid(uint8, n)
+    list: offset(int64, n+1), item_offset(int64), item_data(utf-8)
+    list with postings (tag): + posting_offset(int64), posting(int32 rows)
+'''
+
+import os
+import sys
+import json
+import mmap
+import struct
+
+
+MAGIC = b'SCPSTORE'
+STORE_FILE = '../data/scp.col'
+COLUMN_POSTING = set(['tag'])
+# typecode of memoryview.cast for each buffer
+BUFFER_TYPE = {
+    'offset': 'q',
+    'item_offset': 'q',
+    'posting_offset': 'q',
+    'value': 'q',
+    'posting': 'i',
+    'valid': 'B',
+    'data': 'B',
+    'item_data': 'B',
+}
+
+
+def get_column_kind(list_value: list) -> str:
+    for i in list_value:
+        if isinstance(i, list):
+            return 'list'
+        if isinstance(i, str):
+            return 'str'
+        if isinstance(i, int):
+            return 'int'
+    return 'str'
+
+
+def encode_str(list_value: list[str | None]) -> tuple[list[int], bytearray]:
+    offset = [0]
+    data = bytearray()
+    for i in list_value:
+        if i is not None:
+            data += i.encode('utf-8')
+        offset.append(len(data))
+    return offset, data
+
+
+def pack_int(list_value: list[int], typecode: str = 'q') -> bytes:
+    return struct.pack('<%d%s'%(len(list_value), typecode), *list_value)
+
+
+def encode_column(name: str, list_value: list) -> tuple[str, dict[str, bytes], dict]:
+    kind = get_column_kind(list_value)
+    buffer = {}
+    extra = {}
+    if kind == 'str':
+        offset, data = encode_str(list_value)
+        buffer['offset'] = pack_int(offset)
+        buffer['data'] = bytes(data)
+        buffer['valid'] = bytes([i is not None for i in list_value])
+    elif kind == 'int':
+        buffer['value'] = pack_int([0 if i is None else i for i in list_value])
+        buffer['valid'] = bytes([i is not None for i in list_value])
+    else:
+        offset = [0]
+        list_item = []
+        for i in list_value:
+            list_item += [] if i is None else i
+            offset.append(len(list_item))
+        item_offset, item_data = encode_str(list_item)
+        buffer['offset'] = pack_int(offset)
+        buffer['item_offset'] = pack_int(item_offset)
+        buffer['item_data'] = bytes(item_data)
+        if name in COLUMN_POSTING:
+            item2row: dict[str, set[int]] = {}
+            for idx, i in enumerate(list_value):
+                for j in [] if i is None else i:
+                    item2row.setdefault(j, set()).add(idx)
+            dictionary = sorted(item2row)
+            posting_offset = [0]
+            posting = []
+            for i in dictionary:
+                posting += sorted(item2row[i])
+                posting_offset.append(len(posting))
+            buffer['posting_offset'] = pack_int(posting_offset)
+            buffer['posting'] = pack_int(posting, 'i')
+            extra['dictionary'] = dictionary
+    return kind, buffer, extra
+
+
+def save_scp_store(
+    list_scp: list[dict],
+    store_file: str = STORE_FILE,
+) -> None:
+    list_column = list(list_scp[0].keys()) if len(list_scp) > 0 else []
+    header = {'n_row': len(list_scp), 'column': {}}
+    list_buffer = []
+    position = 0
+    for name in list_column:
+        kind, buffer, extra = encode_column(name, [i.get(name, None) for i in list_scp])
+        header['column'][name] = dict(kind=kind, buffer={}, **extra)
+        for k, v in buffer.items():
+            header['column'][name]['buffer'][k] = [position, len(v)]
+            # buffers are aligned to 8 bytes for memoryview.cast
+            padding = b'\0' * (-len(v) % 8)
+            list_buffer.append(v + padding)
+            position += len(v) + len(padding)
+    header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+    with open(store_file + '.tmp', 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for i in list_buffer:
+            f.write(i)
+    os.replace(store_file + '.tmp', store_file)
+
+
+class ScpStore(object):
+    def __init__(
+        self,
+        store_file: str = STORE_FILE,
+    ) -> None:
+        assert sys.byteorder == 'little'
+        self.file = open(store_file, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        assert self.view[:len(MAGIC)] == MAGIC
+        n_header = struct.unpack_from('<Q', self.mmap, len(MAGIC))[0]
+        start = len(MAGIC) + 8
+        header = json.loads(bytes(self.view[start:start+n_header]).decode('utf-8'))
+        self.n_row: int = header['n_row']
+        self.column: dict[str, dict] = header['column']
+        self.start = start + n_header
+        self.buffer: dict[tuple[str, str], memoryview] = {}
+
+
+    def __len__(self) -> int:
+        return self.n_row
+
+
+    def __enter__(self) -> 'ScpStore':
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+    def get_buffer(self, name: str, key: str) -> memoryview:
+        if (name, key) not in self.buffer:
+            position, n_byte = self.column[name]['buffer'][key]
+            view = self.view[self.start+position:self.start+position+n_byte]
+            self.buffer[(name, key)] = view.cast(BUFFER_TYPE[key])
+        return self.buffer[(name, key)]
+
+
+    def get_bytes(self, name: str, row: int) -> memoryview | None:
+        # zero-copy utf-8 bytes of a str column, a view of the memory map
+        # release it (or keep bytes(view) instead) before close, which raises
+        # BufferError while the view is held
+        if not self.get_buffer(name, 'valid')[row]:
+            return None
+        offset = self.get_buffer(name, 'offset')
+        return self.get_buffer(name, 'data')[offset[row]:offset[row+1]]
+
+
+    def get_value(self, name: str, row: int) -> str | int | list[str] | None:
+        kind = self.column[name]['kind']
+        if kind == 'str':
+            value = self.get_bytes(name, row)
+            return None if value is None else str(value, 'utf-8')
+        if kind == 'int':
+            return self.get_buffer(name, 'value')[row] if self.get_buffer(name, 'valid')[row] else None
+        offset = self.get_buffer(name, 'offset')
+        item_offset = self.get_buffer(name, 'item_offset')
+        item_data = self.get_buffer(name, 'item_data')
+        return [
+            str(item_data[item_offset[i]:item_offset[i+1]], 'utf-8')
+            for i in range(offset[row], offset[row+1])
+        ]
+
+
+    def get_posting(self, name: str, item: str) -> set[int]:
+        dictionary: list[str] = self.column[name]['dictionary']
+        if 'index' not in self.column[name]:
+            self.column[name]['index'] = dict((j, i) for i, j in enumerate(dictionary))
+        idx = self.column[name]['index'].get(item, None)
+        if idx is None:
+            return set()
+        offset = self.get_buffer(name, 'posting_offset')
+        return set(self.get_buffer(name, 'posting')[offset[idx]:offset[idx+1]])
+
+
+    def filter_tag(
+        self,
+        tag_all: set[str] = None,
+        tag_any: set[str] = None,
+        tag_none: set[str] = None,
+        name: str = 'tag',
+    ) -> list[int]:
+        # rows with all of tag_all, at least one of tag_any and none of tag_none
+        row = None
+        for i in sorted(tag_all or [], key=lambda x: len(self.get_posting(name, x))):
+            row = self.get_posting(name, i) if row is None else row & self.get_posting(name, i)
+        if tag_any is not None:
+            row_any = set().union(*[self.get_posting(name, i) for i in tag_any])
+            row = row_any if row is None else row & row_any
+        if row is None:
+            row = set(range(self.n_row))
+        for i in tag_none or []:
+            row -= self.get_posting(name, i)
+        return sorted(row)
+
+
+    def read(
+        self,
+        columns: list[str] = None,
+        rows: list[int] = None,
+    ) -> list[dict]:
+        columns = list(self.column) if columns is None else columns
+        rows = range(self.n_row) if rows is None else rows
+        return [dict((k, self.get_value(k, i)) for k in columns) for i in rows]
+
+
+    def close(self) -> None:
+        for i in self.buffer.values():
+            i.release()
+        self.buffer = {}
+        self.view.release()
+        self.mmap.close()
+        self.file.close()
+
+
+def load_scp_store(
+    store_file: str = STORE_FILE,
+    columns: list[str] = None,
+    tag_all: set[str] = None,
+    tag_any: set[str] = None,
+    tag_none: set[str] = None,
+) -> list[dict]:
+    with ScpStore(store_file) as store:
+        rows = None
+        if tag_all is not None or tag_any is not None or tag_none is not None:
+            rows = store.filter_tag(tag_all, tag_any, tag_none)
+        return store.read(columns, rows)
+
+
+if __name__ == '__main__':
+    import time
+    with open('../data/scp.json') as f:
+        list_scp = json.load(f)
+    save_scp_store(list_scp)
+
+    t_start = time.perf_counter()
+    with open('../data/scp.json') as f:
+        json.load(f)
+    print('json.load: %.3f sec'%(time.perf_counter()-t_start))
+    t_start = time.perf_counter()
+    result = load_scp_store(columns=['item_number', 'description'], tag_all=set(['safe']))
+    print('ScpStore: %.3f sec, %d objects tagged safe'%(time.perf_counter()-t_start, len(result)))
@@ -16,7 +16,8 @@ from collections import OrderedDict
 
 from scrapy.selector import Selector
 
-from page import Page
+from hub import load_hub
+from tag_index import scan_tag
 from utilities import DIR_WIKIDOT, strip_address, xstr, xhref, save_json
 
 
@@ -41,7 +42,7 @@ def parse_tag_in_hub(
     name = dict_series['name']
     address = dict_series['address']
     html = dir_wikidot + address + '.html'
-    tag = Page(html).tag
+    tag = scan_tag(html)
     if name in tag:
         dict_series['tag'] = name
 
@@ -51,11 +52,10 @@ def parse_tag_in_hub(
 def parse_series(
     html_file = DIR_WIKIDOT + 'series-archive.html'
 ) -> list[dict]:
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
+    pagedata = load_hub(html_file, None)
     list_series = []
     # series with tag
-    wrapper = Selector(text=htmlhandle).css('div[class="series-wrapper large"]')
+    wrapper = pagedata.css('div[class="series-wrapper large"]')
     for block in wrapper.xpath('*'):
         dict_series = {}
         title = block.css('h3')
@@ -68,13 +68,11 @@ def parse_series(
         dict_series['language'] = '英文站'
         list_series.append(dict_series)
     # series with no tag
-    wrapper = Selector(text=htmlhandle).css('div[class="series-wrapper content-type-description"]')
+    wrapper = pagedata.css('div[class="series-wrapper content-type-description"]')
     list_block = wrapper.xpath('*')[:-1]
     list_html = xhref(wrapper.css('div.pager'), False)
     for i in list_html[:-1]:
-        with open(DIR_WIKIDOT+i) as htmlfile:
-            htmlhandle = htmlfile.read()
-        wrapper = Selector(text=htmlhandle).css('div[class="series-wrapper content-type-description"]')
+        wrapper = load_hub(DIR_WIKIDOT+i, None).css('div[class="series-wrapper content-type-description"]')
         list_block += wrapper.xpath('*')[:-1]
     
     for block in list_block:
@@ -89,13 +87,11 @@ def parse_series(
 def parse_series_cn(
     html_file: str = DIR_WIKIDOT + 'series-archive-cn.html',
 ) -> list[dict]:
-    with open(html_file) as htmlfile:
-        pagedata = Selector(text=htmlfile.read())
+    pagedata = load_hub(html_file, None)
     list_tr = pagedata.css('tr')[2:]
     for i in pagedata.css('div.pager').css('span.target')[:-1]:
         html_file = DIR_WIKIDOT + xhref(i)
-        with open(html_file) as htmlfile:
-            pagedata = Selector(text=htmlfile.read())
+        pagedata = load_hub(html_file, None)
         list_tr += pagedata.css('tr')[2:]
     list_series = []
     for tr in list_tr:
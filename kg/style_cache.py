@@ -0,0 +1,129 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   style_cache.py
+@Time    :   2024/09/10 19:48:03
+@Author  :   Chen XiYuan 
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+memoized detection of css classes with border, keyed by hash of <style> block
+most pages share the same theme css, cssutils is slow
+'''
+
+import os
+import re
+import json
+import hashlib
+import logging
+
+import cssutils
+
+
+DIR_STYLE_CACHE = '../data/style_cache/'
+# property border, not border-left, border-radius etc.
+PATTERN_BORDER = re.compile(r'(?<![\w-])border\s*:')
+
+
+def split_style_class(selector_text: str) -> list[str]:
+    operation = set('~+>')
+    list_name = []
+    name = ''
+    for idx_k, k in enumerate(selector_text):
+        if k == ' ':
+            k_left = selector_text[idx_k-1]
+            k_right = selector_text[idx_k+1]
+            if k_right in operation:
+                pass
+            else:
+                if k_left in operation:
+                    pass
+                # seperation of two class
+                else:
+                    list_name.append(name.strip())
+                    name = ''
+        elif k == ',':
+            continue
+        name += k
+    list_name.append(name.strip())
+    return list_name
+
+
+def parse_style_block(style: str) -> list[str]:
+    # names in selectors of rules with a visible border
+    cssutils.log.setLevel(logging.FATAL)
+    set_null = set(['0', 'none'])
+    set_name = set()
+    for i in cssutils.parseString(style):
+        # TODO: import other css in IMPORT_RULE
+        if i.typeString != 'STYLE_RULE':
+            continue
+        for property in i.style.getProperties():
+            if property.name == 'border' and property.value not in set_null:
+                set_name.update(split_style_class(i.selectorText))
+    return sorted(set_name)
+
+
+class StyleCache(object):
+    def __init__(
+        self,
+        dir_cache: str = DIR_STYLE_CACHE,
+    ) -> None:
+        # one json file per style block, safe for concurrent joblib workers
+        self.dir_cache = dir_cache
+        self.memory: dict[str, list[str]] = {}
+        self.reset_stat()
+
+
+    def get_border_class(self, style: str) -> list[str]:
+        # fast path: cssutils is skipped for blocks without border
+        if '{' not in style or PATTERN_BORDER.search(style) is None:
+            self.stat['skipped'] += 1
+            return []
+        key = hashlib.sha1(style.encode('utf-8')).hexdigest()
+        if key in self.memory:
+            self.stat['hit_memory'] += 1
+            return self.memory[key]
+        path = os.path.join(self.dir_cache, key + '.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                list_name = json.load(f)
+            self.stat['hit_disk'] += 1
+        else:
+            list_name = parse_style_block(style)
+            self.stat['miss'] += 1
+            os.makedirs(self.dir_cache, exist_ok=True)
+            path_tmp = f'{path}.{os.getpid()}.tmp'
+            with open(path_tmp, 'w') as f:
+                json.dump(list_name, f)
+            os.replace(path_tmp, path)
+        self.memory[key] = list_name
+        return list_name
+
+
+    def reset_stat(self) -> None:
+        self.stat = {'skipped': 0, 'hit_memory': 0, 'hit_disk': 0, 'miss': 0}
+
+
+    def get_stat(self) -> dict:
+        return dict(self.stat)
+
+
+    def pop_stat(self, stat_start: dict) -> dict:
+        # statistics since stat_start, counters are restored to stat_start
+        # so that they are not counted twice when joblib runs in this process
+        stat = dict((k, v - stat_start[k]) for k, v in self.stat.items())
+        self.stat = dict(stat_start)
+        return stat
+
+
+    def add_stat(self, stat: dict) -> None:
+        for k, v in stat.items():
+            self.stat[k] += v
+
+
+    def print_stat(self) -> None:
+        n_hit = self.stat['hit_memory'] + self.stat['hit_disk']
+        n_parsed = n_hit + self.stat['miss']
+        print('Style cache: %d blocks without border, %d/%d hit (%.1f%%), %d in memory, %d on disk'%(
+            self.stat['skipped'], n_hit, n_parsed, 100*n_hit/max(n_parsed, 1),
+            self.stat['hit_memory'], self.stat['hit_disk']))
@@ -16,6 +16,8 @@ import json
 
 from scrapy.selector import Selector
 
+from hub import load_hub
+from tag_taxonomy import TagTaxonomy
 from utilities import DIR_WIKIDOT, save_json, load_json, strip_address
 
 
@@ -75,9 +77,8 @@ def parse_tag_guide(
     ) -> list[dict]:
     # edit tag-guide.html before running this function:
     # 主要标签-原创 and 主要标签-搞笑 are in the same ul-block, split them into two ul-blocks
-    with open(tag_guide_html) as htmlfile:
-        htmlhandle = htmlfile.read()
-        pagedata = Selector(text=htmlhandle)
+    # absolute xpath below, the whole page is needed
+    pagedata = load_hub(tag_guide_html, None)
     dict_description = {}
     list_tag: list[dict] = []
 
@@ -230,15 +231,13 @@ def parse_tag_guide(
 
 
 def get_tag_by_type(
-    tag_type: str = '特性',
+    tag_type: str = '特性标签',
     json_path: str = '../data/tag.json',
     ) -> set[str]:
-    all_tag = load_json(json_path)
-    list_tag = []
-    for k, v in all_tag.items():
-        if tag_type in v['type']:
-            list_tag.append(k)
-    return set(list_tag)
+    # bitset lookup in the compiled taxonomy, see tag_taxonomy.py
+    # the original default '特性' is not a type in tag.json (types are such as
+    # 特性标签 or 特性标签（生物）), it matched no tag and no caller uses it
+    return TagTaxonomy(tag_json=json_path).get_tag_by_type(tag_type)
 
 
 class Tag(object):
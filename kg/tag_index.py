@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   tag_index.py
+@Time    :   2024/09/06 23:12:45
+@Author  :   Chen XiYuan 
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+address -> tags index of wikidot pages
+only div.page-tags is parsed, the whole html is never parsed
+'''
+
+import re
+import os
+import json
+
+from lxml import html as lxml_html
+
+from utilities import save_json, load_json
+
+
+PATTERN_TAG_START = re.compile(rb'<div\b[^>]*\bclass="page-tags"')
+PATTERN_DIV = re.compile(rb'<div\b|</div\s*>')
+XPATH_TAG = 'descendant-or-self::div[@class="page-tags"]/span/a'
+
+
+def find_div_end(data: bytes, idx_start: int) -> int:
+    # end of the div starting at idx_start, nested divs included
+    depth = 0
+    for i in PATTERN_DIV.finditer(data, idx_start):
+        depth += -1 if i.group().startswith(b'</') else 1
+        if depth == 0:
+            return i.end()
+    return len(data)
+
+
+def scan_tag(html_file: str) -> set[str]:
+    # same result as Page(html_file).tag: every div.page-tags is sliced out
+    # of the bytes and only the slices are parsed by lxml
+    with open(html_file, 'rb') as f:
+        data = f.read()
+    tag = set()
+    idx_end = 0
+    for i in PATTERN_TAG_START.finditer(data):
+        # nested div.page-tags are already in the slice of the outer one
+        if i.start() < idx_end:
+            continue
+        idx_end = find_div_end(data, i.start())
+        block = lxml_html.fragment_fromstring(
+            data[i.start():idx_end].decode('utf-8', errors='ignore'), create_parent='div')
+        for j in block.xpath(XPATH_TAG):
+            tag.add(j.xpath('string(.)'))
+    return tag
+
+
+def update_tag_index(
+    dir_wikidot: str = '../SCP-CN/scp-wiki-cn.wikidot.com/',
+    tag_index_json: str = '../data/tag_index.json',
+) -> dict[str, list[str]]:
+    # entries are rescanned only if mtime or size of html file changes
+    index_old = {}
+    if tag_index_json is not None and os.path.exists(tag_index_json):
+        index_old = load_json(tag_index_json)
+    index = {}
+    n_scanned = 0
+    for i in os.scandir(dir_wikidot):
+        if not i.name.endswith('.html') or not i.is_file():
+            continue
+        stat = i.stat()
+        entry = index_old.get(i.name, None)
+        if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+            entry = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'tag': sorted(scan_tag(i.path)),
+            }
+            n_scanned += 1
+        index[i.name] = entry
+    if tag_index_json is not None and (n_scanned > 0 or len(index) != len(index_old)):
+        save_json(index, tag_index_json)
+    print(f'#HTML with tag indexed: {len(index)}, rescanned: {n_scanned}')
+    return dict((k, v['tag']) for k, v in index.items())
+
+
+def find_html_by_tag(
+    tag: set[str],
+    dir_wikidot: str = '../SCP-CN/scp-wiki-cn.wikidot.com/',
+    tag_index_json: str = '../data/tag_index.json',
+) -> list[str]:
+    index = update_tag_index(dir_wikidot, tag_index_json)
+    return sorted([k for k, v in index.items() if tag.issubset(v)])
@@ -0,0 +1,296 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   tag_query.py
+@Time    :   2024/09/23 20:18:36
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+local tag index of SCP objects, one bitset (python int) per tag over SCP ids
+tag questions are answered here before falling back to cypher in rag/cypher.py
+query: tags with AND OR NOT and parentheses, such as (搞笑 OR 人形生物) AND NOT keter
+'''
+
+import re
+import time
+
+from scp_store import ScpStore
+from utilities import load_json
+
+
+PATTERN_TOKEN = re.compile(r'\(|\)|&|\||!|[^\s()&|!]+')
+OPERATOR = {
+    'and': 'and', '&': 'and', '且': 'and',
+    'or': 'or', '|': 'or', '或': 'or',
+    'not': 'not', '!': 'not', '非': 'not',
+}
+PATTERN_QUOTE = re.compile(r'[“"「\'‘]([^”"」\'’]+)[”"」\'’]')
+WORD_OR = ['或', '或者', 'or']
+WORD_NOT = ['不', '没有', '非', '除']
+WORD_COUNT = ['多少', '几个', '数量']
+WORD_TAG = ['标签', 'tag']
+# questions about other entities, such as characters with a tag
+WORD_ENTITY = ['人物', '角色', '组织', '设施', '特遣队']
+# words allowed between tags of a chain and between the last tag and 标签
+WORD_JOIN = ['和', '与', '以及', '及', '或者', '或', '并且', '且', '但是', '但', '、', '，', ',',
+             '不是', '不', '没有', '非', '除了', '除', 'and', 'or', 'not', r'\s']
+PATTERN_JOIN = re.compile('^(?:%s)*$'%('|'.join(WORD_JOIN + ['的'])))
+PATTERN_JOIN_AFTER = re.compile('^(?:%s)*$'%('|'.join(WORD_JOIN)))
+# tags after 标签 only in 标签为/标签是/标签包括
+PATTERN_TAG_AFTER = re.compile(r'^\s*(?:为|是|包括|：|:)')
+
+
+class ScpTagIndex(object):
+    def __init__(
+        self,
+        scp_file: str = '../data/scp.json',
+        tag_json: str = '../data/tag.json',
+    ) -> None:
+        # scp_file: scp.json or the columnar store scp.col
+        self.tag2bits: dict[str, int] = {}
+        if scp_file.endswith('.col'):
+            with ScpStore(scp_file) as store:
+                self.item_number: list[str] = store.read(['item_number'])
+                self.item_number = [i['item_number'] for i in self.item_number]
+                for i in store.column['tag']['dictionary']:
+                    bits = 0
+                    for j in store.get_posting('tag', i):
+                        bits |= 1 << j
+                    self.tag2bits[i] = bits
+        else:
+            list_scp = load_json(scp_file)
+            self.item_number = [i['item_number'] for i in list_scp]
+            for idx, i in enumerate(list_scp):
+                for j in i['tag']:
+                    self.tag2bits[j] = self.tag2bits.get(j, 0) | (1 << idx)
+        self.all_bits = (1 << len(self.item_number)) - 1
+        # english names and tags without SCP object
+        self.alias: dict[str, str] = {}
+        for i in load_json(tag_json):
+            self.tag2bits.setdefault(i['tag'], 0)
+            if i.get('tag_english', None):
+                self.alias[i['tag_english'].lower()] = i['tag']
+        # longest tags first when looking for tags in a question
+        self.list_tag = sorted(self.tag2bits, key=len, reverse=True)
+
+
+    def get_bits(self, tag: str) -> int:
+        tag = self.alias.get(tag.lower(), tag)
+        return self.tag2bits.get(tag, self.tag2bits.get(tag.lower(), 0))
+
+
+    def evaluate(self, tree: tuple) -> int:
+        if tree[0] == 'tag':
+            return self.get_bits(tree[1])
+        if tree[0] == 'not':
+            return self.all_bits & ~self.evaluate(tree[1])
+        if tree[0] == 'and':
+            return self.evaluate(tree[1]) & self.evaluate(tree[2])
+        return self.evaluate(tree[1]) | self.evaluate(tree[2])
+
+
+    def get_item(self, bits: int) -> list[str]:
+        list_item = []
+        while bits:
+            low = bits & -bits
+            list_item.append(self.item_number[low.bit_length()-1])
+            bits ^= low
+        return list_item
+
+
+    def query(self, expression: str | tuple) -> list[str]:
+        if isinstance(expression, str):
+            expression = parse_expression(expression)
+        return self.get_item(self.evaluate(expression))
+
+
+    def count(self, expression: str | tuple) -> int:
+        if isinstance(expression, str):
+            expression = parse_expression(expression)
+        return self.evaluate(expression).bit_count()
+
+
+    def parse_question(self, question: str) -> tuple | None:
+        # tag expression of a question about tags of SCP objects, None if it is not one
+        # only quoted tags, or known tags next to 标签 (joined by 和/或/不 etc.), are used,
+        # other tags in the question (such as 项目 or scp) are words of the question
+        if not any([i in question.lower() for i in WORD_TAG]):
+            return None
+        if any([i in question for i in WORD_ENTITY]):
+            return None
+        list_span = []
+        for i in PATTERN_QUOTE.finditer(question):
+            list_span.append((i.start(), i.end(), i.group(1)))
+        if len(list_span) == 0:
+            list_span = self.find_tag_near_word(question)
+        list_span.sort()
+        if len(list_span) == 0:
+            return None
+        tree = None
+        end_last = 0
+        for start, end, tag in list_span:
+            gap = question[end_last:start].lower()
+            node = ('tag', tag)
+            if any([i in gap for i in WORD_NOT]):
+                node = ('not', node)
+            if tree is None:
+                tree = node
+            elif any([i in gap for i in WORD_OR]):
+                tree = ('or', tree, node)
+            else:
+                tree = ('and', tree, node)
+            end_last = end
+        return tree
+
+
+    def find_tag_near_word(self, question: str) -> list[tuple[int, int, str]]:
+        # known tags, longest first and not overlapping
+        list_candidate = []
+        taken = [False] * len(question)
+        for tag in self.list_tag:
+            if len(tag) < 2 or self.tag2bits[tag] == 0:
+                continue
+            start = question.find(tag)
+            while start >= 0:
+                end = start + len(tag)
+                if not any(taken[start:end]):
+                    list_candidate.append((start, end, tag))
+                    taken[start:end] = [True] * len(tag)
+                start = question.find(tag, end)
+        list_candidate.sort()
+        # chains of tags before 标签 (威尔逊野生动物的标签) or after it (标签为搞笑)
+        list_span = set()
+        question_lower = question.lower()
+        for word in WORD_TAG:
+            for m in re.finditer(re.escape(word), question_lower):
+                position = m.start()
+                for span in reversed([i for i in list_candidate if i[1] <= m.start()]):
+                    if not PATTERN_JOIN.match(question_lower[span[1]:position]):
+                        break
+                    list_span.add(span)
+                    position = span[0]
+                prefix = PATTERN_TAG_AFTER.match(question_lower[m.end():])
+                if prefix is None:
+                    continue
+                position = m.end() + prefix.end()
+                for span in [i for i in list_candidate if i[0] >= position]:
+                    if not PATTERN_JOIN_AFTER.match(question_lower[position:span[0]]):
+                        break
+                    list_span.add(span)
+                    position = span[1]
+        return list(list_span)
+
+
+    def answer(self, question: str) -> str | None:
+        # tool for the QA chain, None to fall back to cypher
+        tree = self.parse_question(question)
+        if tree is None:
+            return None
+        if any([i in question for i in WORD_COUNT]):
+            return '%d'%(self.count(tree))
+        return ', '.join(self.query(tree))
+
+
+def tokenize(expression: str) -> list[str]:
+    return PATTERN_TOKEN.findall(expression)
+
+
+def parse_expression(expression: str) -> tuple:
+    # recursive descent: or > and > not > tag/parentheses
+    token = tokenize(expression)
+    position = 0
+
+    def peek() -> str | None:
+        return OPERATOR.get(token[position].lower(), token[position]) if position < len(token) else None
+
+    def parse_or() -> tuple:
+        nonlocal position
+        tree = parse_and()
+        while peek() == 'or':
+            position += 1
+            tree = ('or', tree, parse_and())
+        return tree
+
+    def parse_and() -> tuple:
+        nonlocal position
+        tree = parse_not()
+        while peek() == 'and':
+            position += 1
+            tree = ('and', tree, parse_not())
+        return tree
+
+    def parse_not() -> tuple:
+        nonlocal position
+        t = peek()
+        if t == 'not':
+            position += 1
+            return ('not', parse_not())
+        if t == '(':
+            position += 1
+            tree = parse_or()
+            if peek() != ')':
+                raise ValueError(f'missing ) in {expression}')
+            position += 1
+            return tree
+        if t is None or t in [')', 'and', 'or']:
+            raise ValueError(f'tag expected at {position} in {expression}')
+        position += 1
+        return ('tag', token[position-1])
+
+    tree = parse_or()
+    if position != len(token):
+        raise ValueError(f'unexpected {token[position]} in {expression}')
+    return tree
+
+
+def to_cypher(tree: tuple, count: bool = False) -> str:
+    # equivalent cypher query, for benchmark against neo4j
+    def predicate(t: tuple) -> str:
+        if t[0] == 'tag':
+            return "EXISTS { (object)-[:HAS_TAG]->(:Tag {tag: %s}) }"%(repr(t[1]))
+        if t[0] == 'not':
+            return 'NOT (%s)'%(predicate(t[1]))
+        return '(%s %s %s)'%(predicate(t[1]), t[0].upper(), predicate(t[2]))
+    ret = 'COUNT(object) AS count' if count else 'object.item_number'
+    return 'MATCH (object:ScpObject) WHERE %s RETURN %s'%(predicate(tree), ret)
+
+
+def benchmark_tag_query(
+    index: ScpTagIndex,
+    list_expression: list[str],
+    graph = None,
+    n_repeat: int = 100,
+) -> list[dict]:
+    # graph: langchain Neo4jGraph, neo4j is skipped if None
+    list_result = []
+    for expression in list_expression:
+        tree = parse_expression(expression)
+        t_start = time.perf_counter()
+        for _ in range(n_repeat):
+            n_index = index.count(tree)
+        t_index = (time.perf_counter() - t_start) / n_repeat
+        result = {'expression': expression, 'count': n_index, 'index_ms': t_index*1e3}
+        if graph is not None:
+            query = to_cypher(tree, count=True)
+            t_start = time.perf_counter()
+            n_neo4j = graph.query(query)[0]['count']
+            result['neo4j_ms'] = (time.perf_counter() - t_start)*1e3
+            result['count_neo4j'] = n_neo4j
+        print(result)
+        list_result.append(result)
+    return list_result
+
+
+if __name__ == '__main__':
+    index = ScpTagIndex()
+    list_expression = [
+        '威尔逊野生动物',
+        '搞笑 OR 人形生物',
+        'keter AND 人形生物 AND NOT 搞笑',
+        '(safe OR euclid) AND 生物性',
+    ]
+    graph = None
+    # from langchain_community.graphs import Neo4jGraph
+    # graph = Neo4jGraph(url="bolt://localhost:7687", username="neo4j", password="password")
+    benchmark_tag_query(index, list_expression, graph)
+    print(index.answer('一共有多少个scp项目有“搞笑”或“人形生物”的标签？'))
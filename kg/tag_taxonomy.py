@@ -0,0 +1,177 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   tag_taxonomy.py
+@Time    :   2024/09/22 16:47:51
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+compiled tag taxonomy built from the dicts in tag_search.py and data/tag.json
+category: path of dict keys in tag_search.py, such as 特性标签（生物）/生物学
+type: one of the types of a tag in data/tag.json, such as 特性标签
+each category/type is a bitset (python int) over tag ids
+'''
+
+import os
+
+import tag_search
+from utilities import load_json, save_json
+
+
+TAXONOMY_JSON = '../data/tag_taxonomy.json'
+# root of tag_search.py, the other dicts (otherMajorTags etc.) are nested in it
+TAXONOMY_ROOT = ['FirstCategory']
+
+
+def walk_taxonomy(root: dict) -> list[tuple[str, str]]:
+    # (tag, category path) of all leaves, tag is the key of the leaf
+    list_leaf = []
+    stack = [(root, [])]
+    while len(stack) > 0:
+        node, path = stack.pop()
+        for k, v in node.items():
+            if isinstance(v, dict):
+                stack.append((v, path + [k]))
+            else:
+                list_leaf.append((k, '/'.join(path)))
+    return list_leaf
+
+
+def get_source_mtime(tag_json: str) -> list[float]:
+    return [os.path.getmtime(tag_search.__file__), os.path.getmtime(tag_json)]
+
+
+def build_taxonomy(tag_json: str = '../data/tag.json') -> dict:
+    tag2category: dict[str, set[str]] = {}
+    for i in TAXONOMY_ROOT:
+        for tag, path in walk_taxonomy(getattr(tag_search, i)):
+            tag2category.setdefault(tag, set()).add(path)
+    tag2type: dict[str, set[str]] = {}
+    for i in load_json(tag_json):
+        tag2type.setdefault(i['tag'], set()).update(i['type'])
+    list_tag = sorted(set(tag2category) | set(tag2type))
+
+    taxonomy = {'mtime': get_source_mtime(tag_json), 'tag': list_tag}
+    for kind, tag2name in [('category', tag2category), ('type', tag2type)]:
+        # every prefix of a category path is also a category
+        if kind == 'category':
+            tag2name = dict((k, set(['/'.join(j.split('/')[:n+1])
+                                     for j in v for n in range(j.count('/')+1)]))
+                            for k, v in tag2name.items())
+        list_name = sorted(set().union(*tag2name.values()))
+        name2id = dict((j, i) for i, j in enumerate(list_name))
+        # flat arrays: names of tag i are name_id[offset[i]:offset[i+1]]
+        offset = [0]
+        name_id = []
+        bits = [0] * len(list_name)
+        for idx, tag in enumerate(list_tag):
+            for name in sorted(tag2name.get(tag, [])):
+                name_id.append(name2id[name])
+                bits[name2id[name]] |= 1 << idx
+            offset.append(len(name_id))
+        taxonomy[kind] = {
+            'name': list_name,
+            'offset': offset,
+            'name_id': name_id,
+            'bits': [hex(i) for i in bits],
+        }
+    return taxonomy
+
+
+class TagTaxonomy(object):
+    def __init__(
+        self,
+        taxonomy_json: str = TAXONOMY_JSON,
+        tag_json: str = '../data/tag.json',
+    ) -> None:
+        # rebuilt in memory when tag_search.py or tag.json is modified,
+        # taxonomy_json is only written by save
+        taxonomy = None
+        if taxonomy_json is not None and os.path.exists(taxonomy_json):
+            taxonomy = load_json(taxonomy_json)
+            if taxonomy['mtime'] != get_source_mtime(tag_json):
+                taxonomy = None
+        if taxonomy is None:
+            taxonomy = build_taxonomy(tag_json)
+        self.taxonomy = taxonomy
+        self.list_tag: list[str] = taxonomy['tag']
+        self.tag2id = dict((j, i) for i, j in enumerate(self.list_tag))
+        self.kind: dict[str, dict] = {}
+        for kind in ['category', 'type']:
+            d = dict(taxonomy[kind])
+            d['bits'] = [int(i, 16) for i in d['bits']]
+            d['name2id'] = dict((j, i) for i, j in enumerate(d['name']))
+            self.kind[kind] = d
+
+
+    def save(self, taxonomy_json: str = TAXONOMY_JSON) -> None:
+        save_json(self.taxonomy, taxonomy_json)
+
+
+    def get_name(self, tag: str, kind: str = 'category') -> list[str]:
+        idx = self.tag2id.get(tag, None)
+        if idx is None:
+            return []
+        d = self.kind[kind]
+        return [d['name'][i] for i in d['name_id'][d['offset'][idx]:d['offset'][idx+1]]]
+
+
+    def get_category(self, tag: str) -> list[str]:
+        return self.get_name(tag, 'category')
+
+
+    def get_type(self, tag: str) -> list[str]:
+        return self.get_name(tag, 'type')
+
+
+    def get_bits(self, name: str, kind: str = 'category') -> int:
+        idx = self.kind[kind]['name2id'].get(name, None)
+        return 0 if idx is None else self.kind[kind]['bits'][idx]
+
+
+    def get_mask(self, list_tag: list[str]) -> int:
+        # bitset of tags, unknown tags are ignored
+        mask = 0
+        for i in list_tag:
+            idx = self.tag2id.get(i, None)
+            if idx is not None:
+                mask |= 1 << idx
+        return mask
+
+
+    def get_tag(self, bits: int) -> set[str]:
+        list_tag = set()
+        while bits:
+            low = bits & -bits
+            list_tag.add(self.list_tag[low.bit_length()-1])
+            bits ^= low
+        return list_tag
+
+
+    def get_tag_by_category(self, category: str) -> set[str]:
+        return self.get_tag(self.get_bits(category, 'category'))
+
+
+    def get_tag_by_type(self, tag_type: str) -> set[str]:
+        return self.get_tag(self.get_bits(tag_type, 'type'))
+
+
+    def filter_by_name(
+        self,
+        list_dict: list[dict],
+        name: str,
+        kind: str = 'category',
+        key: str = 'tag',
+    ) -> list[dict]:
+        # dicts (such as SCP objects) with at least one tag in category/type
+        bits = self.get_bits(name, kind)
+        return [i for i in list_dict if self.get_mask(i[key]) & bits]
+
+
+if __name__ == '__main__':
+    taxonomy = TagTaxonomy()
+    taxonomy.save()
+    print(taxonomy.get_category('safe'))
+    print(taxonomy.get_type('safe'))
+    print(len(taxonomy.get_tag_by_type('特性标签')))
+    print(sorted(taxonomy.get_tag_by_category('特性标签（生物）/生物学')))
@@ -15,6 +15,7 @@ from collections import OrderedDict
 
 from scrapy.selector import Selector
 
+from hub import load_hub
 from utilities import DIR_WIKIDOT, strip_address, xstr, xhref, save_json
 
 
@@ -74,9 +75,7 @@ def parse_tf(
     html_file = DIR_WIKIDOT + 'task-forces.html',
     language: str = '英文站',
 ) -> list[dict]:
-    with open(html_file) as htmlfile:
-        htmlhandle = htmlfile.read()
-        page_content = Selector(text=htmlhandle).css('div#page-content')[0]
+    page_content = load_hub(html_file)
 
     list_tf = []
     list_panel = page_content.xpath('div[@class="content-panel standalone series"]')[1:]
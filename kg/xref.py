@@ -0,0 +1,262 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   xref.py
+@Time    :   2024/09/20 19:32:08
+@Author  :   Chen XiYuan
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+offline resolution of cross references between entities in data/*.json
+addresses are normalized with strip_address and unify_name, every reference
+is validated, relationships of graph_building_from_json are saved as edge tables
+'''
+
+import os
+import csv
+from urllib import parse
+from collections import Counter
+
+from facility import unify_name
+from scp_store import load_scp_store
+from utilities import strip_address, load_json, save_json
+
+
+# label -> (json file in data/, property used as node index in graph)
+LABEL_ENTITY = {
+    'Tag': ('tag.json', 'tag'),
+    'Facility': ('facility.json', 'facility_index'),
+    'TaskForce': ('taskforce.json', 'name'),
+    'GroupOfInterest': ('goi.json', 'name'),
+    'Character': ('character.json', 'name'),
+    'Attribute': ('attribute.json', 'name'),
+    'Canon': ('canon.json', 'name'),
+    'Series': ('series.json', 'name'),
+}
+# label -> fields with addresses of the entity itself
+LABEL_ADDRESS = {
+    'Tag': ['address'],
+    'Facility': ['dossier'],
+    'GroupOfInterest': ['address'],
+    'Character': ['address_extra'],
+    'Canon': ['address'],
+    'Series': ['address'],
+}
+# (label, field) -> label of the referenced entity, None for any entity
+LABEL_REFERENCE = {
+    ('Facility', 'object_contained'): 'ScpObject',
+    ('Facility', 'object_related'): 'ScpObject',
+    ('Facility', 'incident'): None,
+    ('TaskForce', 'object_deployed'): 'ScpObject',
+    ('TaskForce', 'object_utilized'): 'ScpObject',
+    ('TaskForce', 'object_contained'): 'ScpObject',
+    ('TaskForce', 'action_report'): None,
+    ('Character', 'description_link'): None,
+}
+# same as create_scp in graph_building_from_json
+TAG_RELATION = {
+    'Tag': 'HAS_TAG',
+    'Attribute': 'HAS_ATTRIBUTE',
+    'Character': 'RELATE_TO_CHARACTER',
+    'GroupOfInterest': 'RELATE_TO_GROUP',
+    'Series': 'BELONG_T0_SERIES',
+    'Canon': 'BELONG_T0_CANON',
+}
+EDGE_HEADER = [
+    'head_label', 'head_property', 'head_value',
+    'relationship',
+    'tail_label', 'tail_property', 'tail_value',
+]
+
+
+def normalize_address(address: str | None) -> str | None:
+    if address is None or address == '':
+        return None
+    return unify_name(parse.unquote(strip_address(address)).strip())
+
+
+def as_list(value) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def load_entity(
+    dir_data: str = '../data/',
+    scp_file: str = 'scp.json',
+) -> dict[str, list[dict]]:
+    label2entity = {}
+    for label, (json_file, _) in LABEL_ENTITY.items():
+        label2entity[label] = load_json(os.path.join(dir_data, json_file))
+    scp_file = os.path.join(dir_data, scp_file)
+    if scp_file.endswith('.col'):
+        label2entity['ScpObject'] = load_scp_store(scp_file, ['item_number', 'tag', 'address'])
+    else:
+        label2entity['ScpObject'] = load_json(scp_file)
+    return label2entity
+
+
+def build_address_index(
+    label2entity: dict[str, list[dict]],
+) -> tuple[dict[str, list[tuple[str, str]]], set[str]]:
+    # normalized address -> [(label, index value)], and addresses before normalization
+    address_index: dict[str, list[tuple[str, str]]] = {}
+    address_exact = set()
+    label_address = dict(LABEL_ADDRESS)
+    label_address['ScpObject'] = ['address']
+    for label, list_field in label_address.items():
+        index = 'item_number' if label == 'ScpObject' else LABEL_ENTITY[label][1]
+        for i in label2entity[label]:
+            for field in list_field:
+                for address in as_list(i.get(field, None)):
+                    address_norm = normalize_address(address)
+                    if address_norm is None:
+                        continue
+                    address_exact.add(strip_address(address))
+                    entity = (label, i[index])
+                    if entity not in address_index.setdefault(address_norm, []):
+                        address_index[address_norm].append(entity)
+    return address_index, address_exact
+
+
+def resolve_reference(
+    list_address: list[str],
+    address_index: dict[str, list[tuple[str, str]]],
+    address_exact: set[str],
+    label: str | None,
+    stat: Counter,
+    list_dangling: list[str],
+) -> list[str]:
+    # index values of referenced entities with label
+    list_value = []
+    address_seen = set()
+    for address in list_address:
+        stat['reference'] += 1
+        address_norm = normalize_address(address)
+        if address_norm in address_seen:
+            stat['duplicate'] += 1
+            continue
+        address_seen.add(address_norm)
+        list_entity = [j for j in address_index.get(address_norm, []) if label is None or j[0] == label]
+        if len(list_entity) == 0:
+            stat['dangling'] += 1
+            list_dangling.append(address)
+            continue
+        stat['resolved'] += 1
+        if strip_address(address) not in address_exact:
+            stat['aliased'] += 1
+        if len(list_entity) > 1:
+            stat['ambiguous'] += 1
+        if label is not None:
+            list_value.append(list_entity[0][1])
+    return list_value
+
+
+def get_edge(
+    head_label: str, head_property: str, head_value,
+    relationship: str,
+    tail_label: str, tail_property: str, tail_value,
+) -> tuple:
+    return (head_label, head_property, head_value, relationship, tail_label, tail_property, tail_value)
+
+
+def resolve_all(
+    label2entity: dict[str, list[dict]],
+    n_example: int = 20,
+) -> tuple[dict[str, list[tuple]], dict]:
+    # relationship -> edges, and validation report
+    address_index, address_exact = build_address_index(label2entity)
+    report = {}
+    resolved: dict[tuple[str, str], list[list[str]]] = {}
+    for (label, field), label_target in LABEL_REFERENCE.items():
+        stat = Counter()
+        list_dangling = []
+        resolved[(label, field)] = [
+            resolve_reference(as_list(i.get(field, None)), address_index, address_exact,
+                              label_target, stat, list_dangling)
+            for i in label2entity[label]
+        ]
+        report[f'{label}.{field}'] = dict(stat, example_dangling=list_dangling[:n_example])
+
+    edge: dict[str, list[tuple]] = {}
+    def add_edge(relationship: str, row: tuple) -> None:
+        edge.setdefault(relationship, [])
+        edge[relationship].append(row)
+
+    # an SCP object is contained in the first facility listing it
+    scp_contained = set()
+    for i, list_item in zip(label2entity['Facility'], resolved[('Facility', 'object_contained')]):
+        for item in list_item:
+            if item in scp_contained:
+                continue
+            scp_contained.add(item)
+            add_edge('IS_CONTAINED_IN_FACILITY', get_edge(
+                'ScpObject', 'item_number', item, 'IS_CONTAINED_IN_FACILITY',
+                'Facility', 'facility_index', i['facility_index']))
+    for i, list_item in zip(label2entity['TaskForce'], resolved[('TaskForce', 'object_contained')]):
+        for item in list_item:
+            add_edge('IS_CONTAINED_BY_TASKFORCE', get_edge(
+                'ScpObject', 'item_number', item, 'IS_CONTAINED_BY_TASKFORCE',
+                'TaskForce', 'name', i['name']))
+
+    # nodes are matched by tag, as create_node_as_tail and create_scp do
+    label2tag = {}
+    for label in TAG_RELATION:
+        label2tag[label] = set([i['tag'] for i in label2entity[label] if i.get('tag', None) is not None])
+    for label in TAG_RELATION:
+        if label == 'Tag':
+            continue
+        for tag in sorted(label2tag[label]):
+            add_edge('IS_TAG_OF', get_edge('Tag', 'tag', tag, 'IS_TAG_OF', label, 'tag', tag))
+    stat = Counter()
+    for i in label2entity['ScpObject']:
+        for tag in i['tag']:
+            stat['reference'] += 1
+            stat['resolved' if tag in label2tag['Tag'] else 'dangling'] += 1
+            for label, relationship in TAG_RELATION.items():
+                if tag in label2tag[label]:
+                    add_edge(relationship, get_edge(
+                        'ScpObject', 'item_number', i['item_number'], relationship,
+                        label, 'tag', tag))
+    report['ScpObject.tag'] = dict(stat)
+    for k, v in edge.items():
+        edge[k] = sorted(set(v), key=lambda x: [str(i) for i in x])
+    return edge, report
+
+
+def save_edge(
+    edge: dict[str, list[tuple]],
+    dir_edge: str = '../data/edge/',
+) -> None:
+    os.makedirs(dir_edge, exist_ok=True)
+    for relationship, list_row in edge.items():
+        with open(os.path.join(dir_edge, f'{relationship}.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(EDGE_HEADER)
+            writer.writerows(list_row)
+
+
+def print_report(report: dict) -> None:
+    for k, v in report.items():
+        print('%-30s %6d references, %6d resolved, %5d dangling, %4d duplicate, %4d aliased, %4d ambiguous'%(
+            k, v.get('reference', 0), v.get('resolved', 0), v.get('dangling', 0),
+            v.get('duplicate', 0), v.get('aliased', 0), v.get('ambiguous', 0)))
+
+
+def resolve_xref(
+    dir_data: str = '../data/',
+    scp_file: str = 'scp.json',
+    dir_edge: str = '../data/edge/',
+    report_json: str = '../data/xref.report.json',
+) -> dict[str, list[tuple]]:
+    label2entity = load_entity(dir_data, scp_file)
+    edge, report = resolve_all(label2entity)
+    save_edge(edge, dir_edge)
+    save_json(report, report_json)
+    print_report(report)
+    for k, v in edge.items():
+        print(f'#{k}: {len(v)}')
+    return edge
+
+
+if __name__ == '__main__':
+    resolve_xref()
@@ -20,7 +20,7 @@ from opencc import OpenCC
 chinese_converter = OpenCC('t2s')
 import pandas as pd
 
-from utilities import load_json, split_sentence, save_json, get_page_text
+from utilities import load_json, split_sentence, save_json, get_page_text, load_scp_dict
 
 
 ENTITY_PATTERN = {
@@ -79,7 +79,7 @@ def scp(
     pattern: str = r'scp(?:-[a-z]+)?[-‑－\s]?[0-9]+(?:[-‑－][a-z]{2,}){0,2}(?:[-‑－]j)?(?:[-‑－][0-9])?',
 ) -> list[dict]:
     pattern = re.compile(pattern, re.I)
-    list_scp_dict = load_json(json_scp)
+    list_scp_dict = load_scp_dict(json_scp, ['special_containment_procedure', 'description'])
     list_sentence = []
     for dict_scp in list_scp_dict:
         list_sentence += split_sentence(dict_scp['special_containment_procedure'])
@@ -11,11 +11,15 @@ import re
 import json
 
 from oneke import get_instruction, get_response
+from utilities import load_scp_dict
     
 
-def load_scp(json_scp: str = '../data/scp.json') -> list[dict]:
-    with open(json_scp) as f:
-        return json.load(f)
+def load_scp(
+    json_scp: str = '../data/scp.json',
+    columns: list[str] = None,
+) -> list[dict]:
+    # json_scp can also be the columnar store ../data/scp.col
+    return load_scp_dict(json_scp, columns)
 
 
 SCHEMA_EXAMPLE_NER = {
@@ -178,7 +182,7 @@ def ner(
 
 
 if __name__ == '__main__':
-    list_scp = load_scp()
+    list_scp = load_scp(columns=['special_containment_procedure'])
     scp = list_scp[97]
     special_containment_procedure = scp['special_containment_procedure']
     # task = 'NER'
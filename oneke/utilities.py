@@ -8,7 +8,9 @@
 '''
 
 import json
+import os
 import re
+import sys
 from string import printable
 
 from urllib.parse import unquote
@@ -16,6 +18,17 @@ from scrapy import Selector
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
 
+def add_kg_path() -> None:
+    # modules of kg/ are imported by name, as in kg/ itself
+    dir_kg = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'kg')
+    if dir_kg not in sys.path:
+        sys.path.append(dir_kg)
+
+
+add_kg_path()
+from page_tree import remove_css
+
+
 def load_json(json_path: str):
     with open(json_path) as f:
         return json.load(f)
@@ -55,13 +68,10 @@ def get_page_text(html_path: str) -> str:
     with open(html_path) as f:
         page = Selector(text=f.read()).css('div#page-content')
 
-    all_content_text = page.extract_first()
-    if all_content_text is None:
+    if len(page) == 0:
         return ''
-    for i in CSS_REMOVE:
-        for j in page.css(i).extract():
-            all_content_text = all_content_text.replace(j, '')
-    text = xstr(Selector(text=all_content_text))
+    remove_css(page[0].root, CSS_REMOVE)
+    text = xstr(page[0])
     return text
 
 
@@ -133,6 +143,18 @@ def load_json(
     ):
     with open(json_path) as f:
         return json.load(f)
+
+
+def load_scp_dict(
+    scp_file: str,
+    columns: list[str] = None,
+) -> list[dict]:
+    # scp.json or the columnar store scp.col written by kg/scp_store.py
+    if not scp_file.endswith('.col'):
+        return load_json(scp_file)
+    add_kg_path()
+    from scp_store import load_scp_store
+    return load_scp_store(scp_file, columns)
     
 
 def strip_address(s: str | None) -> str:
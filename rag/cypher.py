@@ -28,6 +28,7 @@ from langchain_core.prompts import FewShotPromptTemplate, PromptTemplate
 from langchain_openai import ChatOpenAI
 
 from openai_api import OPENAI_API_BASE, OPENAI_API_KEY
+from kg_path import add_kg_path
 
 
 device = "cuda" # the device to load the model onto
@@ -132,7 +133,8 @@ cypher_prompt_example = [
     },
     {
         "question": "所有和Harold Blank博士有关的scp项目",
-        "query": "MATCH (object:ScpObject)-[:HAS_TAG]->(tag:Tag)-[:IS_TAG_OF]->(character:Character {{name: 'Harold Blank博士'}}) RETURN COLLECT(object.item_number)",
+        # single hop, RELATE_TO_CHARACTER is the same as -[:HAS_TAG]->(:Tag)-[:IS_TAG_OF]->
+        "query": "MATCH (object:ScpObject)-[:RELATE_TO_CHARACTER]->(character:Character {{name: 'Harold Blank博士'}}) RETURN COLLECT(object.item_number)",
     },
     {
         "question": "标签为dan博士的人物角色",
@@ -184,6 +186,56 @@ cypher_prompt = FewShotPromptTemplate(
 )
 
 
+def load_tag_index(
+    scp_file: str = '../data/scp.json',
+    tag_json: str = '../data/tag.json',
+):
+    # local tag index of kg/tag_query.py, tag questions are answered
+    # without llm and neo4j
+    add_kg_path()
+    from tag_query import ScpTagIndex
+    return ScpTagIndex(scp_file, tag_json)
+
+
+def load_neighbor(
+    scp_file: str = '../data/scp.json',
+    dir_data: str = '../data/',
+):
+    # precomputed SCP objects related to characters, groups etc. of kg/scp_neighbor.py
+    add_kg_path()
+    from scp_neighbor import ScpNeighbor
+    return ScpNeighbor(scp_file, dir_data)
+
+
+def load_graph_client(**kwargs):
+    # pooled async access of kg/graph_client.py
+    add_kg_path()
+    from graph_client import GraphClient
+    return GraphClient(**kwargs)
+
+
+def check_example_query(client, list_example: list[dict] = None) -> list[list[dict]]:
+    # run the cypher of few-shot examples concurrently in read transactions,
+    # to find examples broken by changes of the graph
+    if list_example is None:
+        list_example = cypher_prompt_example
+    list_query = [i['query'].replace('{{', '{').replace('}}', '}') for i in list_example]
+    list_result = client.submit([client.read(i) for i in list_query])
+    for i, j in zip(list_example, list_result):
+        print(i['question'], len(j))
+    return list_result
+
+
+def answer_question(chain: GraphCypherQAChain, question: str, tag_index=None, neighbor=None) -> str:
+    # tag index and related entities first, cypher if the question is not about them
+    for i in [tag_index, neighbor]:
+        if i is not None:
+            answer = i.answer(question)
+            if answer is not None:
+                return answer
+    return chain.run(question)
+
+
 if __name__ == '__main__':
     # start neo4j server: sudo neo4j start
     graph = Neo4jGraph(
@@ -211,5 +263,9 @@ if __name__ == '__main__':
     # question = '所有和dan博士有关的scp项目'
     question = '列出所有与黑皇后有关的SCP项目编号'
     prompt = '\n直接输出提供的信息，不要进行任何修改和删减'
-    answer = chain.run(question)
+    tag_index = load_tag_index()
+    neighbor = load_neighbor()
+    # with load_graph_client() as client:
+    #     check_example_query(client)
+    answer = answer_question(chain, question, tag_index, neighbor)
     print(answer)
\ No newline at end of file
@@ -0,0 +1,20 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   kg_path.py
+@Time    :   2024/09/22 21:05:16
+@Author  :   Chen XiYuan 
+@Version :   1.0
+@Contact :   cxy13.ok@163.com
+
+modules of kg/ are imported by name, as in kg/ itself
+not named utilities.py, which would shadow kg/utilities.py
+'''
+
+import os
+import sys
+
+
+def add_kg_path() -> None:
+    dir_kg = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'kg')
+    if dir_kg not in sys.path:
+        sys.path.append(dir_kg)
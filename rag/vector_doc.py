@@ -30,6 +30,8 @@ from langchain.llms.base import LLM
 from typing import Any, List, Mapping, Optional
 from langchain.callbacks.manager import CallbackManagerForLLMRun
 
+from kg_path import add_kg_path
+
 
 device = "cuda" # the device to load the model onto
 # dir_qwen2 = "/home/chenxiyuan/PetProjects/LLM/Qwen2-7B-Instruct"
@@ -147,6 +149,20 @@ def load_file(filepath):
     return docs
 
 
+def load_store(
+    filepath: str,
+    columns: list[str] = None,
+) -> list[Document]:
+    # columnar store written by kg/scp_store.py, one document per SCP object
+    # same page_content as ScpTextSplitter on scp.json
+    add_kg_path()
+    from scp_store import load_scp_store
+    list_dict = load_scp_store(filepath, columns)
+    print(f'Number of SCP dicts: {len(list_dict)}')
+    return [Document(page_content=json.dumps(i, ensure_ascii=False), metadata={'source': filepath})
+            for i in list_dict]
+
+
 def write_check_file(filepath, docs):
     folder_path = os.path.join(os.path.dirname(filepath), "tmp_files")
     if not os.path.exists(folder_path):
@@ -270,7 +286,10 @@ if __name__ == '__main__':
         model_kwargs={'device': EMBEDDING_DEVICE}
     )
 
-    docs = load_file(filepath)
+    if filepath.endswith('.col'):
+        docs = load_store(filepath)
+    else:
+        docs = load_file(filepath)
 
     import time
     time_start = time.time()
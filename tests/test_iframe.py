@@ -0,0 +1,42 @@
+# -*- encoding: utf-8 -*-
+# a cached page is parsed again when the local file of its iframe changes
+
+import os
+import sys
+
+DIR_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(DIR_ROOT, 'kg'))
+
+from page import parse_page_cached, hash_page_file
+
+
+HTML_IFRAME = '''<html><body><div id="page-content">
+<p>短文</p>
+<p><iframe src="frame.html?a=1&amp;b=2"></iframe></p>
+</div></body></html>
+'''
+
+
+def test_iframe_in_cache_key(tmp_path) -> None:
+    dir_wikidot = tmp_path / 'scp-wiki-cn.wikidot.com'
+    dir_wikidot.mkdir()
+    html_file = str(dir_wikidot / 'scp-1.html')
+    with open(html_file, 'w') as f:
+        f.write(HTML_IFRAME)
+    cache_db = str(tmp_path / 'page.cache.sqlite')
+    list_html = [[html_file]]
+
+    result, change = parse_page_cached(list_html, cache_db, True, n_jobs=1)
+    assert change['added'] == ['scp-1']
+    assert result[0][0]['text_block'] == ['短文']
+    result, change = parse_page_cached(list_html, cache_db, True, n_jobs=1)
+    assert change['modified'] == []
+
+    # the iframe is prefetched after the page was cached
+    hash_old = hash_page_file(html_file)
+    with open(dir_wikidot / 'frame.html', 'w') as f:
+        f.write('<html><body><p>框架内容</p></body></html>')
+    assert hash_page_file(html_file) != hash_old
+    result, change = parse_page_cached(list_html, cache_db, True, n_jobs=1)
+    assert change['modified'] == ['scp-1']
+    assert '框架内容' in '\n'.join(result[0][0]['text_block'])
@@ -0,0 +1,50 @@
+# -*- encoding: utf-8 -*-
+# classes with border in <style> stop unfolding only with detect_border,
+# the default keeps .alt-block as the original parser
+
+import os
+import sys
+
+DIR_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(DIR_ROOT, 'kg'))
+
+import page
+from page import Page, get_page_mode
+from style_cache import StyleCache
+
+
+HTML_BORDER = '''<html><head><style>
+.note-box { border: 1px solid #000; padding: 1em; }
+.plain { border-radius: 2px; }
+</style></head><body>
+<div id="page-content">
+<div class="note-box"><p>第一段</p><p>第二段</p></div>
+<hr><p>第三段</p>
+</div></body></html>
+'''
+
+
+def test_detect_border(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(page, 'STYLE_CACHE', StyleCache(str(tmp_path / 'style_cache')))
+    html_file = tmp_path / 'scp-1.html'
+    html_file.write_text(HTML_BORDER, encoding='utf-8')
+    for single_parse in [False, True]:
+        p = Page(str(html_file), single_parse=single_parse)
+        p.update_text_block()
+        assert p.class_stop == {'alt-block', 'blockquote'}
+        # paragraphs of div.note-box are unfolded
+        assert p.text_block == ['第一段\n第二段', '第三段']
+        p = Page(str(html_file), single_parse=single_parse, detect_border=True)
+        p.update_text_block()
+        assert p.class_stop == {'alt-block', 'blockquote', 'note-box'}
+        # div.note-box is a single block
+        assert p.text_block == ['第一段第二段', '第三段']
+        assert 'detect_border' not in p.get_dict()
+    # the second page of each mode is read from the style cache
+    assert page.STYLE_CACHE.stat['miss'] == 1
+    assert page.STYLE_CACHE.stat['hit_memory'] == 1
+
+
+def test_page_mode() -> None:
+    assert get_page_mode(True) != get_page_mode(True, detect_border=True)
+    assert get_page_mode(False, detect_border=True) != get_page_mode(True, detect_border=True)
@@ -0,0 +1,23 @@
+# -*- encoding: utf-8 -*-
+# link and text_block of the single-parse parser are the same as the golden
+# of the baseline parser, saved by page_benchmark.save_golden
+
+import os
+import sys
+
+import pytest
+
+DIR_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(DIR_ROOT, 'kg'))
+
+from page_benchmark import check_golden
+
+GOLDEN_JSON = os.path.join(DIR_ROOT, 'data', 'page.golden.json')
+
+
+@pytest.mark.skipif(not os.path.exists(GOLDEN_JSON), reason='data/page.golden.json not saved')
+@pytest.mark.parametrize('single_parse', [True, False])
+def test_golden(single_parse: bool, monkeypatch) -> None:
+    # html paths in the golden are relative to kg/
+    monkeypatch.chdir(os.path.join(DIR_ROOT, 'kg'))
+    assert check_golden(GOLDEN_JSON, single_parse) == []
@@ -0,0 +1,48 @@
+# -*- encoding: utf-8 -*-
+# raw text is wrapped in the lxml tree by the same rule as the original
+# str.replace on the html of div#page-content
+
+import os
+import sys
+
+from lxml import html as lxml_html
+
+DIR_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(DIR_ROOT, 'kg'))
+
+from page_tree import tree_html, wrap_text_tree
+
+
+def wrap_text_replace(html: str) -> str:
+    # the original wrap_text of Page.update_text_block
+    element = lxml_html.fragment_fromstring(html)
+    html = tree_html(element)
+    for i in element.xpath('text()'):
+        i = i.strip()
+        if i != '' and html.count(i) == 1:
+            html = html.replace(i, f'<p>{i}</p>')
+    return html
+
+
+def wrap_text(html: str) -> str:
+    element = lxml_html.fragment_fromstring(html)
+    wrap_text_tree(element)
+    return tree_html(element)
+
+
+def get_paragraph(html: str) -> list[str]:
+    element = lxml_html.fragment_fromstring(html)
+    return [i.text for i in element.xpath('p')]
+
+
+def test_wrap_text_once():
+    html = '<div id="page-content">\n intro \n<hr>\nbody<div class="a">x</div>end\n</div>'
+    assert get_paragraph(wrap_text(html)) == ['intro', 'body', 'end']
+    assert get_paragraph(wrap_text(html)) == get_paragraph(wrap_text_replace(html))
+
+
+def test_wrap_text_not_unique():
+    # repeated text and text with escaped characters are kept as they are
+    html = '<div id="page-content">foo<p>foo bar</p>baz<hr>a &amp; b<hr>qux</div>'
+    assert get_paragraph(wrap_text(html)) == ['foo bar', 'baz', 'qux']
+    assert get_paragraph(wrap_text(html)) == get_paragraph(wrap_text_replace(html))
@@ -0,0 +1,42 @@
+# -*- encoding: utf-8 -*-
+# the columnar store reads back scp.json, views returned by get_bytes must
+# be released before it is closed
+
+import os
+import sys
+
+import pytest
+
+DIR_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(DIR_ROOT, 'kg'))
+
+from scp_store import ScpStore, load_scp_store, save_scp_store
+
+
+LIST_SCP = [
+    {'item_number': 'scp-1', 'description': '描述', 'tag': ['scp', 'safe'], 'idx_mainpage': 1},
+    {'item_number': 'scp-2', 'description': None, 'tag': ['scp', 'keter'], 'idx_mainpage': None},
+    {'item_number': 'scp-3', 'description': 'c', 'tag': [], 'idx_mainpage': 3},
+]
+
+
+def test_read_column(tmp_path) -> None:
+    store_file = str(tmp_path / 'scp.col')
+    save_scp_store(LIST_SCP, store_file)
+    assert load_scp_store(store_file) == LIST_SCP
+    assert load_scp_store(store_file, ['item_number', 'tag']) == \
+        [{'item_number': i['item_number'], 'tag': i['tag']} for i in LIST_SCP]
+    assert load_scp_store(store_file, ['item_number'], tag_all={'scp'}, tag_none={'safe'}) == \
+        [{'item_number': 'scp-2'}]
+
+
+def test_close_with_view(tmp_path) -> None:
+    store_file = str(tmp_path / 'scp.col')
+    save_scp_store(LIST_SCP, store_file)
+    store = ScpStore(store_file)
+    view = store.get_bytes('description', 0)
+    with pytest.raises(BufferError):
+        store.close()
+    assert str(view, 'utf-8') == '描述'
+    view.release()
+    store.close()
@@ -0,0 +1,37 @@
+# -*- encoding: utf-8 -*-
+# tags scanned from the sliced div.page-tags are the same as Page.tag,
+# which reads div[@class="page-tags"]/span/a of the whole html
+
+import os
+import sys
+
+DIR_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(DIR_ROOT, 'kg'))
+
+from page import Page
+from tag_index import scan_tag
+
+
+HTML_TAG = '''<html><body><div id="main-content">
+<div id="page-content"><p>text</p></div>
+<div class="page-tags"><span><a href="/system:page-tags/tag/scp">scp</a><a>&amp;项目</a></span>
+<div class="inner"><span><a>inner</a></span></div><span><a><b>keter</b></a></span></div>
+<div class="page-tags" id="second"><span><a>second</a><em><a>not-span</a></em></span></div>
+<div><div class="page-tags"><span><a>outer</a></span>
+<div class="page-tags"><span><a>nested</a></span></div></div></div>
+</div></body></html>
+'''
+
+
+def test_scan_tag_same_as_page(tmp_path) -> None:
+    html_file = tmp_path / 'scp-1.html'
+    html_file.write_text(HTML_TAG, encoding='utf-8')
+    tag = scan_tag(str(html_file))
+    assert tag == {'scp', '&项目', 'keter', 'second', 'outer', 'nested'}
+    assert tag == Page(str(html_file)).tag
+
+
+def test_scan_tag_none(tmp_path) -> None:
+    html_file = tmp_path / 'scp-2.html'
+    html_file.write_text('<html><body><div id="page-content">x</div></body></html>', encoding='utf-8')
+    assert scan_tag(str(html_file)) == set() == Page(str(html_file)).tag
@@ -0,0 +1,70 @@
+# -*- encoding: utf-8 -*-
+# the tag index answers only questions about tags of SCP objects,
+# the other few-shot questions of rag/cypher.py fall back to cypher
+
+import os
+import ast
+import sys
+import json
+
+import pytest
+
+DIR_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(DIR_ROOT, 'kg'))
+
+from tag_query import ScpTagIndex
+
+
+def load_cypher_example() -> dict[str, str]:
+    # rag/cypher.py loads llm at import, the examples are read from its source
+    with open(os.path.join(DIR_ROOT, 'rag', 'cypher.py')) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and node.targets[0].id == 'cypher_prompt_example':
+            return dict((i['question'], i['query']) for i in ast.literal_eval(node.value))
+    raise ValueError('cypher_prompt_example not found')
+
+
+@pytest.fixture(scope='module')
+def tag_index(tmp_path_factory) -> ScpTagIndex:
+    list_scp = [
+        {'item_number': 'scp-1', 'tag': ['scp', '项目', '威尔逊野生动物']},
+        {'item_number': 'scp-2', 'tag': ['scp', '威尔逊野生动物', '搞笑']},
+        {'item_number': 'scp-3', 'tag': ['scp', '人形生物', '搞笑']},
+        {'item_number': 'scp-4', 'tag': ['scp', 'dan博士', 'keter']},
+    ]
+    scp_file = tmp_path_factory.mktemp('data') / 'scp.json'
+    with open(scp_file, 'w') as f:
+        json.dump(list_scp, f, ensure_ascii=False)
+    return ScpTagIndex(str(scp_file), os.path.join(DIR_ROOT, 'data', 'tag.json'))
+
+
+def test_example_question(tag_index: ScpTagIndex) -> None:
+    example = load_cypher_example()
+    expected = {
+        'scp-1446的特殊收容措施': None,
+        '哪些项目有威尔逊野生动物的标签？': ('tag', '威尔逊野生动物'),
+        '一共有多少个scp项目有“搞笑”或“人形生物”的标签？': ('or', ('tag', '搞笑'), ('tag', '人形生物')),
+        'MTF Beta-2 协助收容了几个基金会项目？': None,
+        '所有和Harold Blank博士有关的scp项目': None,
+        '标签为dan博士的人物角色': None,
+    }
+    assert set(expected) == set(example)
+    for question, tree in expected.items():
+        assert tag_index.parse_question(question) == tree, question
+
+
+def test_example_answer(tag_index: ScpTagIndex) -> None:
+    assert tag_index.answer('哪些项目有威尔逊野生动物的标签？') == 'scp-1, scp-2'
+    assert tag_index.answer('一共有多少个scp项目有“搞笑”或“人形生物”的标签？') == '2'
+    assert tag_index.answer('标签为dan博士的人物角色') is None
+
+
+def test_tag_near_word(tag_index: ScpTagIndex) -> None:
+    assert tag_index.parse_question('有搞笑和人形生物标签的项目') == \
+        ('and', ('tag', '搞笑'), ('tag', '人形生物'))
+    assert tag_index.parse_question('标签为搞笑但没有人形生物的项目') == \
+        ('and', ('tag', '搞笑'), ('not', ('tag', '人形生物')))
+    assert tag_index.parse_question('项目有威尔逊野生动物标签吗') == ('tag', '威尔逊野生动物')
+    assert tag_index.parse_question('有搞笑或者不是人形生物标签的scp') == \
+        ('or', ('tag', '搞笑'), ('not', ('tag', '人形生物')))